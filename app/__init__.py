@@ -11,7 +11,19 @@ from flask_cors import CORS
 
 from .config import Settings, settings
 from .extensions import close_db, init_extensions, limiter
+from .services.api_key_service import init_api_key_cache
+from .services.doc_save_service import init_doc_save_worker
+from .services.maintenance_service import init_maintenance
+from .services.onlyoffice_service import init_editor_config_cache
+from .services.search_service import init_search_indexer
+from .utils.audit import init_audit_writer
+from .utils.blobs import init_blob_store
 from .utils.errors import register_error_handlers
+from .utils.identity import init_identity_cache
+from .utils.passwords import init_password_hasher
+from .utils.rbac import init_permission_cache
+from .utils.revocation import init_token_blocklist
+from .utils.security import init_token_cache
 
 PACKAGE_ROOT = Path(__file__).resolve().parent
 
@@ -25,6 +37,18 @@ def create_app(settings_override: Settings | None = None) -> Flask:
     app.config.from_mapping(APP_SETTINGS=app_settings)
 
     init_extensions(app, app_settings)
+    init_blob_store(app, app_settings)
+    init_identity_cache(app, app_settings)
+    init_token_cache(app, app_settings)
+    init_editor_config_cache(app, app_settings)
+    init_token_blocklist(app, app_settings)
+    init_permission_cache(app, app_settings)
+    init_api_key_cache(app, app_settings)
+    init_password_hasher(app, app_settings)
+    init_audit_writer(app, app_settings)
+    init_maintenance(app, app_settings)
+    init_doc_save_worker(app, app_settings)
+    init_search_indexer(app, app_settings)
     register_error_handlers(app)
     configure_logging(app)
     configure_cors(app, app_settings)
@@ -77,12 +101,14 @@ def register_blueprints(app: Flask) -> None:
 
     from .routes import (
         admin_bp,
+        analytics_bp,
         auth_bp,
         crud_bp,
         docs_bp,
         files_bp,
         health_bp,
         labs_bp,
+        reagents_bp,
         samples_bp,
         web_bp,
     )
@@ -92,6 +118,8 @@ def register_blueprints(app: Flask) -> None:
     app.register_blueprint(docs_bp, url_prefix="/api/v1")
     app.register_blueprint(labs_bp, url_prefix="/api/v1")
     app.register_blueprint(samples_bp, url_prefix="/api/v1")
+    app.register_blueprint(analytics_bp, url_prefix="/api/v1")
+    app.register_blueprint(reagents_bp, url_prefix="/api/v1")
     app.register_blueprint(health_bp)
     app.register_blueprint(files_bp)
     app.register_blueprint(admin_bp)
@@ -124,6 +152,16 @@ def register_shellcontext(app: Flask) -> None:
 def register_cli(app: Flask) -> None:
     """Custom CLI commands."""
 
+    from .services.api_key_service import register_api_key_cli
     from .services.auth_service import create_user_cli
+    from .services.counter_service import register_counter_cli
+    from .services.maintenance_service import register_maintenance_cli
+    from .services.reagent_service import register_reagent_cli
+    from .services.search_service import register_search_cli
 
     create_user_cli(app)
+    register_api_key_cli(app)
+    register_counter_cli(app)
+    register_maintenance_cli(app)
+    register_reagent_cli(app)
+    register_search_cli(app)
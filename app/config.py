@@ -9,6 +9,8 @@ from typing import Any, Dict, List, Optional, Union
 
 from pydantic import BaseSettings, Field, validator
 
+FILE_OFFLOAD_MODES = ("x-accel-redirect", "x-sendfile")
+
 
 class Settings(BaseSettings):
     """Runtime configuration pulled from environment variables and .env."""
@@ -23,9 +25,24 @@ class Settings(BaseSettings):
     )
 
     rate_redis_url: Optional[str] = Field(default=None, env="RATE_REDIS_URL")
+    rate_limit_shared_file: Optional[str] = Field(
+        default=None, env="RATE_LIMIT_SHARED_FILE"
+    )
+    # Unset: sliding-window-counter with the shared file, Flask-Limiter's
+    # fixed-window default otherwise.
+    rate_limit_strategy: Optional[str] = Field(default=None, env="RATE_LIMIT_STRATEGY")
+    # Legacy plaintext keys; move them to the api_keys table with
+    # ``flask api-keys import-env``.
     api_keys_json: Dict[str, List[str]] = Field(
         default_factory=dict, env="API_KEYS_JSON"
     )
+    api_key_cache_size: int = Field(default=256, ge=1, env="API_KEY_CACHE_SIZE")
+    api_key_cache_refresh_seconds: float = Field(
+        default=5.0, ge=0, env="API_KEY_CACHE_REFRESH_SECONDS"
+    )
+    api_key_last_used_flush_seconds: float = Field(
+        default=30.0, ge=0, env="API_KEY_LAST_USED_FLUSH_SECONDS"
+    )
 
     jwt_access_token_expires_hours: int = Field(default=12, ge=1, le=72)
     jwt_refresh_token_expires_days: int = Field(default=30, ge=1, le=365)
@@ -33,6 +50,12 @@ class Settings(BaseSettings):
     oo_base_url: str = Field(default="http://onlyoffice-d:80", env="OO_BASE_URL")
     oo_jwt_secret: Optional[str] = Field(default=None, env="OO_JWT_SECRET")
     base_file_dir: Path = Field(default=Path("/mnt/docs"), env="BASE_FILE_DIR")
+    # ``x-accel-redirect`` (nginx) or ``x-sendfile`` (Apache, lighttpd) hands
+    # ``/files/*`` bodies to the proxy; unset streams them from Python.
+    file_offload: Optional[str] = Field(default=None, env="FILE_OFFLOAD")
+    file_offload_prefix: str = Field(
+        default="/protected-files", env="FILE_OFFLOAD_PREFIX"
+    )
 
     cors_allowed_origins: List[str] = Field(
         default_factory=list, env="CORS_ALLOWED_ORIGINS"
@@ -41,6 +64,69 @@ class Settings(BaseSettings):
 
     sentry_dsn: Optional[str] = Field(default=None, env="SENTRY_DSN")
 
+    analytics_cache_ttl_seconds: int = Field(
+        default=300, ge=0, env="ANALYTICS_CACHE_TTL_SECONDS"
+    )
+    identity_cache_ttl_seconds: int = Field(
+        default=60, ge=0, env="IDENTITY_CACHE_TTL_SECONDS"
+    )
+    identity_cache_size: int = Field(default=4096, ge=1, env="IDENTITY_CACHE_SIZE")
+    token_cache_size: int = Field(default=1024, ge=1, env="TOKEN_CACHE_SIZE")
+    editor_config_cache_size: int = Field(
+        default=512, ge=1, env="EDITOR_CONFIG_CACHE_SIZE"
+    )
+    rbac_refresh_seconds: float = Field(default=5.0, ge=0, env="RBAC_REFRESH_SECONDS")
+    token_revocation_refresh_seconds: float = Field(
+        default=2.0, ge=0, env="TOKEN_REVOCATION_REFRESH_SECONDS"
+    )
+
+    password_hash_workers: int = Field(default=2, ge=0, env="PASSWORD_HASH_WORKERS")
+    password_hash_queue_limit: int = Field(
+        default=32, ge=1, env="PASSWORD_HASH_QUEUE_LIMIT"
+    )
+    password_hash_scheme: str = Field(
+        default="pbkdf2_sha256", env="PASSWORD_HASH_SCHEME"
+    )
+    password_hash_rounds: Optional[int] = Field(
+        default=None, ge=1, env="PASSWORD_HASH_ROUNDS"
+    )
+    password_hash_timeout_seconds: float = Field(
+        default=10.0, gt=0, env="PASSWORD_HASH_TIMEOUT_SECONDS"
+    )
+
+    audit_writer_async: bool = Field(default=True, env="AUDIT_WRITER_ASYNC")
+    audit_batch_size: int = Field(default=100, ge=1, env="AUDIT_BATCH_SIZE")
+    audit_flush_interval_seconds: float = Field(
+        default=1.0, gt=0, env="AUDIT_FLUSH_INTERVAL_SECONDS"
+    )
+    audit_queue_limit: int = Field(default=10000, ge=1, env="AUDIT_QUEUE_LIMIT")
+
+    # 0 disables the in-process runner; ``flask purge-expired`` still works.
+    maintenance_interval_seconds: float = Field(
+        default=0.0, ge=0, env="MAINTENANCE_INTERVAL_SECONDS"
+    )
+    maintenance_batch_size: int = Field(default=500, ge=1, env="MAINTENANCE_BATCH_SIZE")
+    maintenance_batch_pause_seconds: float = Field(
+        default=0.05, ge=0, env="MAINTENANCE_BATCH_PAUSE_SECONDS"
+    )
+    maintenance_retention_hours: int = Field(
+        default=24, ge=0, env="MAINTENANCE_RETENTION_HOURS"
+    )
+
+    # Off runs OnlyOffice save downloads inside the callback request.
+    doc_save_async: bool = Field(default=True, env="DOC_SAVE_ASYNC")
+    doc_save_poll_seconds: float = Field(default=5.0, gt=0, env="DOC_SAVE_POLL_SECONDS")
+    doc_save_timeout_seconds: float = Field(
+        default=120.0, gt=0, env="DOC_SAVE_TIMEOUT_SECONDS"
+    )
+    doc_save_max_attempts: int = Field(default=5, ge=1, env="DOC_SAVE_MAX_ATTEMPTS")
+
+    # 0 indexes documents inline after the commit that changed them.
+    search_index_workers: int = Field(default=2, ge=0, env="SEARCH_INDEX_WORKERS")
+    search_max_text_chars: int = Field(
+        default=1_000_000, ge=0, env="SEARCH_MAX_TEXT_CHARS"
+    )
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -63,6 +149,17 @@ class Settings(BaseSettings):
             raise ValueError("API_KEYS_JSON must be valid JSON") from exc
         return parsed
 
+    @validator("file_offload", pre=True)
+    def _check_file_offload(cls, value: Optional[str]) -> Optional[str]:
+        if not value:
+            return None
+        value = str(value).strip().lower()
+        if value not in FILE_OFFLOAD_MODES:
+            raise ValueError(
+                f"FILE_OFFLOAD must be one of: {', '.join(FILE_OFFLOAD_MODES)}"
+            )
+        return value
+
     @validator("cors_allowed_origins", pre=True)
     def _split_origins(cls, value: Union[str, List[str], None]) -> List[str]:
         if value is None or value == "":
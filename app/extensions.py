@@ -15,6 +15,7 @@ from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import MetaData
 
 from .config import Settings
+from .utils import rate_storage  # noqa: F401  registers the mmap:// scheme
 
 metadata = MetaData(
     naming_convention={
@@ -50,7 +51,13 @@ def init_extensions(app: Flask, settings: Settings) -> None:
         JWT_REFRESH_TOKEN_EXPIRES=settings.jwt_refresh_delta,
     )
 
-    storage_uri = settings.rate_redis_url or "memory://"
+    # Without Redis, a shared file keeps limits per host rather than per worker.
+    local_uri = (
+        f"mmap://{settings.rate_limit_shared_file}"
+        if settings.rate_limit_shared_file
+        else "memory://"
+    )
+    storage_uri = settings.rate_redis_url or local_uri
     if storage_uri.startswith("redis://"):
         parsed = urlparse(storage_uri)
         host = parsed.hostname
@@ -60,11 +67,18 @@ def init_extensions(app: Flask, settings: Settings) -> None:
                 socket.getaddrinfo(host, port)
         except socket.gaierror:
             app.logger.warning(
-                "Redis host %s unreachable, falling back to in-memory rate limiting.",
+                "Redis host %s unreachable, falling back to %s rate limiting.",
                 host,
+                local_uri,
             )
-            storage_uri = "memory://"
+            storage_uri = local_uri
     app.config["RATELIMIT_STORAGE_URI"] = storage_uri
+    strategy = settings.rate_limit_strategy
+    if strategy is None and storage_uri.startswith("mmap://"):
+        # Avoids the burst a fixed window allows at each boundary.
+        strategy = "sliding-window-counter"
+    if strategy is not None:
+        app.config["RATELIMIT_STRATEGY"] = strategy
     limiter.init_app(app)
     db.init_app(app)
     migrate.init_app(app, db=db)
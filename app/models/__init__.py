@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Any, Dict, Type
+from typing import Any, ClassVar, Dict, Tuple, Type
 
 from sqlalchemy.orm import Mapped, mapped_column
 
@@ -26,6 +26,8 @@ class BaseModel(db.Model, TimestampMixin):  # type: ignore[name-defined]
     __abstract__ = True
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # Columns maintained by the application that generic CRUD must not write.
+    crud_read_only: ClassVar[Tuple[str, ...]] = ()
 
     def to_dict(self) -> Dict[str, Any]:
         """Serialize simple column attributes."""
@@ -36,8 +38,12 @@ class BaseModel(db.Model, TimestampMixin):  # type: ignore[name-defined]
 
 from . import (  # noqa: E402
     activity_log,
+    api_key,
+    cache_version,
     doc,
     doc_comment,
+    doc_save_job,
+    doc_search,
     doc_share,
     doc_version,
     file_change_requests,
@@ -45,20 +51,25 @@ from . import (  # noqa: E402
     file_ledger_history,
     invite,
     lab_history,
+    lab_sample_counter,
     labs,
     login_log,
     password_reset_tokens,
     permission,
+    reagent_balance_checkpoints,
+    reagent_consumptions,
     reagent_kit_history,
     reagent_kit_specs,
     reagent_kits,
     reagent_production_history,
     reagent_productions,
     reagent_spec_history,
+    revoked_token,
     role,
     role_permission,
     sample_history,
     samples,
+    storage_location,
     user,
     user_permissions,
     user_role,
@@ -90,6 +101,7 @@ TABLE_MODELS: Dict[str, Type[BaseModel]] = {
         role_permission.RolePermission,
         sample_history.SampleHistory,
         samples.Sample,
+        storage_location.StorageLocation,
         user.User,
         user_permissions.UserPermissionEntry,
         user_role.UserRole,
@@ -101,8 +113,12 @@ __all__ = [
     "TABLE_MODELS",
     "TimestampMixin",
     "activity_log",
+    "api_key",
+    "cache_version",
     "doc",
     "doc_comment",
+    "doc_save_job",
+    "doc_search",
     "doc_share",
     "doc_version",
     "file_change_requests",
@@ -110,20 +126,25 @@ __all__ = [
     "file_ledger_history",
     "invite",
     "lab_history",
+    "lab_sample_counter",
     "labs",
     "login_log",
     "password_reset_tokens",
     "permission",
+    "reagent_balance_checkpoints",
+    "reagent_consumptions",
     "reagent_kit_history",
     "reagent_kit_specs",
     "reagent_kits",
     "reagent_production_history",
     "reagent_productions",
     "reagent_spec_history",
+    "revoked_token",
     "role",
     "role_permission",
     "sample_history",
     "samples",
+    "storage_location",
     "user",
     "user_permissions",
     "user_role",
@@ -0,0 +1,37 @@
+"""Hashed API keys exchanged for service tokens."""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import JSON, DateTime, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from . import BaseModel
+
+
+class ApiKey(BaseModel):
+    """An API key, stored only as the SHA-256 of its secret.
+
+    Keys are random and long, so a fast unsalted digest is enough and keeps
+    the lookup a unique-index probe. ``prefix`` holds the first characters
+    of the key to tell keys apart in listings.
+    """
+
+    __tablename__ = "api_keys"
+
+    name: Mapped[str] = mapped_column(String(128), nullable=False)
+    prefix: Mapped[str] = mapped_column(String(16), nullable=False)
+    key_hash: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    scopes: Mapped[list] = mapped_column(JSON, nullable=False, default=list)
+    expires_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    revoked_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_used_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    def to_dict(self) -> dict:
+        data = super().to_dict()
+        data.pop("key_hash", None)
+        return data
+
+
+__all__ = ["ApiKey"]
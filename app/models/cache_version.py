@@ -0,0 +1,25 @@
+"""Named change counters for caches shared across workers."""
+
+from __future__ import annotations
+
+from sqlalchemy import Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from . import BaseModel
+
+
+class CacheVersion(BaseModel):
+    """Monotonic counter bumped in the same transaction as a cached write.
+
+    Bumping updates a single row, so concurrent writers serialize on it and
+    committed versions appear in order; workers compare it against the last
+    value they loaded to find out whether (and what) to reload.
+    """
+
+    __tablename__ = "cache_versions"
+
+    name: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+__all__ = ["CacheVersion"]
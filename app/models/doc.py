@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from sqlalchemy import ForeignKey, String, Text
+from sqlalchemy import ForeignKey, Integer, String, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from . import BaseModel
@@ -12,10 +12,20 @@ class Doc(BaseModel):
     """Metadata for documents managed by OnlyOffice."""
 
     __tablename__ = "docs"
+    # Only ever moves forward, or editors could rejoin a finished session.
+    crud_read_only = ("content_version",)
 
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     path: Mapped[str] = mapped_column(String(512), nullable=False)
+    # Blob holding the content last snapshotted, see app.utils.blobs.
+    blob_sha256: Mapped[str | None] = mapped_column(
+        String(64), nullable=True, index=True
+    )
     description: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Part of the editor document key: bumped when ``path`` or ``blob_sha256``
+    # changes (see app.services.document_service) and when an editing
+    # session's final save lands.
+    content_version: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
     owner_id: Mapped[int | None] = mapped_column(
         ForeignKey("users.id", ondelete="SET NULL"), nullable=True
     )
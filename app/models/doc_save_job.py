@@ -0,0 +1,49 @@
+"""Queued downloads of documents saved in OnlyOffice."""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from . import BaseModel
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class DocSaveJob(BaseModel):
+    """One save callback whose file still has to be (or was) fetched.
+
+    ``job_key`` is derived from the document key, status and download URL,
+    so a callback the Document Server repeats maps to the same row.
+    """
+
+    __tablename__ = "doc_save_jobs"
+
+    job_key: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    doc_id: Mapped[int] = mapped_column(
+        ForeignKey("docs.id", ondelete="CASCADE"), nullable=False
+    )
+    document_key: Mapped[str] = mapped_column(String(128), nullable=False)
+    status: Mapped[int] = mapped_column(Integer, nullable=False)
+    url: Mapped[str] = mapped_column(Text, nullable=False)
+    user_id: Mapped[int | None] = mapped_column(
+        ForeignKey("users.id", ondelete="SET NULL"), nullable=True
+    )
+    state: Mapped[str] = mapped_column(
+        String(16), nullable=False, default=PENDING, index=True
+    )
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    claimed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    doc_version_id: Mapped[int | None] = mapped_column(
+        ForeignKey("doc_versions.id", ondelete="SET NULL"), nullable=True
+    )
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+
+__all__ = ["DocSaveJob", "PENDING", "RUNNING", "DONE", "FAILED"]
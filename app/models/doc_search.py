@@ -0,0 +1,65 @@
+"""Full-text search index over documents."""
+
+from __future__ import annotations
+
+from sqlalchemy import DDL, ForeignKey, Index, Integer, String, Text, event
+from sqlalchemy.orm import Mapped, mapped_column
+
+from . import BaseModel
+
+# SQLite only: FTS5 table with ``rowid`` = doc id, holding the tokenized
+# name, description and content; see app.services.search_service.
+FTS_TABLE = "doc_search_fts"
+CREATE_FTS = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+    "USING fts5(name, description, content, tokenize = 'unicode61 remove_diacritics 0')"
+)
+DROP_FTS = f"DROP TABLE IF EXISTS {FTS_TABLE}"
+
+
+class DocSearchEntry(BaseModel):
+    """Text extracted from a document's working file.
+
+    ``source`` fingerprints the file it came from (mtime and size), so a
+    reindex only extracts again when the file was replaced.
+    """
+
+    __tablename__ = "doc_search_entries"
+
+    doc_id: Mapped[int] = mapped_column(
+        ForeignKey("docs.id", ondelete="CASCADE"), unique=True, nullable=False
+    )
+    source: Mapped[str] = mapped_column(String(64), nullable=False, default="")
+    content: Mapped[str] = mapped_column(Text, nullable=False, default="")
+
+
+class DocSearchTerm(BaseModel):
+    """Posting of the inverted index used where FTS5 is unavailable.
+
+    ``weight`` counts the term's occurrences, with name and description
+    hits weighing more than content hits.
+    """
+
+    __tablename__ = "doc_search_terms"
+    __table_args__ = (Index("ix_doc_search_terms_term_doc_id", "term", "doc_id"),)
+
+    term: Mapped[str] = mapped_column(String(64), nullable=False)
+    doc_id: Mapped[int] = mapped_column(
+        ForeignKey("docs.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    weight: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+
+
+event.listen(
+    DocSearchEntry.__table__,
+    "after_create",
+    DDL(CREATE_FTS).execute_if(dialect="sqlite"),
+)
+event.listen(
+    DocSearchEntry.__table__,
+    "after_drop",
+    DDL(DROP_FTS).execute_if(dialect="sqlite"),
+)
+
+
+__all__ = ["DocSearchEntry", "DocSearchTerm", "FTS_TABLE"]
@@ -15,7 +15,12 @@ class DocVersion(BaseModel):
         ForeignKey("docs.id", ondelete="CASCADE"), nullable=False
     )
     version_number: Mapped[int] = mapped_column(Integer, nullable=False)
+    # For snapshots, the blob's path under BASE_FILE_DIR.
     path: Mapped[str] = mapped_column(String(512), nullable=False)
+    blob_sha256: Mapped[str | None] = mapped_column(
+        String(64), nullable=True, index=True
+    )
+    size: Mapped[int | None] = mapped_column(Integer, nullable=True)
     created_by: Mapped[int | None] = mapped_column(
         ForeignKey("users.id", ondelete="SET NULL"), nullable=True
     )
@@ -33,8 +33,5 @@ class InviteCode(BaseModel):
             return False
         return True
 
-    def mark_used(self) -> None:
-        self.uses += 1
-
 
 __all__ = ["InviteCode"]
@@ -0,0 +1,30 @@
+"""Incrementally maintained per-lab sample counts by status."""
+
+from __future__ import annotations
+
+from sqlalchemy import ForeignKey, Integer, String, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from . import BaseModel
+
+
+class LabSampleCounter(BaseModel):
+    """Number of samples in ``lab_id`` currently in ``status``.
+
+    Rows are adjusted in the same transaction as every sample write, see
+    :mod:`app.services.counter_service`.
+    """
+
+    __tablename__ = "lab_sample_counters"
+    __table_args__ = (
+        UniqueConstraint("lab_id", "status", name="uq_lab_sample_counters_lab_status"),
+    )
+
+    lab_id: Mapped[int] = mapped_column(
+        ForeignKey("labs.id", ondelete="CASCADE"), nullable=False
+    )
+    status: Mapped[str] = mapped_column(String(32), nullable=False)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+__all__ = ["LabSampleCounter"]
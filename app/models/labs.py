@@ -16,6 +16,10 @@ class Lab(BaseModel):
     location: Mapped[str | None] = mapped_column(String(255), nullable=True)
 
     samples = relationship("Sample", back_populates="lab", cascade="all, delete-orphan")
+    sample_counters = relationship("LabSampleCounter", cascade="all, delete-orphan")
+    storage_locations = relationship(
+        "StorageLocation", back_populates="lab", cascade="all, delete-orphan"
+    )
 
 
 __all__ = ["Lab"]
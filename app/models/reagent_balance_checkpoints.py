@@ -0,0 +1,33 @@
+"""Periodic balance snapshots of reagent batch ledgers."""
+
+from __future__ import annotations
+
+from sqlalchemy import ForeignKey, Integer, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from . import BaseModel
+
+
+class ReagentBalanceCheckpoint(BaseModel):
+    """Balance of ``production_id`` after ledger movement ``seq``.
+
+    Written every ``CHECKPOINT_INTERVAL`` movements by
+    :mod:`app.services.reagent_stock_service`, so replaying a balance never
+    sums more than one interval of movements.
+    """
+
+    __tablename__ = "reagent_balance_checkpoints"
+    __table_args__ = (
+        UniqueConstraint(
+            "production_id", "seq", name="uq_reagent_balance_checkpoints_production_seq"
+        ),
+    )
+
+    production_id: Mapped[int] = mapped_column(
+        ForeignKey("reagent_productions.id", ondelete="CASCADE"), nullable=False
+    )
+    seq: Mapped[int] = mapped_column(Integer, nullable=False)
+    balance: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+__all__ = ["ReagentBalanceCheckpoint"]
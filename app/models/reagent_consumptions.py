@@ -0,0 +1,39 @@
+"""Stock movements of reagent production batches."""
+
+from __future__ import annotations
+
+from sqlalchemy import ForeignKey, Integer, String, Text, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from . import BaseModel
+
+MOVEMENT_KINDS = ("consume", "restock", "adjust")
+
+
+class ReagentConsumption(BaseModel):
+    """One signed movement in a batch's stock ledger.
+
+    ``seq`` numbers the movements of a batch from 1; running balances are
+    derived from the nearest :class:`ReagentBalanceCheckpoint`.
+    """
+
+    __tablename__ = "reagent_consumptions"
+    __table_args__ = (
+        UniqueConstraint(
+            "production_id", "seq", name="uq_reagent_consumptions_production_seq"
+        ),
+    )
+
+    production_id: Mapped[int] = mapped_column(
+        ForeignKey("reagent_productions.id", ondelete="CASCADE"), nullable=False
+    )
+    seq: Mapped[int] = mapped_column(Integer, nullable=False)
+    kind: Mapped[str] = mapped_column(String(16), nullable=False)
+    delta: Mapped[int] = mapped_column(Integer, nullable=False)
+    user_id: Mapped[int | None] = mapped_column(
+        ForeignKey("users.id", ondelete="SET NULL"), nullable=True
+    )
+    notes: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+
+__all__ = ["MOVEMENT_KINDS", "ReagentConsumption"]
@@ -1,21 +1,212 @@
-"""Reagent kit specifications."""
+"""Reagent kit specifications.
+
+Spec revisions of a kit are stored as periodic zlib-compressed full snapshots
+with the revisions in between kept as line deltas against their snapshot, so a
+revision is rebuilt from at most two rows. Rows written before delta storage
+keep their plain ``content`` text until re-encoded.
+"""
 
 from __future__ import annotations
 
-from sqlalchemy import ForeignKey, String, Text
-from sqlalchemy.orm import Mapped, mapped_column
+import zlib
+from typing import Any, Callable, Collection, Dict, Optional, Tuple
+
+from sqlalchemy import ForeignKey, Index, LargeBinary, String, Text, event
+from sqlalchemy import func, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Mapped, mapped_column, object_session, relationship
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy.orm.attributes import set_committed_value
 
+from ..utils.cache import LRUCache
+from ..utils.delta import apply_delta, compress_text, decompress_text, encode_delta
 from . import BaseModel
 
+# A new full snapshot is written after this many revisions (snapshot included).
+SNAPSHOT_INTERVAL = 16
+CONTENT_CACHE_SIZE = 512
+
+# Keyed by (spec id, CRC32 of payload); deltas carry their base checksum, so a
+# key always maps to the same text.
+_content_cache: LRUCache[Tuple[int, int], str] = LRUCache(maxsize=CONTENT_CACHE_SIZE)
+
+
+def _decode(
+    spec_id: int,
+    stored_content: Optional[str],
+    payload: Optional[bytes],
+    base_spec_id: Optional[int],
+    load_base: Callable[[int], str],
+) -> str:
+    if payload is None:
+        return stored_content or ""
+    key = (spec_id, zlib.crc32(payload))
+    text = _content_cache.get(key)
+    if text is None:
+        if base_spec_id is None:
+            text = decompress_text(payload)
+        else:
+            text = apply_delta(load_base(base_spec_id), payload)
+        _content_cache.set(key, text)
+    return text
+
 
 class ReagentKitSpec(BaseModel):
     __tablename__ = "reagent_kit_specs"
+    # Delta chains are built at flush time; writing them directly breaks them.
+    crud_read_only = ("payload", "base_spec_id")
+    __table_args__ = (
+        Index("ix_reagent_kit_specs_kit_id_id", "kit_id", "id"),
+        Index("ix_reagent_kit_specs_kit_id_created_at", "kit_id", "created_at"),
+    )
 
     kit_id: Mapped[int] = mapped_column(
         ForeignKey("reagent_kits.id", ondelete="CASCADE"), nullable=False
     )
     version: Mapped[str] = mapped_column(String(32), nullable=False)
-    content: Mapped[str] = mapped_column(Text, nullable=False)
+    # Plain text of legacy rows; NULL once the revision lives in ``payload``.
+    stored_content: Mapped[str | None] = mapped_column("content", Text, nullable=True)
+    payload: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+    base_spec_id: Mapped[int | None] = mapped_column(
+        ForeignKey("reagent_kit_specs.id"), nullable=True, index=True
+    )
+
+    kit = relationship("ReagentKit", back_populates="specs")
+    base = relationship("ReagentKitSpec", remote_side="ReagentKitSpec.id")
+
+    @property
+    def content(self) -> str:
+        pending = self.__dict__.get("_pending_content")
+        if pending is not None:
+            return pending
+        return _decode(
+            self.id,
+            self.stored_content,
+            self.payload,
+            self.base_spec_id,
+            lambda _base_id: self.base.content,
+        )
+
+    @content.setter
+    def content(self, value: str) -> None:
+        # Encoded at flush time, once the kit's current snapshot is known.
+        self.__dict__["_pending_content"] = value
+        self.stored_content = value
+        self.payload = None
+        self.base_spec_id = None
+
+    @property
+    def storage(self) -> str:
+        if self.payload is None:
+            return "plain"
+        return "snapshot" if self.base_spec_id is None else "delta"
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = super().to_dict()
+        data.pop("payload")
+        data["storage"] = self.storage
+        return data
+
+
+_specs = ReagentKitSpec.__table__
+
+
+def _load_content(connection: Connection, spec_id: int) -> str:
+    row = connection.execute(
+        select(_specs.c.content, _specs.c.payload, _specs.c.base_spec_id).where(
+            _specs.c.id == spec_id
+        )
+    ).one()
+    return _decode(
+        spec_id,
+        row.content,
+        row.payload,
+        row.base_spec_id,
+        lambda base_id: _load_content(connection, base_id),
+    )
+
+
+def _encode(connection: Connection, target: ReagentKitSpec) -> None:
+    """Store ``target``'s pending text as a delta, or a snapshot when due."""
+    text = target.__dict__["_pending_content"]
+    target.stored_content = None
+    target.base_spec_id = None
+    target.payload = compress_text(text)
+
+    previous_query = select(_specs.c.id, _specs.c.base_spec_id).where(
+        _specs.c.kit_id == target.kit_id
+    )
+    if target.id is not None:
+        previous_query = previous_query.where(_specs.c.id < target.id)
+    previous = connection.execute(
+        previous_query.order_by(_specs.c.id.desc()).limit(1)
+    ).first()
+    if previous is None:
+        return
+    snapshot_id = previous.base_spec_id or previous.id
+    chained = connection.execute(
+        select(func.count()).where(_specs.c.base_spec_id == snapshot_id)
+    ).scalar_one()
+    if chained >= SNAPSHOT_INTERVAL - 1:
+        return
+    delta = encode_delta(_load_content(connection, snapshot_id), text)
+    if len(delta) < len(target.payload):
+        target.payload = delta
+        target.base_spec_id = snapshot_id
+
+
+def _materialize_dependents(
+    connection: Connection, target: ReagentKitSpec, skip: Collection[int] = ()
+) -> None:
+    """Turn deltas based on ``target`` into snapshots before its text changes."""
+    dependents = connection.execute(
+        select(_specs.c.id, _specs.c.payload).where(_specs.c.base_spec_id == target.id)
+    ).all()
+    dependents = [row for row in dependents if row.id not in skip]
+    if not dependents:
+        return
+    base_text = _load_content(connection, target.id)
+    session: Any = object_session(target)
+    for row in dependents:
+        payload = compress_text(apply_delta(base_text, row.payload))
+        connection.execute(
+            update(_specs)
+            .where(_specs.c.id == row.id)
+            .values(payload=payload, base_spec_id=None)
+        )
+        loaded = session.identity_map.get(identity_key(ReagentKitSpec, row.id))
+        if loaded is not None:
+            set_committed_value(loaded, "payload", payload)
+            set_committed_value(loaded, "base_spec_id", None)
+            set_committed_value(loaded, "base", None)
+
+
+@event.listens_for(ReagentKitSpec, "before_insert")
+def _encode_new_spec(_mapper: Any, connection: Connection, target: Any) -> None:
+    if "_pending_content" in target.__dict__:
+        _encode(connection, target)
+
+
+@event.listens_for(ReagentKitSpec, "before_update")
+def _encode_changed_spec(_mapper: Any, connection: Connection, target: Any) -> None:
+    if "_pending_content" in target.__dict__:
+        _materialize_dependents(connection, target)
+        _encode(connection, target)
+
+
+@event.listens_for(ReagentKitSpec, "before_delete")
+def _detach_dependents(_mapper: Any, connection: Connection, target: Any) -> None:
+    session: Any = object_session(target)
+    deleted = {obj.id for obj in session.deleted if isinstance(obj, ReagentKitSpec)}
+    _materialize_dependents(connection, target, skip=deleted)
+
+
+@event.listens_for(ReagentKitSpec, "after_insert")
+@event.listens_for(ReagentKitSpec, "after_update")
+def _cache_written_spec(_mapper: Any, _connection: Connection, target: Any) -> None:
+    text = target.__dict__.pop("_pending_content", None)
+    if text is not None and target.payload is not None:
+        _content_cache.set((target.id, zlib.crc32(target.payload)), text)
 
 
 __all__ = ["ReagentKitSpec"]
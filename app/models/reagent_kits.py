@@ -2,10 +2,25 @@
 
 from __future__ import annotations
 
-from sqlalchemy import String, Text
-from sqlalchemy.orm import Mapped, mapped_column
+from typing import Any
+
+from sqlalchemy import String, Text, and_, func, select
+from sqlalchemy.orm import Mapped, aliased, mapped_column, relationship
 
 from . import BaseModel
+from .reagent_kit_specs import ReagentKitSpec
+
+
+def _latest_spec_join() -> Any:
+    """Join condition limiting ``ReagentKit.latest_spec`` to the newest spec row."""
+    newer = aliased(ReagentKitSpec)
+    latest_id = (
+        select(func.max(newer.id))
+        .where(newer.kit_id == ReagentKitSpec.kit_id)
+        .correlate(ReagentKitSpec)
+        .scalar_subquery()
+    )
+    return and_(ReagentKitSpec.kit_id == ReagentKit.id, ReagentKitSpec.id == latest_id)
 
 
 class ReagentKit(BaseModel):
@@ -14,5 +29,17 @@ class ReagentKit(BaseModel):
     name: Mapped[str] = mapped_column(String(128), unique=True, nullable=False)
     description: Mapped[str | None] = mapped_column(Text, nullable=True)
 
+    specs = relationship(
+        "ReagentKitSpec",
+        back_populates="kit",
+        cascade="all, delete-orphan",
+        order_by="ReagentKitSpec.id",
+    )
+    # Row-limited, so ``selectinload`` fetches one spec per kit, not every revision.
+    latest_spec = relationship(
+        ReagentKitSpec, primaryjoin=_latest_spec_join, viewonly=True, uselist=False
+    )
+    productions = relationship("ReagentProduction", back_populates="kit")
+
 
 __all__ = ["ReagentKit"]
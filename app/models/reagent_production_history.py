@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from sqlalchemy import ForeignKey, String, Text
+from sqlalchemy import ForeignKey, Index, String, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from . import BaseModel
@@ -10,6 +10,13 @@ from . import BaseModel
 
 class ReagentProductionHistory(BaseModel):
     __tablename__ = "reagent_production_history"
+    __table_args__ = (
+        Index(
+            "ix_reagent_production_history_production_id_created_at",
+            "production_id",
+            "created_at",
+        ),
+    )
 
     production_id: Mapped[int] = mapped_column(
         ForeignKey("reagent_productions.id", ondelete="CASCADE"), nullable=False
@@ -2,19 +2,38 @@
 
 from __future__ import annotations
 
-from sqlalchemy import ForeignKey, String
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import ForeignKey, Index, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from . import BaseModel
 
 
 class ReagentProduction(BaseModel):
+    """A produced batch of a kit.
+
+    ``balance`` and ``movement_count`` cache the head of the batch's stock
+    ledger and are only changed together with a new ledger row.
+    """
+
     __tablename__ = "reagent_productions"
+    # Stock moves through the ledger, see app.services.reagent_stock_service.
+    crud_read_only = ("initial_quantity", "balance", "movement_count")
+    __table_args__ = (
+        Index("ix_reagent_productions_kit_id_id", "kit_id", "id"),
+        Index("ix_reagent_productions_kit_id_created_at", "kit_id", "created_at"),
+        Index("ix_reagent_productions_balance", "balance"),
+    )
 
     kit_id: Mapped[int] = mapped_column(
         ForeignKey("reagent_kits.id", ondelete="RESTRICT"), nullable=False
     )
     batch_code: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    unit: Mapped[str | None] = mapped_column(String(16), nullable=True)
+    initial_quantity: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    balance: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    movement_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    kit = relationship("ReagentKit", back_populates="productions")
 
 
 __all__ = ["ReagentProduction"]
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from sqlalchemy import ForeignKey, String, Text
+from sqlalchemy import ForeignKey, Index, String, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from . import BaseModel
@@ -10,6 +10,9 @@ from . import BaseModel
 
 class ReagentSpecHistory(BaseModel):
     __tablename__ = "reagent_spec_history"
+    __table_args__ = (
+        Index("ix_reagent_spec_history_spec_id_created_at", "spec_id", "created_at"),
+    )
 
     spec_id: Mapped[int] = mapped_column(
         ForeignKey("reagent_kit_specs.id", ondelete="CASCADE"), nullable=False
@@ -0,0 +1,36 @@
+"""Revoked JWTs, by ``jti``, by user or by API key."""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from . import BaseModel
+
+
+class RevokedToken(BaseModel):
+    """A single revoked token (``jti``) or every token of ``user_id``/``api_key_id``.
+
+    User- and key-wide rows reject tokens issued at or before ``issued_before``.
+    ``seq`` is the ``token_revocations`` cache version the row was written
+    under, see :mod:`app.utils.revocation`; rows past ``expires_at`` only
+    match tokens that are expired anyway.
+    """
+
+    __tablename__ = "revoked_tokens"
+
+    seq: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    jti: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
+    user_id: Mapped[int | None] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True
+    )
+    api_key_id: Mapped[int | None] = mapped_column(
+        ForeignKey("api_keys.id", ondelete="CASCADE"), nullable=True, index=True
+    )
+    issued_before: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+
+__all__ = ["RevokedToken"]
@@ -2,14 +2,22 @@
 
 from __future__ import annotations
 
-from sqlalchemy import ForeignKey, String, Text
+from sqlalchemy import ForeignKey, Index, String, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from . import BaseModel
 
+STATUS_ACTION_PREFIX = "status:"
+
+
+def status_action(status: str) -> str:
+    """History action recorded when a sample moves to ``status``."""
+    return f"{STATUS_ACTION_PREFIX}{status}"[:32]
+
 
 class SampleHistory(BaseModel):
     __tablename__ = "sample_history"
+    __table_args__ = (Index("ix_sample_history_created_at", "created_at"),)
 
     sample_id: Mapped[int] = mapped_column(
         ForeignKey("samples.id", ondelete="CASCADE"), nullable=False
@@ -20,4 +28,4 @@ class SampleHistory(BaseModel):
     sample = relationship("Sample", back_populates="histories")
 
 
-__all__ = ["SampleHistory"]
+__all__ = ["STATUS_ACTION_PREFIX", "SampleHistory", "status_action"]
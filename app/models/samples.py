@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from sqlalchemy import ForeignKey, String, Text
+from sqlalchemy import ForeignKey, Integer, String, Text, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from . import BaseModel
@@ -10,6 +10,11 @@ from . import BaseModel
 
 class Sample(BaseModel):
     __tablename__ = "samples"
+    __table_args__ = (
+        UniqueConstraint(
+            "storage_box_id", "storage_position", name="uq_samples_storage_slot"
+        ),
+    )
 
     lab_id: Mapped[int] = mapped_column(
         ForeignKey("labs.id", ondelete="CASCADE"), nullable=False
@@ -17,8 +22,13 @@ class Sample(BaseModel):
     code: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
     status: Mapped[str] = mapped_column(String(32), default="pending")
     description: Mapped[str | None] = mapped_column(Text, nullable=True)
+    storage_box_id: Mapped[int | None] = mapped_column(
+        ForeignKey("storage_locations.id", ondelete="SET NULL"), nullable=True
+    )
+    storage_position: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
     lab = relationship("Lab", back_populates="samples")
+    storage_box = relationship("StorageLocation")
 
     histories = relationship(
         "SampleHistory", back_populates="sample", cascade="all, delete-orphan"
@@ -0,0 +1,88 @@
+"""Hierarchical storage locations (unit → rack → box) inside a lab."""
+
+from __future__ import annotations
+
+from typing import List
+
+from sqlalchemy import ForeignKey, Integer, LargeBinary, String
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from ..utils import bitmap
+from . import BaseModel
+
+STORAGE_KINDS = ("unit", "rack", "box")
+PARENT_KIND = {"unit": None, "rack": "unit", "box": "rack"}
+
+
+class StorageLocation(BaseModel):
+    """A freezer/unit, rack or box; only boxes hold sample positions.
+
+    Box occupancy is kept as a little-endian bitmap where bit ``n`` is set when
+    position ``n`` (0-based, row-major) holds a sample.
+    """
+
+    __tablename__ = "storage_locations"
+    # The bitmap follows sample placements, see app.services.storage_service.
+    crud_read_only = ("rows", "cols", "occupancy")
+
+    lab_id: Mapped[int] = mapped_column(
+        ForeignKey("labs.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    parent_id: Mapped[int | None] = mapped_column(
+        ForeignKey("storage_locations.id", ondelete="CASCADE"), nullable=True
+    )
+    kind: Mapped[str] = mapped_column(String(16), nullable=False)
+    name: Mapped[str] = mapped_column(String(128), nullable=False)
+    rows: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    cols: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    occupancy: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+
+    lab = relationship("Lab", back_populates="storage_locations")
+    parent = relationship(
+        "StorageLocation", remote_side="StorageLocation.id", back_populates="children"
+    )
+    children: Mapped[List["StorageLocation"]] = relationship(
+        "StorageLocation",
+        back_populates="parent",
+        cascade="all, delete-orphan",
+    )
+
+    @property
+    def capacity(self) -> int:
+        if self.kind != "box":
+            return 0
+        return (self.rows or 0) * (self.cols or 0)
+
+    @property
+    def occupied_mask(self) -> int:
+        return bitmap.from_bytes(self.occupancy)
+
+    @occupied_mask.setter
+    def occupied_mask(self, mask: int) -> None:
+        self.occupancy = bitmap.to_bytes(mask, self.capacity)
+
+    @property
+    def free_mask(self) -> int:
+        return bitmap.full_mask(self.capacity) & ~self.occupied_mask
+
+    def is_free(self, position: int) -> bool:
+        return 0 <= position < self.capacity and bool(self.free_mask >> position & 1)
+
+    def occupy(self, position: int) -> None:
+        self.occupied_mask = self.occupied_mask | (1 << position)
+
+    def release(self, position: int) -> None:
+        self.occupied_mask = self.occupied_mask & ~(1 << position)
+
+    def to_dict(self) -> dict[str, object]:
+        data = super().to_dict()
+        data.pop("occupancy", None)
+        if self.kind == "box":
+            used = bitmap.popcount(self.occupied_mask)
+            data["capacity"] = self.capacity
+            data["occupied"] = used
+            data["free"] = self.capacity - used
+        return data
+
+
+__all__ = ["PARENT_KIND", "STORAGE_KINDS", "StorageLocation"]
@@ -6,17 +6,32 @@ from datetime import datetime
 from typing import TYPE_CHECKING, List
 
 from sqlalchemy import Boolean, DateTime, String
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
 from . import BaseModel
 
 
+def normalize_login(value: str) -> str:
+    """Canonical form used for case-insensitive username/email lookups."""
+    return value.strip().lower()
+
+
 class User(BaseModel):
     """Represents an authenticated platform user."""
 
     __tablename__ = "users"
+    # Derived from ``email``/``username`` by ``_sync_normalized``.
+    crud_read_only = ("email_normalized", "username_normalized")
 
     email: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
     username: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    # Maintained from ``email``/``username`` so logins are an indexed equality
+    # match instead of ILIKE, which cannot use the unique indexes above.
+    email_normalized: Mapped[str] = mapped_column(
+        String(255), nullable=False, index=True
+    )
+    username_normalized: Mapped[str] = mapped_column(
+        String(64), nullable=False, index=True
+    )
     password_hash: Mapped[str] = mapped_column(String(255), nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     is_admin: Mapped[bool] = mapped_column(Boolean, default=False)
@@ -39,6 +54,11 @@ class User(BaseModel):
         "DocComment", back_populates="author", cascade="all, delete-orphan"
     )
 
+    @validates("email", "username")
+    def _sync_normalized(self, key: str, value: str) -> str:
+        setattr(self, f"{key}_normalized", normalize_login(value))
+        return value
+
     def has_scope(self, scope: str) -> bool:
         return any(permission.scope == scope for permission in self.permissions)
 
@@ -49,6 +69,8 @@ class User(BaseModel):
     def to_dict(self) -> dict[str, object]:
         data = super().to_dict()
         data.pop("password_hash", None)
+        data.pop("email_normalized", None)
+        data.pop("username_normalized", None)
         data["roles"] = [
             assignment.role.name for assignment in self.roles if assignment.role
         ]
@@ -63,4 +85,4 @@ if TYPE_CHECKING:
     from .doc_comment import DocComment
 
 
-__all__ = ["User"]
+__all__ = ["User", "normalize_login"]
@@ -2,12 +2,13 @@
 
 from __future__ import annotations
 
+import csv
+import io
 from dataclasses import dataclass
 from typing import Iterable, Optional
 
 from flask import Blueprint, flash, redirect, render_template, request, url_for
-import sqlalchemy as sa
-from sqlalchemy import or_
+from sqlalchemy import case, or_
 
 from ..extensions import db
 from ..models.activity_log import ActivityLog
@@ -18,22 +19,29 @@ from ..models.doc_version import DocVersion
 from ..models.login_log import LoginLog
 from ..models.role import Role
 from ..models.role_permission import RolePermission
-from ..models.user import User
+from ..models.user import User, normalize_login
 from ..models.user_permissions import UserPermissionEntry
 from ..models.user_role import UserRole
 from ..services.auth_service import AuthService
-from ..utils.errors import UnauthorizedError
+from ..services.document_service import document_service
+from ..services.search_service import search_service
+from ..utils.audit import record_activity
+from ..utils.errors import APIError, UnauthorizedError
+from ..utils.identity import UserSnapshot
+from ..utils.revocation import revoke_user_tokens
 from ..utils.security import decode_user_token, hash_password
 
 admin_bp = Blueprint("admin", __name__, template_folder="../templates")
 
 auth_service = AuthService()
+# Matches ranked for the document list; the rest are not worth paging to.
+SEARCH_RESULT_LIMIT = 1000
 
 
 @dataclass
 class AdminContext:
     token: str
-    user: User
+    user: UserSnapshot
     decoded: dict
 
 
@@ -44,16 +52,7 @@ def _log_activity(
     target_id: str | None,
     details: dict | None = None,
 ) -> None:
-    db.session.add(
-        ActivityLog(
-            actor_id=actor_id,
-            action=action,
-            target_type=target_type,
-            target_id=target_id,
-            details=details or {},
-        )
-    )
-    db.session.commit()
+    record_activity(actor_id, action, target_type, target_id, details)
 
 
 def _get_admin_context(token: Optional[str]) -> AdminContext:
@@ -150,7 +149,12 @@ def create_user():
         flash("Username and email are required.", "error")
         return redirect(url_for("admin.list_users", token=ctx.token))
 
-    if User.query.filter(or_(User.username == username, User.email == email)).first():
+    if User.query.filter(
+        or_(
+            User.username_normalized == normalize_login(username),
+            User.email_normalized == normalize_login(email),
+        )
+    ).first():
         flash("User with the same username or email already exists.", "error")
         return redirect(url_for("admin.list_users", token=ctx.token))
 
@@ -182,6 +186,36 @@ def create_user():
     return redirect(url_for("admin.list_users", token=ctx.token))
 
 
+@admin_bp.route("/admin/users/import", methods=["POST"])
+def import_users():
+    token = request.form.get("token")
+    try:
+        ctx = _get_admin_context(token)
+    except UnauthorizedError as exc:
+        flash(exc.message, "error")
+        return redirect(url_for("web.login_page"))
+
+    upload = request.files.get("csv_file")
+    if upload is None or not upload.filename:
+        flash("Choose a CSV file to import.", "error")
+        return redirect(url_for("admin.list_users", token=ctx.token))
+    try:
+        text = upload.read().decode("utf-8-sig")
+    except UnicodeDecodeError:
+        flash("The CSV file must be UTF-8 encoded.", "error")
+        return redirect(url_for("admin.list_users", token=ctx.token))
+
+    rows = list(csv.DictReader(io.StringIO(text)))
+    try:
+        created = auth_service.import_users(rows, created_by=ctx.user)
+    except APIError as exc:
+        errors = (exc.details or {}).get("errors", [])
+        flash(" ".join([exc.message + ".", *errors[:10]]), "error")
+        return redirect(url_for("admin.list_users", token=ctx.token))
+    flash(f"Imported {len(created)} user(s).", "success")
+    return redirect(url_for("admin.list_users", token=ctx.token))
+
+
 @admin_bp.route("/admin/users/<int:user_id>/update", methods=["POST"])
 def update_user(user_id: int):
     token = request.form.get("token")
@@ -312,6 +346,8 @@ def update_user_status(user_id: int):
         )
     elif action == "toggle_active":
         user.is_active = not user.is_active
+        if not user.is_active:
+            revoke_user_tokens(user.id)
         flash(f"Active flag set to {user.is_active}", "success")
         _log_activity(
             ctx.user.id,
@@ -473,9 +509,16 @@ def list_documents():
 
     query = Doc.query
     if search:
-        like = f"%{search.lower()}%"
-        query = query.filter(or_(Doc.name.ilike(like), Doc.description.ilike(like)))
-    documents = query.order_by(Doc.updated_at.desc()).paginate(
+        # Best matches first, from the full-text index.
+        ids = search_service.ranked_ids(search, limit=SEARCH_RESULT_LIMIT)
+        query = query.filter(Doc.id.in_(ids))
+        if ids:
+            query = query.order_by(
+                case({doc_id: rank for rank, doc_id in enumerate(ids)}, value=Doc.id)
+            )
+    else:
+        query = query.order_by(Doc.updated_at.desc())
+    documents = query.paginate(
         page=request.args.get("page", 1, type=int), per_page=20, error_out=False
     )
     return render_template(
@@ -530,28 +573,21 @@ def create_document_version(doc_id: int):
 
     doc = Doc.query.get_or_404(doc_id)
     note = request.form.get("note", "")
-    version_number = (
-        db.session.query(sa.func.coalesce(sa.func.max(DocVersion.version_number), 0))
-        .filter_by(doc_id=doc.id)
-        .scalar()
-        + 1
-    )
-    db.session.add(
-        DocVersion(
-            doc_id=doc.id,
-            version_number=version_number,
-            path=doc.path,
-            created_by=ctx.user.id,
-            note=note,
+    try:
+        version = document_service.create_version(
+            doc, created_by=ctx.user.id, note=note
+        )
+    except APIError as exc:
+        flash(exc.message, "error")
+        return redirect(
+            url_for("admin.document_detail", doc_id=doc.id, token=ctx.token)
         )
-    )
-    db.session.commit()
     _log_activity(
         ctx.user.id,
         "create_doc_version",
         "doc",
         str(doc.id),
-        {"version": version_number},
+        {"version": version.version_number, "sha256": version.blob_sha256},
     )
     flash("Version recorded.", "success")
     return redirect(url_for("admin.document_detail", doc_id=doc.id, token=ctx.token))
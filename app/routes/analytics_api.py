@@ -0,0 +1,47 @@
+"""Reporting endpoints backed by vectorized analytics."""
+
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import jwt_required
+
+from ..config import Settings
+from ..services.analytics_service import sample_analytics_service
+from ..utils.dates import parse_moment
+from ..utils.errors import APIError
+from ..utils.security import require_scope
+
+
+analytics_bp = Blueprint("analytics", __name__)
+
+DEFAULT_WINDOW_DAYS = 365
+
+
+def get_settings() -> Settings:
+    return current_app.config["APP_SETTINGS"]
+
+
+@analytics_bp.route("/analytics/samples/turnaround", methods=["GET"])
+@jwt_required()
+def sample_turnaround():
+    require_scope("db")
+    # Default to whole days so repeated calls share a cache window.
+    end = parse_moment(request.args.get("to"), "to") or datetime.combine(
+        date.today() + timedelta(days=1), datetime.min.time()
+    )
+    start = parse_moment(request.args.get("from"), "from") or (
+        end - timedelta(days=DEFAULT_WINDOW_DAYS)
+    )
+    if start >= end:
+        raise APIError(
+            code="invalid_window", message="from must be before to", status_code=400
+        )
+    result = sample_analytics_service.turnaround(
+        start, end, ttl_seconds=get_settings().analytics_cache_ttl_seconds
+    )
+    return jsonify(result)
+
+
+__all__ = ["analytics_bp"]
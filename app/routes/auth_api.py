@@ -8,7 +8,11 @@ from flask_jwt_extended import get_jwt, get_jwt_identity, jwt_required
 from ..extensions import limiter
 from ..services.auth_service import AuthService
 from ..utils.errors import APIError
-from ..utils.security import ensure_admin, get_current_user
+from ..utils.security import (
+    ensure_admin,
+    get_current_user,
+    get_current_user_record,
+)
 
 
 auth_bp = Blueprint("auth", __name__)
@@ -54,10 +58,18 @@ def refresh():
     return jsonify(tokens)
 
 
+@auth_bp.route("/logout", methods=["POST"])
+@jwt_required(verify_type=False)
+def logout():
+    payload = request.get_json(silent=True) or {}
+    auth_service.logout(get_jwt(), refresh_token=payload.get("refresh_token"))
+    return jsonify({"status": "ok"})
+
+
 @auth_bp.route("/change_password", methods=["POST"])
 @jwt_required()
 def change_password():
-    user = get_current_user()
+    user = get_current_user_record()
     payload = request.get_json(force=True)
     current_password = payload.get("current_password")
     new_password = payload.get("new_password")
@@ -154,3 +166,25 @@ def create_invite():
         created_by=user, email=email, expires_in_hours=expires_in, max_uses=max_uses
     )
     return jsonify({"code": invite.code, "expires_at": invite.expires_at}), 201
+
+
+@auth_bp.route("/invites/bulk", methods=["POST"])
+@jwt_required()
+def create_invites_bulk():
+    ensure_admin()
+    user = get_current_user()
+    payload = request.get_json(force=True)
+    emails = payload.get("emails")
+    if emails is None:
+        emails = [None] * int(payload.get("count", 0))
+    elif not isinstance(emails, list):
+        raise APIError(
+            code="invalid_request", message="emails must be a list", status_code=400
+        )
+    invites = auth_service.create_invites(
+        created_by=user,
+        emails=emails,
+        expires_in_hours=int(payload.get("expires_in_hours", 72)),
+        max_uses=int(payload.get("max_uses", 1)),
+    )
+    return jsonify({"invites": invites, "count": len(invites)}), 201
@@ -2,8 +2,13 @@
 
 from __future__ import annotations
 
+import mimetypes
+import os
+from datetime import datetime, timezone
 from json import dumps
 from pathlib import Path
+from stat import S_ISREG
+from urllib.parse import quote
 
 from flask import Blueprint, current_app, jsonify, request, send_file
 from flask_jwt_extended import jwt_required
@@ -12,8 +17,10 @@ from ..config import Settings
 from ..extensions import db
 from ..models.doc import Doc
 from ..models.file_ledger import FileLedger
+from ..services.doc_save_service import doc_save_service, doc_save_worker
 from ..services.onlyoffice_service import onlyoffice_service
-from ..utils.errors import NotFoundError
+from ..services.search_service import search_service
+from ..utils.errors import APIError, NotFoundError
 from ..utils.pagination import resolve_pagination
 from ..utils.security import get_current_user, require_scope
 
@@ -46,6 +53,32 @@ def list_docs():
     )
 
 
+@docs_bp.route("/docs/search", methods=["GET"])
+@jwt_required()
+def search_docs():
+    require_scope("doc")
+    query = (request.args.get("q") or "").strip()
+    if not query:
+        raise APIError(code="invalid_request", message="Query parameter q is required")
+    pagination = resolve_pagination(request)
+    total, hits = search_service.search(
+        query, limit=pagination.limit, offset=pagination.offset
+    )
+    return jsonify(
+        {
+            "data": [
+                {**hit.doc.to_dict(), "score": hit.score, "snippet": hit.snippet}
+                for hit in hits
+            ],
+            "meta": {
+                "total": total,
+                "page": pagination.page,
+                "size": pagination.size,
+            },
+        }
+    )
+
+
 @docs_bp.route("/docs/<int:doc_id>", methods=["GET"])
 @jwt_required()
 def get_doc(doc_id: int):
@@ -73,8 +106,9 @@ def handle_doc_callback(doc_id: int):
     doc = Doc.query.get(doc_id)
     if not doc:
         raise NotFoundError()
+    settings = get_settings()
     payload = request.get_json(silent=True) or {}
-    parsed = onlyoffice_service.parse_callback(payload)
+    parsed = onlyoffice_service.parse_callback(payload, settings)
     # Persist callback payload for audit
     db.session.add(
         FileLedger(
@@ -84,7 +118,18 @@ def handle_doc_callback(doc_id: int):
         )
     )
     db.session.commit()
-    return jsonify({"status": "received"})
+    if onlyoffice_service.trusted_save(
+        doc, parsed, signed="token" in payload, settings=settings
+    ):
+        if doc_save_service.enqueue(doc, parsed) is not None:
+            doc_save_worker().notify()
+    # The file is fetched in the background; OnlyOffice only needs the ack.
+    return jsonify({"error": 0, "status": "received"})
+
+
+def _file_etag(stat: os.stat_result) -> str:
+    """Hex mtime and size, the format nginx uses, so validators match."""
+    return f"{int(stat.st_mtime):x}-{stat.st_size:x}"
 
 
 @files_bp.route("/files/<path:path>", methods=["GET"])
@@ -94,9 +139,42 @@ def serve_file(path: str):
     requested_path = (base_dir / path).resolve()
     if base_dir not in requested_path.parents:
         raise NotFoundError()
-    if not requested_path.is_file():
+    try:
+        stat = requested_path.stat()
+    except OSError:
+        raise NotFoundError() from None
+    if not S_ISREG(stat.st_mode):
         raise NotFoundError()
-    return send_file(requested_path)
+    if not settings.file_offload:
+        # Werkzeug answers Range (206/416) and If-None-Match/-Modified-Since.
+        return send_file(
+            requested_path, etag=_file_etag(stat), last_modified=stat.st_mtime
+        )
+
+    response = current_app.response_class(
+        mimetype=mimetypes.guess_type(requested_path.name)[0]
+        or "application/octet-stream"
+    )
+    response.headers.set("Content-Disposition", "inline", filename=requested_path.name)
+    response.set_etag(_file_etag(stat))
+    response.last_modified = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+    response.cache_control.no_cache = True
+    # Revalidations are answered here without involving the proxy.
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response
+    # The proxy sends the body, and its length, from the file; without this
+    # Werkzeug would add ``Content-Length: 0`` for the empty body again.
+    response.automatically_set_content_length = False
+    del response.headers["Content-Length"]
+    if settings.file_offload == "x-accel-redirect":
+        relative = requested_path.relative_to(base_dir).as_posix()
+        response.headers["X-Accel-Redirect"] = (
+            f"{settings.file_offload_prefix.rstrip('/')}/{quote(relative)}"
+        )
+    else:
+        response.headers["X-Sendfile"] = str(requested_path)
+    return response
 
 
 __all__ = ["docs_bp", "files_bp"]
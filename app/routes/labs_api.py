@@ -8,7 +8,9 @@ from flask_jwt_extended import jwt_required
 from ..extensions import db
 from ..models.lab_history import LabHistory
 from ..models.labs import Lab
-from ..utils.errors import NotFoundError
+from ..services.counter_service import sample_counter_service
+from ..services.storage_service import storage_service
+from ..utils.errors import APIError, NotFoundError
 from ..utils.pagination import resolve_pagination
 from ..utils.security import require_scope
 
@@ -96,3 +98,58 @@ def delete_lab(lab_id: int):
     db.session.delete(lab)
     db.session.commit()
     return "", 204
+
+
+@labs_bp.route("/labs/<int:lab_id>/counters", methods=["GET"])
+@jwt_required()
+def get_lab_counters(lab_id: int):
+    require_scope("db")
+    lab = Lab.query.get(lab_id)
+    if not lab:
+        raise NotFoundError()
+    counts = sample_counter_service.counts_for_lab(lab.id)
+    return jsonify(
+        {"data": {"lab_id": lab.id, "total": sum(counts.values()), "by_status": counts}}
+    )
+
+
+@labs_bp.route("/labs/<int:lab_id>/storage", methods=["GET"])
+@jwt_required()
+def list_storage_locations(lab_id: int):
+    require_scope("db")
+    lab = Lab.query.get(lab_id)
+    if not lab:
+        raise NotFoundError()
+    locations = storage_service.list_locations(lab.id)
+    return jsonify({"data": [location.to_dict() for location in locations]})
+
+
+@labs_bp.route("/labs/<int:lab_id>/storage", methods=["POST"])
+@jwt_required()
+def create_storage_location(lab_id: int):
+    require_scope("db")
+    lab = Lab.query.get(lab_id)
+    if not lab:
+        raise NotFoundError()
+    payload = request.get_json(force=True)
+    location = storage_service.create_location(lab, payload)
+    return jsonify({"data": location.to_dict()}), 201
+
+
+@labs_bp.route("/labs/<int:lab_id>/free-slots", methods=["GET"])
+@jwt_required()
+def find_free_slots(lab_id: int):
+    require_scope("db")
+    lab = Lab.query.get(lab_id)
+    if not lab:
+        raise NotFoundError()
+    try:
+        count = int(request.args.get("count", 1))
+    except ValueError:
+        count = 0
+    if count < 1:
+        raise APIError(code="invalid_count", message="count must be a positive integer")
+    contiguous = request.args.get("contiguous", "false").lower() in ("1", "true")
+    return jsonify(
+        storage_service.find_free_slots(lab.id, count, contiguous=contiguous)
+    )
@@ -0,0 +1,229 @@
+"""Reagent kit and production batch API."""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required
+
+from ..models.reagent_kits import ReagentKit
+from ..models.reagent_productions import ReagentProduction
+from ..services.reagent_service import parse_includes, reagent_service
+from ..services.reagent_stock_service import reagent_stock_service
+from ..utils.dates import parse_moment
+from ..utils.pagination import resolve_cursor, resolve_pagination
+from ..utils.errors import APIError
+from ..utils.security import get_current_user, require_scope
+
+
+reagents_bp = Blueprint("reagents", __name__)
+
+
+def _kit_payload(
+    kit: ReagentKit,
+    includes: set[str],
+    productions: List[ReagentProduction] | None = None,
+) -> Dict[str, Any]:
+    data = kit.to_dict()
+    if "specs" in includes:
+        data["latest_spec"] = kit.latest_spec.to_dict() if kit.latest_spec else None
+    if productions is not None:
+        data["productions"] = [production.to_dict() for production in productions]
+    return data
+
+
+@reagents_bp.route("/reagent-kits", methods=["GET"])
+@jwt_required()
+def list_reagent_kits():
+    require_scope("db")
+    pagination = resolve_pagination(request)
+    includes = parse_includes(request.args.get("include")) - {"productions"}
+    total, kits = reagent_service.list_kits(
+        offset=pagination.offset, limit=pagination.limit, includes=includes
+    )
+    return jsonify(
+        {
+            "data": [_kit_payload(kit, includes) for kit in kits],
+            "meta": {"total": total, "page": pagination.page, "size": pagination.size},
+        }
+    )
+
+
+@reagents_bp.route("/reagent-kits", methods=["POST"])
+@jwt_required()
+def create_reagent_kit():
+    require_scope("db")
+    payload = request.get_json(force=True)
+    kit = reagent_service.create_kit(payload)
+    return jsonify({"data": kit.to_dict()}), 201
+
+
+@reagents_bp.route("/reagent-kits/<int:kit_id>", methods=["GET"])
+@jwt_required()
+def get_reagent_kit(kit_id: int):
+    require_scope("db")
+    includes = parse_includes(request.args.get("include"))
+    kit = reagent_service.get_kit(kit_id, includes)
+    meta: Dict[str, Any] = {}
+    productions = None
+    if "productions" in includes:
+        page = resolve_cursor(request, prefix="productions_")
+        productions, next_cursor = reagent_service.productions_page(
+            kit.id, cursor=page.cursor, limit=page.limit
+        )
+        meta["productions_next_cursor"] = next_cursor
+    return jsonify({"data": _kit_payload(kit, includes, productions), "meta": meta})
+
+
+@reagents_bp.route("/reagent-kits/<int:kit_id>", methods=["PUT"])
+@jwt_required()
+def update_reagent_kit(kit_id: int):
+    require_scope("db")
+    kit = reagent_service.get_kit(kit_id)
+    payload = request.get_json(force=True)
+    kit = reagent_service.update_kit(kit, payload)
+    return jsonify({"data": kit.to_dict()})
+
+
+@reagents_bp.route("/reagent-kits/<int:kit_id>", methods=["DELETE"])
+@jwt_required()
+def delete_reagent_kit(kit_id: int):
+    require_scope("db")
+    kit = reagent_service.get_kit(kit_id)
+    reagent_service.delete_kit(kit)
+    return "", 204
+
+
+@reagents_bp.route("/reagent-kits/<int:kit_id>/specs", methods=["POST"])
+@jwt_required()
+def create_reagent_spec(kit_id: int):
+    require_scope("db")
+    kit = reagent_service.get_kit(kit_id)
+    payload = request.get_json(force=True)
+    spec = reagent_service.add_spec(kit, payload)
+    return jsonify({"data": spec.to_dict()}), 201
+
+
+@reagents_bp.route("/reagent-kits/<int:kit_id>/specs/diff", methods=["GET"])
+@jwt_required()
+def diff_reagent_specs(kit_id: int):
+    require_scope("db")
+    kit = reagent_service.get_kit(kit_id)
+    diff = reagent_service.diff_specs(
+        kit.id, request.args.get("from"), request.args.get("to")
+    )
+    return jsonify({"data": diff})
+
+
+@reagents_bp.route("/reagent-kits/<int:kit_id>/genealogy", methods=["GET"])
+@jwt_required()
+def reagent_kit_genealogy(kit_id: int):
+    require_scope("db")
+    kit = reagent_service.get_kit(kit_id)
+    # The timeline cursor is an opaque token, so only the limit is reused here.
+    page = resolve_cursor(request, default_size=50)
+    events, next_cursor = reagent_service.genealogy(
+        kit.id,
+        start=parse_moment(request.args.get("from"), "from"),
+        end=parse_moment(request.args.get("to"), "to"),
+        cursor=request.args.get("cursor"),
+        limit=page.limit,
+    )
+    return jsonify(
+        {"data": events, "meta": {"next_cursor": next_cursor, "limit": page.limit}}
+    )
+
+
+@reagents_bp.route("/reagent-kits/<int:kit_id>/productions", methods=["GET"])
+@jwt_required()
+def list_reagent_productions(kit_id: int):
+    require_scope("db")
+    kit = reagent_service.get_kit(kit_id)
+    page = resolve_cursor(request)
+    productions, next_cursor = reagent_service.productions_page(
+        kit.id, cursor=page.cursor, limit=page.limit
+    )
+    return jsonify(
+        {
+            "data": [production.to_dict() for production in productions],
+            "meta": {"next_cursor": next_cursor, "limit": page.limit},
+        }
+    )
+
+
+@reagents_bp.route("/reagent-kits/<int:kit_id>/productions", methods=["POST"])
+@jwt_required()
+def create_reagent_production(kit_id: int):
+    require_scope("db")
+    kit = reagent_service.get_kit(kit_id)
+    payload = request.get_json(force=True)
+    production = reagent_service.create_production(kit, payload)
+    return jsonify({"data": production.to_dict()}), 201
+
+
+@reagents_bp.route(
+    "/reagent-productions/<int:production_id>/movements", methods=["GET"]
+)
+@jwt_required()
+def list_reagent_movements(production_id: int):
+    require_scope("db")
+    production = reagent_stock_service.get_production(production_id)
+    page = resolve_cursor(request)
+    movements, next_cursor = reagent_stock_service.movements_page(
+        production, cursor=page.cursor, limit=page.limit
+    )
+    return jsonify(
+        {
+            "data": movements,
+            "meta": {
+                "balance": production.balance,
+                "next_cursor": next_cursor,
+                "limit": page.limit,
+            },
+        }
+    )
+
+
+@reagents_bp.route(
+    "/reagent-productions/<int:production_id>/movements", methods=["POST"]
+)
+@jwt_required()
+def create_reagent_movement(production_id: int):
+    require_scope("db")
+    user = get_current_user()
+    production = reagent_stock_service.get_production(production_id)
+    payload = request.get_json(force=True)
+    movement = reagent_stock_service.record_movement(production, payload, user.id)
+    return (
+        jsonify({"data": movement.to_dict(), "meta": {"balance": production.balance}}),
+        201,
+    )
+
+
+@reagents_bp.route("/reagent-productions/low-stock", methods=["GET"])
+@jwt_required()
+def low_stock_productions():
+    require_scope("db")
+    try:
+        threshold = int(request.args["threshold"])
+        kit_id = request.args.get("kit_id", type=int)
+    except (KeyError, ValueError) as exc:
+        raise APIError(
+            code="invalid_request",
+            message="threshold must be an integer",
+            status_code=400,
+        ) from exc
+    page = resolve_cursor(request)
+    productions = reagent_stock_service.low_stock(
+        threshold, kit_id=kit_id, limit=page.limit
+    )
+    return jsonify(
+        {
+            "data": [production.to_dict() for production in productions],
+            "meta": {"threshold": threshold, "limit": page.limit},
+        }
+    )
+
+
+__all__ = ["reagents_bp"]
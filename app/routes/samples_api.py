@@ -7,8 +7,9 @@ from flask_jwt_extended import jwt_required
 
 from ..extensions import db
 from ..models.labs import Lab
-from ..models.sample_history import SampleHistory
+from ..models.sample_history import SampleHistory, status_action
 from ..models.samples import Sample
+from ..services.storage_service import storage_service
 from ..utils.errors import APIError, NotFoundError
 from ..utils.pagination import resolve_pagination
 from ..utils.security import require_scope
@@ -50,14 +51,19 @@ def create_sample():
         status=payload.get("status", "pending"),
         description=payload.get("description"),
     )
-    db.session.add(sample)
-    db.session.flush()
-    db.session.add(
-        SampleHistory(
-            sample_id=sample.id, action="created", notes=payload.get("description")
+    if payload.get("storage_box_id") is not None:
+        storage_service.assign_slot(
+            sample, payload["storage_box_id"], payload.get("storage_position")
         )
-    )
-    db.session.commit()
+    with storage_service.placement_errors():
+        db.session.add(sample)
+        db.session.flush()
+        db.session.add(
+            SampleHistory(
+                sample_id=sample.id, action="created", notes=payload.get("description")
+            )
+        )
+        db.session.commit()
     return jsonify({"data": sample.to_dict()}), 201
 
 
@@ -79,15 +85,24 @@ def update_sample(sample_id: int):
     if not sample:
         raise NotFoundError()
     payload = request.get_json(force=True)
+    previous_status = sample.status
     for key in ("status", "description"):
         if key in payload:
             setattr(sample, key, payload[key])
+    if "storage_box_id" in payload:
+        storage_service.assign_slot(
+            sample, payload["storage_box_id"], payload.get("storage_position")
+        )
+    action = "updated"
+    if sample.status != previous_status:
+        action = status_action(sample.status)
     db.session.add(
         SampleHistory(
-            sample_id=sample.id, action="updated", notes=payload.get("description")
+            sample_id=sample.id, action=action, notes=payload.get("description")
         )
     )
-    db.session.commit()
+    with storage_service.placement_errors():
+        db.session.commit()
     return jsonify({"data": sample.to_dict()})
 
 
@@ -101,6 +116,7 @@ def delete_sample(sample_id: int):
     db.session.add(
         SampleHistory(sample_id=sample.id, action="deleted", notes=sample.description)
     )
+    # Deleting the sample frees its storage slot (see storage_service).
     db.session.delete(sample)
     db.session.commit()
     return "", 204
@@ -13,10 +13,10 @@ from flask import (
 )
 from ..config import Settings
 from ..models.doc import Doc
-from ..models.user import User
 from ..services.auth_service import AuthService
 from ..services.onlyoffice_service import onlyoffice_service
 from ..utils.errors import APIError, UnauthorizedError
+from ..utils.identity import UserSnapshot
 from ..utils.security import decode_user_token
 
 
@@ -48,7 +48,7 @@ def login_page():
     return render_template("login.html", error=error)
 
 
-def _decode_user_token(token: str) -> tuple[User, dict]:
+def _decode_user_token(token: str) -> tuple[UserSnapshot, dict]:
     try:
         user, decoded = decode_user_token(token)
     except UnauthorizedError as exc:
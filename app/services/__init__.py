@@ -2,16 +2,46 @@
 
 from __future__ import annotations
 
+from .analytics_service import SampleAnalyticsService, sample_analytics_service
+from .api_key_service import ApiKeyService, api_key_service
 from .auth_service import AuthService
+from .counter_service import SampleCounterService, sample_counter_service
 from .crud_service import CRUDService, crud_service
+from .doc_save_service import DocSaveService, doc_save_service
+from .document_service import DocumentService, document_service
+from .maintenance_service import MaintenanceService, maintenance_service
 from .onlyoffice_service import OnlyOfficeService, onlyoffice_service
 from .password_service import PasswordService
+from .reagent_service import ReagentService, reagent_service
+from .reagent_stock_service import ReagentStockService, reagent_stock_service
+from .search_service import SearchService, search_service
+from .storage_service import StorageService, storage_service
 
 __all__ = [
+    "ApiKeyService",
     "AuthService",
+    "MaintenanceService",
     "OnlyOfficeService",
     "PasswordService",
+    "ReagentService",
+    "ReagentStockService",
+    "SampleAnalyticsService",
+    "SampleCounterService",
+    "SearchService",
+    "StorageService",
     "CRUDService",
+    "DocSaveService",
+    "DocumentService",
+    "api_key_service",
     "crud_service",
+    "doc_save_service",
+    "document_service",
+    "maintenance_service",
     "onlyoffice_service",
+    "reagent_service",
+    "reagent_stock_service",
+    "sample_analytics_service",
+    "sample_counter_service",
+    "search_service",
+    "storage_service",
 ]
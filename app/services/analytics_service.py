@@ -0,0 +1,207 @@
+"""Vectorized sample turnaround analytics over ``sample_history``."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import or_, select
+
+from ..extensions import db
+from ..models.sample_history import STATUS_ACTION_PREFIX, SampleHistory
+from ..models.samples import Sample
+from ..utils.cache import LRUCache
+
+STREAM_CHUNK_SIZE = 10_000
+SECONDS_PER_DAY = 86_400
+# numpy's epoch (1970-01-01) is a Thursday; shifting by 3 days aligns
+# week buckets to ISO weeks starting on Monday.
+EPOCH_WEEKDAY_SHIFT = 3
+# Windows are chosen by clients, so only the most recent ones are kept.
+CACHE_SIZE = 64
+
+
+class SampleAnalyticsService:
+    """Compute turnaround statistics with NumPy and cache them per window."""
+
+    def __init__(self) -> None:
+        self._cache: LRUCache[Tuple[datetime, datetime], Dict[str, Any]] = LRUCache(
+            maxsize=CACHE_SIZE
+        )
+
+    def turnaround(
+        self, start: datetime, end: datetime, *, ttl_seconds: int = 0
+    ) -> Dict[str, Any]:
+        """Median/p95 seconds from creation to each status, per lab and week."""
+        key = (start, end)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        result = self._compute(start, end)
+        if ttl_seconds > 0:
+            self._cache.set(key, result, ttl=ttl_seconds)
+        return result
+
+    def clear_cache(self) -> None:
+        self._cache.clear()
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+    def _load(
+        self, start: datetime, end: datetime
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, List[str]]:
+        """Stream history rows into column arrays in a single query.
+
+        ``created`` rows are loaded regardless of ``start`` so that status
+        changes inside the window can be matched to older creations.
+        """
+        stmt = (
+            select(
+                SampleHistory.sample_id,
+                Sample.lab_id,
+                SampleHistory.action,
+                SampleHistory.created_at,
+            )
+            .join(Sample, Sample.id == SampleHistory.sample_id)
+            .where(
+                SampleHistory.created_at < end,
+                or_(
+                    SampleHistory.action == "created",
+                    SampleHistory.created_at >= start,
+                ),
+            )
+            .execution_options(yield_per=STREAM_CHUNK_SIZE)
+        )
+
+        action_codes: Dict[str, int] = {"created": 0}
+        sample_ids: List[np.ndarray] = []
+        lab_ids: List[np.ndarray] = []
+        actions: List[np.ndarray] = []
+        stamps: List[np.ndarray] = []
+        for chunk in db.session.execute(stmt).partitions():
+            sids, labs, names, created = zip(*chunk)
+            sample_ids.append(np.fromiter(sids, dtype=np.int64, count=len(chunk)))
+            lab_ids.append(np.fromiter(labs, dtype=np.int64, count=len(chunk)))
+            actions.append(
+                np.fromiter(
+                    (
+                        action_codes.setdefault(name, len(action_codes))
+                        for name in names
+                    ),
+                    dtype=np.int32,
+                    count=len(chunk),
+                )
+            )
+            stamps.append(np.array(created, dtype="datetime64[s]").astype(np.int64))
+
+        names_by_code = sorted(action_codes, key=action_codes.__getitem__)
+        if not sample_ids:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, empty.astype(np.int32), empty, names_by_code
+        return (
+            np.concatenate(sample_ids),
+            np.concatenate(lab_ids),
+            np.concatenate(actions),
+            np.concatenate(stamps),
+            names_by_code,
+        )
+
+    # ------------------------------------------------------------------
+    # Computation
+    # ------------------------------------------------------------------
+    def _compute(self, start: datetime, end: datetime) -> Dict[str, Any]:
+        sample_ids, lab_ids, actions, stamps, action_names = self._load(start, end)
+        meta: Dict[str, Any] = {
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "rows": int(sample_ids.size),
+        }
+
+        status_codes = np.array(
+            [
+                code
+                for code, name in enumerate(action_names)
+                if name.startswith(STATUS_ACTION_PREFIX)
+            ],
+            dtype=np.int32,
+        )
+
+        # Earliest creation per sample: sort by (sample, time), keep first.
+        created = actions == 0
+        c_ids, c_stamps = sample_ids[created], stamps[created]
+        order = np.lexsort((c_stamps, c_ids))
+        c_ids, c_stamps = c_ids[order], c_stamps[order]
+        c_ids, first = np.unique(c_ids, return_index=True)
+        c_stamps = c_stamps[first]
+
+        events = np.isin(actions, status_codes) & (stamps >= _epoch_seconds(start))
+        e_ids, e_labs = sample_ids[events], lab_ids[events]
+        e_actions, e_stamps = actions[events], stamps[events]
+
+        slot = np.searchsorted(c_ids, e_ids)
+        slot_clipped = np.minimum(slot, max(c_ids.size - 1, 0))
+        matched = (slot < c_ids.size) & (c_ids[slot_clipped] == e_ids)
+        durations = e_stamps[matched] - c_stamps[slot_clipped[matched]]
+        keep = durations >= 0
+        durations = durations[keep].astype(np.float64)
+        e_labs = e_labs[matched][keep]
+        e_actions = e_actions[matched][keep]
+        e_weeks = (
+            e_stamps[matched][keep] // SECONDS_PER_DAY + EPOCH_WEEKDAY_SHIFT
+        ) // 7
+
+        meta["samples"] = int(c_ids.size)
+        meta["events"] = int(durations.size)
+        if not durations.size:
+            return {"data": [], "meta": meta}
+
+        order = np.lexsort((durations, e_actions, e_weeks, e_labs))
+        durations = durations[order]
+        e_labs, e_weeks, e_actions = e_labs[order], e_weeks[order], e_actions[order]
+
+        boundary = np.flatnonzero(
+            (np.diff(e_labs) != 0) | (np.diff(e_weeks) != 0) | (np.diff(e_actions) != 0)
+        )
+        starts = np.insert(boundary + 1, 0, 0)
+        counts = np.diff(np.append(starts, durations.size))
+        medians = _grouped_quantile(durations, starts, counts, 0.5)
+        p95s = _grouped_quantile(durations, starts, counts, 0.95)
+
+        week_starts = (
+            (e_weeks[starts] * 7 - EPOCH_WEEKDAY_SHIFT) * SECONDS_PER_DAY
+        ).astype("datetime64[s]")
+        data = [
+            {
+                "lab_id": int(lab),
+                "week": str(week.astype("datetime64[D]")),
+                "status": action_names[code][len(STATUS_ACTION_PREFIX) :],
+                "count": int(count),
+                "median_seconds": float(median),
+                "p95_seconds": float(p95),
+            }
+            for lab, week, code, count, median, p95 in zip(
+                e_labs[starts], week_starts, e_actions[starts], counts, medians, p95s
+            )
+        ]
+        return {"data": data, "meta": meta}
+
+
+def _grouped_quantile(
+    values: np.ndarray, starts: np.ndarray, counts: np.ndarray, q: float
+) -> np.ndarray:
+    """Linear-interpolated quantile of each sorted contiguous group."""
+    position = starts + q * (counts - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.ceil(position).astype(np.int64)
+    weight = position - lower
+    return values[lower] * (1 - weight) + values[upper] * weight
+
+
+def _epoch_seconds(moment: datetime) -> int:
+    return int((moment - datetime(1970, 1, 1)) / timedelta(seconds=1))
+
+
+sample_analytics_service = SampleAnalyticsService()
@@ -0,0 +1,306 @@
+"""Database-backed API keys with a per-worker lookup cache."""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from flask import Flask, current_app
+from sqlalchemy import bindparam, update
+
+from ..config import Settings
+from ..extensions import db
+from ..models.api_key import ApiKey
+from ..utils.cache import LRUCache
+from ..utils.errors import NotFoundError
+from ..utils.revocation import revoke_api_key_tokens
+from ..utils.versions import bump_version, read_version
+
+KEY_PREFIX = "lab_"
+VERSION_NAME = "api_keys"
+EXTENSION_KEY = "api_key_cache"
+
+
+def hash_api_key(raw_key: str) -> str:
+    return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True, slots=True)
+class ApiKeySnapshot:
+    id: int
+    name: str
+    scopes: Tuple[str, ...]
+    expires_at: Optional[datetime]
+
+    @classmethod
+    def from_row(cls, row: ApiKey) -> "ApiKeySnapshot":
+        return cls(
+            id=row.id,
+            name=row.name,
+            scopes=tuple(row.scopes or ()),
+            expires_at=row.expires_at,
+        )
+
+    def is_expired(self, now: datetime) -> bool:
+        return self.expires_at is not None and self.expires_at <= now
+
+
+class ApiKeyCache:
+    """Resolved keys by hash plus buffered ``last_used_at`` updates.
+
+    Entries are dropped whenever the ``api_keys`` cache version changes,
+    which is checked at most every ``refresh_interval`` seconds. Last-used
+    times are collected per key and written with one executemany
+    ``UPDATE`` every ``flush_interval`` seconds; a failed write is logged
+    and retried with the next one.
+    """
+
+    def __init__(
+        self,
+        app: Flask,
+        *,
+        maxsize: int,
+        refresh_interval: float,
+        flush_interval: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.app = app
+        self.refresh_interval = refresh_interval
+        self.flush_interval = flush_interval
+        self._clock = clock
+        self._entries: LRUCache[str, ApiKeySnapshot] = LRUCache(maxsize=maxsize)
+        self._version: Optional[int] = None
+        self._next_check = 0.0
+        self._next_flush = clock() + flush_interval
+        self._used: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, key_hash: str) -> Tuple[Optional[ApiKeySnapshot], Optional[int]]:
+        """Cached entry for ``key_hash`` and the version to pass to :meth:`store`."""
+        if self._clock() >= self._next_check:
+            version = read_version(VERSION_NAME)
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            self._next_check = self._clock() + self.refresh_interval
+        return self._entries.get(key_hash), self._version
+
+    def store(
+        self, key_hash: str, snapshot: ApiKeySnapshot, version: Optional[int]
+    ) -> None:
+        # Skip rows read before a version change noticed in the meantime.
+        if version == self._version:
+            self._entries.set(key_hash, snapshot)
+
+    def invalidate(self) -> None:
+        self._entries.clear()
+        self._next_check = 0.0
+
+    def touch(self, key_id: int) -> None:
+        with self._lock:
+            self._used[key_id] = datetime.utcnow()
+            due = self._clock() >= self._next_flush
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._used = self._used, {}
+            self._next_flush = self._clock() + self.flush_interval
+        if not pending:
+            return
+        keys = ApiKey.__table__
+        try:
+            with self.app.app_context(), db.engine.begin() as connection:
+                connection.execute(
+                    update(keys)
+                    .where(keys.c.id == bindparam("key_id"))
+                    .values(last_used_at=bindparam("used_at")),
+                    [
+                        {"key_id": key_id, "used_at": used_at}
+                        for key_id, used_at in pending.items()
+                    ],
+                )
+        except Exception:
+            # Bookkeeping only: never fail the request that happens to flush.
+            # Retry with the next flush, keeping any newer use.
+            self.app.logger.exception("Could not record API key usage")
+            with self._lock:
+                self._used = {**pending, **self._used}
+
+
+def init_api_key_cache(app: Flask, settings: Settings) -> None:
+    cache = ApiKeyCache(
+        app,
+        maxsize=settings.api_key_cache_size,
+        refresh_interval=settings.api_key_cache_refresh_seconds,
+        flush_interval=settings.api_key_last_used_flush_seconds,
+    )
+    app.extensions[EXTENSION_KEY] = cache
+    atexit.register(cache.flush)
+
+
+def _cache() -> ApiKeyCache:
+    return current_app.extensions[EXTENSION_KEY]
+
+
+class ApiKeyService:
+    """Issue, resolve and revoke API keys."""
+
+    def resolve(self, raw_key: str) -> Optional[ApiKeySnapshot]:
+        """Active key matching ``raw_key``; usually answered from the cache."""
+        key_hash = hash_api_key(raw_key)
+        cache = _cache()
+        snapshot, version = cache.lookup(key_hash)
+        if snapshot is None:
+            row = ApiKey.query.filter(
+                ApiKey.key_hash == key_hash, ApiKey.revoked_at.is_(None)
+            ).first()
+            if row is None:
+                return None
+            snapshot = ApiKeySnapshot.from_row(row)
+            cache.store(key_hash, snapshot, version)
+        if snapshot.is_expired(datetime.utcnow()):
+            return None
+        cache.touch(snapshot.id)
+        return snapshot
+
+    def get_active(self, key_id: int) -> Optional[ApiKeySnapshot]:
+        """Key ``key_id`` if it is neither revoked nor expired."""
+        row = ApiKey.query.filter(
+            ApiKey.id == key_id, ApiKey.revoked_at.is_(None)
+        ).first()
+        if row is None:
+            return None
+        snapshot = ApiKeySnapshot.from_row(row)
+        return None if snapshot.is_expired(datetime.utcnow()) else snapshot
+
+    def is_stored(self, raw_key: str) -> bool:
+        """Whether the key has a row at all, including revoked ones."""
+        return (
+            db.session.query(ApiKey.id)
+            .filter(ApiKey.key_hash == hash_api_key(raw_key))
+            .first()
+            is not None
+        )
+
+    def create_key(
+        self,
+        name: str,
+        scopes: Iterable[str],
+        *,
+        expires_in_days: Optional[int] = None,
+        raw_key: Optional[str] = None,
+    ) -> Tuple[ApiKey, str]:
+        """Store a new key and return it with its secret, shown only once."""
+        raw_key = raw_key or KEY_PREFIX + secrets.token_urlsafe(32)
+        key = ApiKey(
+            name=name,
+            prefix=raw_key[:12],
+            key_hash=hash_api_key(raw_key),
+            scopes=sorted(set(scopes)),
+            expires_at=(
+                datetime.utcnow() + timedelta(days=expires_in_days)
+                if expires_in_days
+                else None
+            ),
+        )
+        db.session.add(key)
+        self._commit()
+        return key, raw_key
+
+    def revoke_key(self, key_id: int) -> ApiKey:
+        key: ApiKey | None = ApiKey.query.get(key_id)
+        if not key:
+            raise NotFoundError()
+        if key.revoked_at is None:
+            key.revoked_at = datetime.utcnow()
+            # Tokens already exchanged for the key stop working too.
+            revoke_api_key_tokens(key.id)
+            self._commit()
+        return key
+
+    def list_keys(self) -> List[ApiKey]:
+        return ApiKey.query.order_by(ApiKey.id).all()
+
+    def import_keys(self, keys: Dict[str, List[str]]) -> int:
+        """Store keys from ``API_KEYS_JSON`` that are not in the table yet."""
+        known = {
+            key_hash
+            for (key_hash,) in db.session.query(ApiKey.key_hash).filter(
+                ApiKey.key_hash.in_([hash_api_key(raw) for raw in keys])
+            )
+        }
+        imported = 0
+        for raw_key, scopes in keys.items():
+            if hash_api_key(raw_key) in known:
+                continue
+            db.session.add(
+                ApiKey(
+                    # Legacy keys may be short; reveal as little as possible.
+                    name=f"imported {raw_key[:4]}",
+                    prefix=raw_key[:4],
+                    key_hash=hash_api_key(raw_key),
+                    scopes=sorted(set(scopes)),
+                )
+            )
+            imported += 1
+        if imported:
+            self._commit()
+        return imported
+
+    def _commit(self) -> None:
+        bump_version(VERSION_NAME)
+        db.session.commit()
+        _cache().invalidate()
+
+
+api_key_service = ApiKeyService()
+
+
+def register_api_key_cli(app: Flask) -> None:
+    """Register ``flask api-keys`` for managing API keys without a restart."""
+
+    import click
+
+    @app.cli.group("api-keys")
+    def api_keys() -> None:
+        """Manage API keys."""
+
+    @api_keys.command("create")
+    @click.option("--name", required=True)
+    @click.option("--scope", "scopes", multiple=True, required=True)
+    @click.option("--expires-in-days", type=int, default=None)
+    def create(name: str, scopes: Tuple[str, ...], expires_in_days: Any) -> None:
+        key, raw_key = api_key_service.create_key(
+            name, scopes, expires_in_days=expires_in_days
+        )
+        click.echo(f"Created key {key.id} ({key.prefix}...)")
+        click.echo(raw_key)
+
+    @api_keys.command("list")
+    def list_() -> None:
+        for key in api_key_service.list_keys():
+            state = "revoked" if key.revoked_at else "active"
+            click.echo(
+                f"{key.id}\t{key.prefix}...\t{key.name}\t{','.join(key.scopes)}"
+                f"\t{state}\texpires={key.expires_at}\tlast_used={key.last_used_at}"
+            )
+
+    @api_keys.command("revoke")
+    @click.argument("key_id", type=int)
+    def revoke(key_id: int) -> None:
+        api_key_service.revoke_key(key_id)
+        click.echo(f"Revoked key {key_id}")
+
+    @api_keys.command("import-env")
+    def import_env() -> None:
+        settings: Settings = app.config["APP_SETTINGS"]
+        count = api_key_service.import_keys(settings.api_keys_json)
+        click.echo(f"Imported {count} key(s) from API_KEYS_JSON")
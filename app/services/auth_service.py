@@ -3,26 +3,75 @@
 from __future__ import annotations
 
 from datetime import datetime, timedelta
-from typing import Any, Dict, Iterable, Optional
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
 
 from flask import current_app, request
-from flask_jwt_extended import create_access_token, create_refresh_token
+from flask_jwt_extended import (
+    create_access_token,
+    create_refresh_token,
+    decode_token,
+)
+from flask_jwt_extended.exceptions import JWTExtendedException
+from sqlalchemy import ColumnElement, case, func, insert, or_, select, update
 
 from ..config import Settings, settings as default_settings
 from ..extensions import db
+from ..utils.audit import record_activity, record_login
 from ..utils.errors import APIError, UnauthorizedError
-from ..utils.security import generate_token, hash_password, verify_password
-from .password_service import PasswordService
+from ..utils.identity import UserSnapshot
+from ..utils.revocation import revoke_token
+from ..utils.security import (
+    generate_token,
+    hash_password,
+    hash_passwords,
+    password_needs_rehash,
+    verify_password,
+)
+from .api_key_service import api_key_service
+from .password_service import PasswordService, invalid_token
 
-from ..models.activity_log import ActivityLog
 from ..models.invite import InviteCode
-from ..models.login_log import LoginLog
 from ..models.role import Role
-from ..models.user import User
+from ..models.user import User, normalize_login
 from ..models.user_permissions import UserPermissionEntry
 from ..models.user_role import UserRole
 
 
+MAX_BULK_ROWS = 1000
+DEFAULT_IMPORT_PASSWORD = "ChangeMe123!"
+IMPORT_SCOPES = {"db", "doc"}
+
+
+def _split_list(value: Optional[str]) -> List[str]:
+    return [item.strip() for item in (value or "").split(";") if item.strip()]
+
+
+def _truthy(value: Optional[str]) -> bool:
+    return (value or "").strip().lower() in {"1", "true", "yes", "y"}
+
+
+def _usable_invite(code: str, email: str, now: datetime) -> List[ColumnElement[bool]]:
+    return [
+        InviteCode.code == code,
+        InviteCode.uses < InviteCode.max_uses,
+        InviteCode.is_active.is_(True),
+        or_(InviteCode.expires_at.is_(None), InviteCode.expires_at > now),
+        or_(
+            InviteCode.email.is_(None),
+            InviteCode.email == "",
+            func.lower(InviteCode.email) == email.lower(),
+        ),
+    ]
+
+
+def _invalid_invite() -> APIError:
+    return APIError(
+        code="invalid_invite",
+        message="Invite code invalid or expired",
+        status_code=400,
+    )
+
+
 class AuthService:
     """Domain service encapsulating authentication flows."""
 
@@ -53,16 +102,48 @@ class AuthService:
     # API key authentication
     # ------------------------------------------------------------------
     def authenticate_api_key(self, api_key: str) -> Dict[str, Any]:
+        key = api_key_service.resolve(api_key)
+        if key is not None:
+            identity = {"sub_type": "api_key", "api_key_id": key.id}
+            return self._issue_tokens(identity, key.scopes, is_admin=False)
+        # Keys still configured through API_KEYS_JSON, unless imported (and
+        # possibly revoked since).
         scopes = self.settings.api_keys_json.get(api_key)
-        if not scopes:
+        if not scopes or api_key_service.is_stored(api_key):
             raise UnauthorizedError(message="Invalid API key")
-        identity = {"sub_type": "api_key", "api_key": api_key}
+        identity = {"sub_type": "api_key", "api_key_id": None}
         return self._issue_tokens(identity, scopes, is_admin=False)
 
+    def logout(
+        self, claims: Dict[str, Any], refresh_token: Optional[str] = None
+    ) -> None:
+        """Revoke the presented token and, if given, its refresh token."""
+        revoke_token(claims)
+        if refresh_token:
+            try:
+                refresh_claims = decode_token(refresh_token)
+            except JWTExtendedException as exc:
+                raise UnauthorizedError(message=str(exc)) from exc
+            if refresh_claims.get("sub") != claims.get("sub"):
+                raise UnauthorizedError(message="Refresh token belongs to another user")
+            revoke_token(refresh_claims)
+        db.session.commit()
+
     def refresh_tokens(self, identity: Any, claims: Dict[str, Any]) -> Dict[str, Any]:
-        """Re-issue access and refresh tokens preserving scope and admin flags."""
+        """Re-issue access and refresh tokens preserving scope and admin flags.
+
+        Tokens of a stored API key are only renewed while the key is active,
+        with its current scopes.
+        """
         scopes = claims.get("scopes", [])
         is_admin = bool(claims.get("is_admin"))
+        if isinstance(identity, dict) and identity.get("sub_type") == "api_key":
+            key_id = identity.get("api_key_id")
+            if key_id is not None:
+                key = api_key_service.get_active(int(key_id))
+                if key is None:
+                    raise UnauthorizedError(message="API key revoked or expired")
+                scopes = list(key.scopes)
         return self._issue_tokens(identity, scopes, is_admin=is_admin)
 
     # ------------------------------------------------------------------
@@ -71,35 +152,34 @@ class AuthService:
     def authenticate_user(
         self, username_or_email: str, password: str
     ) -> Dict[str, Any]:
+        key = normalize_login(username_or_email)
+        # One query over both indexed columns; a username match wins.
         user = (
-            User.query.filter(User.username.ilike(username_or_email)).first()
-            or User.query.filter(User.email.ilike(username_or_email)).first()
+            User.query.filter(
+                or_(User.username_normalized == key, User.email_normalized == key)
+            )
+            .order_by(case((User.username_normalized == key, 0), else_=1))
+            .first()
         )
         if not user or not user.is_active:
             raise UnauthorizedError(message="Invalid credentials")
         if not verify_password(password, user.password_hash):
             raise UnauthorizedError(message="Invalid credentials")
+        if password_needs_rehash(user.password_hash):
+            # Saved together with the login bookkeeping below.
+            user.password_hash = hash_password(password)
 
         user.last_login_at = datetime.utcnow()
-        db.session.add(
-            LoginLog(
-                user_id=user.id,
-                ip_address=request.remote_addr if request else None,
-                user_agent=request.user_agent.string if request else None,
-            )
-        )
         db.session.commit()
 
-        db.session.add(
-            ActivityLog(
-                actor_id=user.id,
-                action="login",
-                target_type="user",
-                target_id=str(user.id),
-                details={"username": user.username},
-            )
+        record_login(
+            user.id,
+            request.remote_addr if request else None,
+            request.user_agent.string if request else None,
+        )
+        record_activity(
+            user.id, "login", "user", str(user.id), {"username": user.username}
         )
-        db.session.commit()
 
         identity = {"sub_type": "user", "user_id": user.id}
         return self._issue_tokens(identity, user.scopes, is_admin=user.is_admin)
@@ -113,16 +193,14 @@ class AuthService:
         invite_code: str,
         scopes: Optional[Iterable[str]] = None,
     ) -> User:
-        invite = InviteCode.query.filter_by(code=invite_code).first()
-        if not invite or not invite.can_be_used(email):
-            raise APIError(
-                code="invalid_invite",
-                message="Invite code invalid or expired",
-                status_code=400,
-            )
-
+        # A bad code is turned away first: before the costly hash, and before
+        # the lookup that would reveal which usernames/emails exist. The hash
+        # comes before redeeming, so the write transaction stays short.
+        if not self._invite_is_usable(invite_code, email):
+            raise _invalid_invite()
         if User.query.filter(
-            (User.username == username) | (User.email == email)
+            (User.username_normalized == normalize_login(username))
+            | (User.email_normalized == normalize_login(email))
         ).first():
             raise APIError(
                 code="user_exists",
@@ -130,15 +208,15 @@ class AuthService:
                 status_code=409,
             )
 
-        user = User(
-            username=username, email=email, password_hash=hash_password(password)
-        )
+        password_hash = hash_password(password)
+        if not self._redeem_invite(invite_code, email):
+            db.session.rollback()
+            raise _invalid_invite()
+
+        user = User(username=username, email=email, password_hash=password_hash)
         db.session.add(user)
         db.session.flush()
 
-        invite.mark_used()
-        db.session.add(invite)
-
         scopes_to_assign = list(scopes) if scopes else ["db", "doc"]
         for scope in scopes_to_assign:
             db.session.add(UserPermissionEntry(user_id=user.id, scope=scope))
@@ -148,18 +226,40 @@ class AuthService:
             db.session.add(UserRole(user_id=user.id, role_id=role.id))
 
         db.session.commit()
-        db.session.add(
-            ActivityLog(
-                actor_id=None,
-                action="register_user",
-                target_type="user",
-                target_id=str(user.id),
-                details={"username": user.username, "email": user.email},
-            )
+        record_activity(
+            None,
+            "register_user",
+            "user",
+            str(user.id),
+            {"username": user.username, "email": user.email},
         )
-        db.session.commit()
         return user
 
+    def _invite_is_usable(self, code: str, email: str) -> bool:
+        """Read-only pre-check; :meth:`_redeem_invite` stays authoritative."""
+        found = db.session.execute(
+            select(InviteCode.id)
+            .where(*_usable_invite(code, email, datetime.utcnow()))
+            .limit(1)
+        ).scalar()
+        return found is not None
+
+    def _redeem_invite(self, code: str, email: str) -> bool:
+        """Count one use of ``code`` if it is still usable.
+
+        A single conditional ``UPDATE`` instead of read-check-write, so two
+        concurrent sign-ups cannot both take an invite's last use and no
+        ``SELECT ... FOR UPDATE`` has to serialize them.
+        """
+        now = datetime.utcnow()
+        result: Any = db.session.execute(
+            update(InviteCode)
+            .where(*_usable_invite(code, email, now))
+            .values(uses=InviteCode.uses + 1, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        return bool(result.rowcount)
+
     def change_password(
         self, user: User, current_password: str, new_password: str
     ) -> None:
@@ -171,7 +271,7 @@ class AuthService:
     def create_invite(
         self,
         *,
-        created_by: User,
+        created_by: UserSnapshot,
         email: str | None,
         expires_in_hours: int = 72,
         max_uses: int = 1,
@@ -187,15 +287,196 @@ class AuthService:
         db.session.commit()
         return invite
 
+    def create_invites(
+        self,
+        *,
+        created_by: UserSnapshot,
+        emails: Sequence[Optional[str]],
+        expires_in_hours: int = 72,
+        max_uses: int = 1,
+    ) -> List[Dict[str, Any]]:
+        """Generate one invite per entry of ``emails`` in a single INSERT."""
+        if not emails or len(emails) > MAX_BULK_ROWS:
+            raise APIError(
+                code="invalid_request",
+                message=f"Between 1 and {MAX_BULK_ROWS} invites per request",
+                status_code=400,
+            )
+        now = datetime.utcnow()
+        expires_at = now + timedelta(hours=expires_in_hours)
+        codes: set[str] = set()
+        while len(codes) < len(emails):
+            codes.add(generate_token(8))
+        rows = [
+            {
+                "code": code,
+                "email": email or None,
+                "expires_at": expires_at,
+                "max_uses": max_uses,
+                "uses": 0,
+                "is_active": True,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for code, email in zip(codes, emails)
+        ]
+        db.session.execute(insert(InviteCode.__table__).values(rows))
+        db.session.commit()
+        record_activity(
+            created_by.id, "create_invites", "invite", None, {"count": len(rows)}
+        )
+        return [
+            {"code": row["code"], "email": row["email"], "expires_at": expires_at}
+            for row in rows
+        ]
+
+    def import_users(
+        self,
+        rows: Sequence[Mapping[str, Optional[str]]],
+        *,
+        created_by: UserSnapshot,
+        default_password: str = DEFAULT_IMPORT_PASSWORD,
+    ) -> List[str]:
+        """Create users from CSV-like rows in one transaction.
+
+        Columns: ``username``, ``email`` and optionally ``password``,
+        ``roles`` and ``scopes`` (``;``-separated), ``is_admin`` and
+        ``status``. Nothing is written unless every row is valid. Passwords
+        are hashed in parallel on the hashing pool, and users, scopes and
+        roles each go in with one multi-row insert.
+        """
+        if not rows or len(rows) > MAX_BULK_ROWS:
+            raise APIError(
+                code="invalid_import",
+                message=f"Between 1 and {MAX_BULK_ROWS} users per import",
+                status_code=400,
+            )
+        role_ids = {role.name: role.id for role in Role.query.all()}
+        errors: List[str] = []
+        users: List[Dict[str, Any]] = []
+        seen: set[str] = set()
+        for line, row in enumerate(rows, start=2):
+            username = (row.get("username") or "").strip()
+            email = (row.get("email") or "").strip()
+            if not username or not email:
+                errors.append(f"line {line}: username and email are required")
+                continue
+            keys = {normalize_login(username), normalize_login(email)}
+            if keys & seen:
+                errors.append(f"line {line}: duplicate username or email in file")
+            seen |= keys
+            roles = _split_list(row.get("roles"))
+            unknown = [name for name in roles if name not in role_ids]
+            if unknown:
+                errors.append(f"line {line}: unknown role(s) {', '.join(unknown)}")
+            scopes = _split_list(row.get("scopes")) or ["db", "doc"]
+            if set(scopes) - IMPORT_SCOPES:
+                errors.append(f"line {line}: scopes must be db and/or doc")
+            users.append(
+                {
+                    "username": username,
+                    "email": email,
+                    "password": (row.get("password") or "").strip() or default_password,
+                    "is_admin": _truthy(row.get("is_admin")),
+                    "is_active": (row.get("status") or "active").strip().lower()
+                    != "inactive",
+                    "roles": [role_ids[name] for name in roles if name in role_ids],
+                    "scopes": scopes,
+                }
+            )
+        if seen:
+            taken = User.query.filter(
+                or_(
+                    User.username_normalized.in_(seen),
+                    User.email_normalized.in_(seen),
+                )
+            ).all()
+            for user in taken:
+                errors.append(f"{user.username}: username or email already exists")
+        if errors:
+            raise APIError(
+                code="invalid_import",
+                message="No users were imported",
+                status_code=400,
+                details={"errors": errors},
+            )
+
+        hashes = hash_passwords([entry["password"] for entry in users])
+        now = datetime.utcnow()
+        db.session.execute(
+            insert(User.__table__),
+            [
+                {
+                    "username": entry["username"],
+                    "email": entry["email"],
+                    "username_normalized": normalize_login(entry["username"]),
+                    "email_normalized": normalize_login(entry["email"]),
+                    "password_hash": password_hash,
+                    "is_active": entry["is_active"],
+                    "is_admin": entry["is_admin"],
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for entry, password_hash in zip(users, hashes)
+            ],
+        )
+        ids: Dict[str, int] = {
+            username: user_id
+            for username, user_id in db.session.query(
+                User.username_normalized, User.id
+            ).filter(
+                User.username_normalized.in_(
+                    [normalize_login(entry["username"]) for entry in users]
+                )
+            )
+        }
+        scope_rows: List[Dict[str, Any]] = []
+        role_rows: List[Dict[str, Any]] = []
+        for entry in users:
+            user_id = ids[normalize_login(entry["username"])]
+            scope_rows.extend(
+                {
+                    "user_id": user_id,
+                    "scope": scope,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for scope in dict.fromkeys(entry["scopes"])
+            )
+            role_rows.extend(
+                {
+                    "user_id": user_id,
+                    "role_id": role_id,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for role_id in dict.fromkeys(entry["roles"])
+            )
+        db.session.execute(insert(UserPermissionEntry.__table__), scope_rows)
+        if role_rows:
+            db.session.execute(insert(UserRole.__table__), role_rows)
+        db.session.commit()
+        record_activity(
+            created_by.id,
+            "import_users",
+            "user",
+            None,
+            {"count": len(users), "usernames": [entry["username"] for entry in users]},
+        )
+        return [entry["username"] for entry in users]
+
     def request_password_reset(self, email: str) -> Optional[str]:
-        user = User.query.filter_by(email=email).first()
+        user = User.query.filter_by(email_normalized=normalize_login(email)).first()
         if not user:
             return None
         return self.password_service.create_password_reset(user)
 
     def perform_password_reset(self, token: str, new_password: str) -> None:
+        if not self.password_service.is_usable(token):
+            raise invalid_token()
+        password_hash = hash_password(new_password)
         reset = self.password_service.consume_token(token)
-        reset.user.password_hash = hash_password(new_password)
+        reset.user.password_hash = password_hash
         db.session.commit()
 
     def ensure_admin_scopes(self, user: User, scopes: Iterable[str]) -> None:
@@ -228,7 +509,8 @@ def create_user_cli(app) -> None:
     @click.option("--password", prompt=True, hide_input=True, confirmation_prompt=True)
     def create_admin(username: str, email: str, password: str) -> None:
         if User.query.filter(
-            (User.username == username) | (User.email == email)
+            (User.username_normalized == normalize_login(username))
+            | (User.email_normalized == normalize_login(email))
         ).first():
             click.echo("User already exists")
             return
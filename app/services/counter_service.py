@@ -0,0 +1,200 @@
+"""Per-lab, per-status sample counters kept in step with sample writes."""
+
+from __future__ import annotations
+
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, Tuple
+
+from sqlalchemy import delete, event, func, inspect, insert, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import object_session
+
+from ..extensions import db
+from ..models.lab_sample_counter import LabSampleCounter
+from ..models.labs import Lab
+from ..models.samples import Sample
+
+CounterKey = Tuple[int, str]
+
+_counters = LabSampleCounter.__table__
+DEFAULT_STATUS = "pending"
+
+
+def _apply_delta(connection: Connection, lab_id: int, status: str, delta: int) -> None:
+    """Atomically add ``delta`` to a counter row, creating it if missing."""
+    now = datetime.utcnow()
+    values = {
+        "lab_id": lab_id,
+        "status": status,
+        "count": delta,
+        "created_at": now,
+        "updated_at": now,
+    }
+    increment = {"count": _counters.c.count + delta, "updated_at": now}
+    dialect = connection.dialect.name
+    if dialect == "mysql":
+        connection.execute(
+            mysql_insert(_counters)
+            .values(**values)
+            .on_duplicate_key_update(**increment)
+        )
+        return
+    if dialect in ("sqlite", "postgresql"):
+        upsert: Any = (
+            sqlite_insert(_counters)
+            if dialect == "sqlite"
+            else postgresql_insert(_counters)
+        )
+        connection.execute(
+            upsert.values(**values).on_conflict_do_update(
+                index_elements=["lab_id", "status"], set_=increment
+            )
+        )
+        return
+    result = connection.execute(
+        update(_counters)
+        .where(_counters.c.lab_id == lab_id, _counters.c.status == status)
+        .values(**increment)
+    )
+    if not result.rowcount:
+        connection.execute(insert(_counters).values(**values))
+
+
+def _deleted_lab_ids(target: Sample) -> set[int]:
+    session = object_session(target)
+    if session is None:
+        return set()
+    return {obj.id for obj in session.deleted if isinstance(obj, Lab)}
+
+
+@event.listens_for(Sample, "after_insert")
+def _count_inserted_sample(
+    _mapper: Any, connection: Connection, target: Sample
+) -> None:
+    _apply_delta(connection, target.lab_id, target.status or DEFAULT_STATUS, 1)
+
+
+@event.listens_for(Sample, "after_update")
+def _count_updated_sample(_mapper: Any, connection: Connection, target: Sample) -> None:
+    state: Any = inspect(target)
+    lab_history = state.attrs.lab_id.history
+    status_history = state.attrs.status.history
+    if not lab_history.has_changes() and not status_history.has_changes():
+        return
+    old_lab = lab_history.deleted[0] if lab_history.deleted else target.lab_id
+    old_status = status_history.deleted[0] if status_history.deleted else target.status
+    new_status = target.status or DEFAULT_STATUS
+    old_status = old_status or DEFAULT_STATUS
+    if (old_lab, old_status) == (target.lab_id, new_status):
+        return
+    _apply_delta(connection, old_lab, old_status, -1)
+    _apply_delta(connection, target.lab_id, new_status, 1)
+
+
+@event.listens_for(Sample, "after_delete")
+def _count_deleted_sample(_mapper: Any, connection: Connection, target: Sample) -> None:
+    # Counters of a lab being deleted go away with the lab itself.
+    if target.lab_id in _deleted_lab_ids(target):
+        return
+    _apply_delta(connection, target.lab_id, target.status or DEFAULT_STATUS, -1)
+
+
+class SampleCounterService:
+    """Read and repair the incrementally maintained sample counters."""
+
+    def counts_for_lab(self, lab_id: int) -> Dict[str, int]:
+        rows = db.session.execute(
+            select(_counters.c.status, _counters.c.count).where(
+                _counters.c.lab_id == lab_id, _counters.c.count != 0
+            )
+        )
+        return {status: count for status, count in rows}
+
+    def actual_counts(self, lab_ids: Iterable[int] | None = None) -> Counter:
+        """Recompute counts with GROUP BY over ``samples``."""
+        stmt = select(Sample.lab_id, Sample.status, func.count()).group_by(
+            Sample.lab_id, Sample.status
+        )
+        if lab_ids is not None:
+            stmt = stmt.where(Sample.lab_id.in_(list(lab_ids)))
+        return Counter(
+            {
+                (lab_id, status or DEFAULT_STATUS): count
+                for lab_id, status, count in db.session.execute(stmt)
+            }
+        )
+
+    def stored_counts(self, lab_ids: Iterable[int] | None = None) -> Counter:
+        stmt = select(_counters.c.lab_id, _counters.c.status, _counters.c.count)
+        if lab_ids is not None:
+            stmt = stmt.where(_counters.c.lab_id.in_(list(lab_ids)))
+        return Counter(
+            {
+                (lab_id, status): count
+                for lab_id, status, count in db.session.execute(stmt)
+            }
+        )
+
+    def drift(
+        self, lab_ids: Iterable[int] | None = None
+    ) -> Dict[CounterKey, Tuple[int, int]]:
+        """Return ``{(lab_id, status): (stored, actual)}`` for mismatches."""
+        lab_ids = list(lab_ids) if lab_ids is not None else None
+        actual = self.actual_counts(lab_ids)
+        stored = self.stored_counts(lab_ids)
+        return {
+            key: (stored.get(key, 0), actual.get(key, 0))
+            for key in set(actual) | set(stored)
+            if stored.get(key, 0) != actual.get(key, 0)
+        }
+
+    def rebuild(self, lab_ids: Iterable[int] | None = None) -> int:
+        """Replace counters with freshly aggregated values; returns rows written."""
+        lab_ids = list(lab_ids) if lab_ids is not None else None
+        actual = self.actual_counts(lab_ids)
+        clear = delete(_counters)
+        if lab_ids is not None:
+            clear = clear.where(_counters.c.lab_id.in_(lab_ids))
+        db.session.execute(clear)
+        now = datetime.utcnow()
+        rows = [
+            {
+                "lab_id": lab_id,
+                "status": status,
+                "count": count,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for (lab_id, status), count in actual.items()
+        ]
+        if rows:
+            db.session.execute(insert(_counters), rows)
+        db.session.commit()
+        return len(rows)
+
+
+sample_counter_service = SampleCounterService()
+
+
+def register_counter_cli(app) -> None:
+    """Register ``flask sample-counters`` for checking and rebuilding counters."""
+
+    import click
+
+    @app.cli.command("sample-counters")
+    @click.option("--lab-id", "lab_ids", type=int, multiple=True)
+    @click.option("--rebuild", is_flag=True, help="Rewrite counters from samples.")
+    def sample_counters(lab_ids: Tuple[int, ...], rebuild: bool) -> None:
+        scope = list(lab_ids) or None
+        mismatches = sample_counter_service.drift(scope)
+        for (lab_id, status), (stored, actual) in sorted(mismatches.items()):
+            click.echo(f"lab {lab_id} status {status}: stored={stored} actual={actual}")
+        if not rebuild:
+            click.echo(f"{len(mismatches)} counter(s) out of sync")
+            return
+        written = sample_counter_service.rebuild(scope)
+        click.echo(f"Rebuilt {written} counter row(s)")
@@ -53,6 +53,10 @@ class CRUDService:
         db.session.add(instance)
         try:
             db.session.commit()
+        except APIError:
+            # Rejected by a mapper event, e.g. an occupied storage slot.
+            db.session.rollback()
+            raise
         except IntegrityError as exc:
             db.session.rollback()
             raise APIError(
@@ -73,6 +77,10 @@ class CRUDService:
             setattr(instance, key, value)
         try:
             db.session.commit()
+        except APIError:
+            # Rejected by a mapper event, e.g. an occupied storage slot.
+            db.session.rollback()
+            raise
         except IntegrityError as exc:
             db.session.rollback()
             raise APIError(
@@ -95,7 +103,9 @@ class CRUDService:
         self, model: type[BaseModel], payload: Dict[str, Any], partial: bool = False
     ) -> Dict[str, Any]:
         columns = {
-            column.name for column in model.__table__.columns if not column.primary_key
+            column.name
+            for column in model.__table__.columns
+            if not column.primary_key and column.name not in model.crud_read_only
         }
         return {key: value for key, value in payload.items() if key in columns}
 
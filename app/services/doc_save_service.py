@@ -0,0 +1,327 @@
+"""Background downloads of documents saved in OnlyOffice.
+
+The save callback only records a ``doc_save_jobs`` row and wakes this
+worker's pipeline thread, so OnlyOffice gets its acknowledgement right away.
+The thread streams the edited file into the blob store (temp file, fsync,
+rename), atomically replaces the working file with a copy of it and
+records a ``DocVersion``. A callback OnlyOffice repeats maps to the same
+job row and is ignored. Jobs are claimed with a conditional ``UPDATE``, so
+with several workers each job runs once, and a document's jobs run in the
+order their callbacks arrived. Jobs left ``running`` by a dead worker are
+retried after ``DOC_SAVE_TIMEOUT_SECONDS``, failed ones up to
+``DOC_SAVE_MAX_ATTEMPTS`` times.
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Collection, Dict, Optional, Set
+
+import httpx
+from flask import Flask, current_app
+from sqlalchemy import exists, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+
+from ..config import Settings
+from ..extensions import db
+from ..models.doc import Doc
+from ..models.doc_save_job import DONE, FAILED, PENDING, RUNNING, DocSaveJob
+from ..models.file_ledger import FileLedger
+from ..utils.blobs import CHUNK_SIZE, blob_store
+from .document_service import document_service
+from .onlyoffice_service import onlyoffice_service
+
+EXTENSION_KEY = "doc_save_worker"
+# Document Server callback statuses that come with a file to fetch.
+SAVED = 2
+FORCE_SAVED = 6
+SAVE_STATUSES = (SAVED, FORCE_SAVED)
+
+
+def _job_key(document_key: str, status: int, url: str) -> str:
+    # Force saves keep the document key, but each has its own file URL.
+    return hashlib.sha256(f"{document_key}|{status}|{url}".encode()).hexdigest()
+
+
+def _callback_user(payload: Dict[str, Any]) -> Optional[int]:
+    for user in payload.get("users") or ():
+        try:
+            return int(user)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+class DocSaveService:
+    """Queue and run the downloads behind OnlyOffice save callbacks."""
+
+    def enqueue(self, doc: Doc, payload: Dict[str, Any]) -> Optional[DocSaveJob]:
+        """Record a job for a save callback; ``None`` if it is not one or known."""
+        try:
+            status = int(payload.get("status", 0))
+        except (TypeError, ValueError):
+            return None
+        url = payload.get("url")
+        if status not in SAVE_STATUSES or not url:
+            return None
+        document_key = str(payload.get("key") or onlyoffice_service.document_key(doc))
+        job_key = _job_key(document_key, status, url)
+        if DocSaveJob.query.filter_by(job_key=job_key).first() is not None:
+            return None
+        job = DocSaveJob(
+            job_key=job_key,
+            doc_id=doc.id,
+            document_key=document_key[:128],
+            status=status,
+            url=url,
+            user_id=_callback_user(payload),
+        )
+        db.session.add(job)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # The same callback arrived concurrently.
+            db.session.rollback()
+            return None
+        return job
+
+    def claim(
+        self,
+        timeout: float,
+        *,
+        skip: Collection[int] = (),
+        now: Optional[datetime] = None,
+    ) -> Optional[int]:
+        """Take the oldest runnable job not in ``skip``, or ``None``.
+
+        Saves of one document run in callback order: a job waits while an
+        earlier one for the same document is pending or running, so an
+        older file can never land after a newer one.
+        """
+        now = now or datetime.utcnow()
+        stale = now - timedelta(seconds=timeout)
+        runnable = or_(
+            DocSaveJob.state == PENDING,
+            (DocSaveJob.state == RUNNING) & (DocSaveJob.claimed_at < stale),
+        )
+        earlier = aliased(DocSaveJob)
+        next_in_line = ~exists().where(
+            earlier.doc_id == DocSaveJob.doc_id,
+            earlier.id < DocSaveJob.id,
+            earlier.state.in_((PENDING, RUNNING)),
+        )
+        candidates = runnable & next_in_line
+        if skip:
+            candidates = candidates & DocSaveJob.id.not_in(skip)
+        while True:
+            job_id = db.session.execute(
+                select(DocSaveJob.id).where(candidates).order_by(DocSaveJob.id).limit(1)
+            ).scalar()
+            if job_id is None:
+                db.session.rollback()
+                return None
+            result: Any = db.session.execute(
+                update(DocSaveJob)
+                .where(DocSaveJob.id == job_id, runnable)
+                .values(
+                    state=RUNNING,
+                    claimed_at=now,
+                    attempts=DocSaveJob.attempts + 1,
+                    updated_at=now,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            if result.rowcount:
+                return job_id
+            # Another worker claimed it first; look for the next one.
+
+    def run(self, job_id: int, *, timeout: float, max_attempts: int) -> bool:
+        """Fetch and store one claimed job's file; returns whether it did."""
+        job: Optional[DocSaveJob] = db.session.get(DocSaveJob, job_id)
+        if job is None:
+            return False
+        doc: Optional[Doc] = db.session.get(Doc, job.doc_id)
+        if doc is None:
+            job.state = FAILED
+            job.error = "Document no longer exists"
+            db.session.commit()
+            return False
+        try:
+            digest, size = self._download(job.url, timeout)
+            if self._superseded(job):
+                # A later save of this document landed meanwhile (this job
+                # was reclaimed from a worker that only looked dead).
+                job.state = DONE
+                job.finished_at = datetime.utcnow()
+                job.error = "Superseded by a later save"
+                db.session.commit()
+                return False
+            # Replaces the working file in one rename: readers see the old
+            # or the new content, never a partial file.
+            blob_store().copy_to(digest, document_service.working_path(doc))
+            version = document_service.record_version(
+                doc,
+                digest,
+                size,
+                created_by=job.user_id,
+                note=f"OnlyOffice save (status {job.status})",
+                from_editor=True,
+            )
+            if job.status == SAVED:
+                # Editing session closed: the next open needs a new key.
+                doc.content_version += 1
+            db.session.add(
+                FileLedger(
+                    doc_id=doc.id,
+                    action="saved",
+                    performed_by=job.user_id,
+                    comment=f"version {version.version_number} sha256={digest}",
+                )
+            )
+            job.state = DONE
+            job.doc_version_id = version.id
+            job.finished_at = datetime.utcnow()
+            job.error = None
+            db.session.commit()
+        except Exception as exc:
+            db.session.rollback()
+            job = db.session.get(DocSaveJob, job_id)
+            if job is None:
+                return False
+            job.state = FAILED if job.attempts >= max_attempts else PENDING
+            job.error = f"{type(exc).__name__}: {exc}"[:1000]
+            db.session.commit()
+            current_app.logger.warning("Saving doc %s failed: %s", job.doc_id, exc)
+            return False
+        onlyoffice_service.invalidate_editor_configs(doc.id)
+        return True
+
+    def _superseded(self, job: DocSaveJob) -> bool:
+        later = db.session.execute(
+            select(DocSaveJob.id)
+            .where(
+                DocSaveJob.doc_id == job.doc_id,
+                DocSaveJob.id > job.id,
+                DocSaveJob.state == DONE,
+                DocSaveJob.doc_version_id.is_not(None),
+            )
+            .limit(1)
+        ).scalar()
+        return later is not None
+
+    def _download(self, url: str, timeout: float) -> tuple[str, int]:
+        # No redirects: the callback vouched for this URL, not for others.
+        with httpx.stream("GET", url, timeout=timeout, follow_redirects=False) as res:
+            res.raise_for_status()
+            return blob_store().write(res.iter_bytes(CHUNK_SIZE))
+
+
+doc_save_service = DocSaveService()
+
+
+class DocSaveWorker:
+    """Per-process thread running queued save jobs.
+
+    It wakes on :meth:`notify` or every ``poll_interval`` seconds, which
+    also picks up jobs queued or abandoned by other workers. With
+    ``asynchronous=False`` jobs run in the notifying request (tests, tools).
+    """
+
+    def __init__(
+        self,
+        app: Flask,
+        *,
+        asynchronous: bool = True,
+        poll_interval: float = 5.0,
+        timeout: float = 120.0,
+        max_attempts: int = 5,
+    ) -> None:
+        self.app = app
+        self.asynchronous = asynchronous
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._owner_pid: Optional[int] = None
+
+    def notify(self) -> None:
+        if not self.asynchronous:
+            self.run_pending()
+            return
+        self._ensure_thread()
+        self._wake.set()
+
+    def run_pending(self) -> int:
+        """Run runnable jobs on the calling thread; returns how many ran.
+
+        Each job is tried once per call, so a failing download waits for
+        the next poll instead of being retried in a tight loop.
+        """
+        tried: Set[int] = set()
+        while True:
+            job_id = doc_save_service.claim(self.timeout, skip=tried)
+            if job_id is None:
+                return len(tried)
+            tried.add(job_id)
+            doc_save_service.run(
+                job_id, timeout=self.timeout, max_attempts=self.max_attempts
+            )
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            thread = self._thread if self._owner_pid == os.getpid() else None
+            self._thread = None
+        if thread is not None:
+            thread.join(timeout)
+
+    def _ensure_thread(self) -> None:
+        # A thread does not survive fork (e.g. gunicorn --preload).
+        if self._thread is not None and self._owner_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._owner_pid != os.getpid():
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="doc-save", daemon=True
+                )
+                self._owner_pid = os.getpid()
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                with self.app.app_context():
+                    self.run_pending()
+            except Exception:
+                self.app.logger.exception("Document save worker failed")
+
+
+def init_doc_save_worker(app: Flask, settings: Settings) -> None:
+    worker = DocSaveWorker(
+        app,
+        asynchronous=settings.doc_save_async,
+        poll_interval=settings.doc_save_poll_seconds,
+        timeout=settings.doc_save_timeout_seconds,
+        max_attempts=settings.doc_save_max_attempts,
+    )
+    app.extensions[EXTENSION_KEY] = worker
+    atexit.register(worker.shutdown)
+
+
+def doc_save_worker() -> DocSaveWorker:
+    return current_app.extensions[EXTENSION_KEY]
@@ -0,0 +1,116 @@
+"""Document content snapshots backed by the blob store."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Optional
+
+import sqlalchemy as sa
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from ..extensions import db
+from ..models.doc import Doc
+from ..models.doc_version import DocVersion
+from ..utils.blobs import blob_store
+from ..utils.errors import APIError
+
+# Docs whose content change came from their own editing session this
+# transaction; the Document Server already knows it under the current key.
+_EDITOR_SAVES_KEY = "doc_editor_saves"
+_CONTENT_ATTRS = ("path", "blob_sha256")
+
+
+@event.listens_for(Doc, "before_update")
+def _bump_content_version(_mapper: Any, _connection: Any, target: Doc) -> None:
+    """New content (or a new file) needs a new editor key, however it got there."""
+    state: Any = inspect(target)
+    if state.attrs.content_version.history.has_changes():
+        return
+    if not any(state.attrs[name].history.has_changes() for name in _CONTENT_ATTRS):
+        return
+    session = object_session(target)
+    if session is not None and target.id in session.info.get(_EDITOR_SAVES_KEY, ()):
+        return
+    target.content_version = (target.content_version or 0) + 1
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_editor_saves(session: Session) -> None:
+    session.info.pop(_EDITOR_SAVES_KEY, None)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back(session: Session, _previous_transaction: Any) -> None:
+    session.info.pop(_EDITOR_SAVES_KEY, None)
+
+
+class DocumentService:
+    """Record document versions as deduplicated snapshots."""
+
+    def working_path(self, doc: Doc) -> Path:
+        return blob_store().base_dir / doc.path
+
+    def create_version(
+        self, doc: Doc, *, created_by: Optional[int], note: Optional[str] = None
+    ) -> DocVersion:
+        """Snapshot the working file into the blob store and record it.
+
+        Content already in the store is not copied again, so a version of
+        unchanged content costs no extra space.
+        """
+        source = self.working_path(doc)
+        if not source.is_file():
+            raise APIError(
+                code="file_missing",
+                message="The document's file does not exist",
+                status_code=404,
+            )
+        digest, size = blob_store().ingest(source)
+        version = self.record_version(
+            doc, digest, size, created_by=created_by, note=note
+        )
+        db.session.commit()
+        return version
+
+    def record_version(
+        self,
+        doc: Doc,
+        digest: str,
+        size: int,
+        *,
+        created_by: Optional[int],
+        note: Optional[str] = None,
+        from_editor: bool = False,
+    ) -> DocVersion:
+        """Add the next version of ``doc`` for a stored blob; caller commits.
+
+        New content bumps ``doc.content_version`` unless ``from_editor``:
+        a save of the open editing session keeps its document key.
+        """
+        if from_editor:
+            db.session.info.setdefault(_EDITOR_SAVES_KEY, set()).add(doc.id)
+        version_number = (
+            db.session.query(
+                sa.func.coalesce(sa.func.max(DocVersion.version_number), 0)
+            )
+            .filter_by(doc_id=doc.id)
+            .scalar()
+            + 1
+        )
+        version = DocVersion(
+            doc_id=doc.id,
+            version_number=version_number,
+            path=blob_store().relative_path(digest),
+            blob_sha256=digest,
+            size=size,
+            created_by=created_by,
+            note=note,
+        )
+        doc.blob_sha256 = digest
+        db.session.add(version)
+        db.session.flush()
+        return version
+
+
+document_service = DocumentService()
@@ -0,0 +1,256 @@
+"""Periodic purge of expired invites, reset tokens and revocations.
+
+Rows are deleted in batches of ``MAINTENANCE_BATCH_SIZE`` ids, each in its
+own short transaction followed by a ``MAINTENANCE_BATCH_PAUSE_SECONDS``
+pause, so a large backlog never holds a long write lock. Invites and reset
+tokens that expired or were used up are kept for
+``MAINTENANCE_RETENTION_HOURS``; revocations go as soon as the tokens they
+block have expired.
+
+``flask purge-expired`` runs a purge once. With
+``MAINTENANCE_INTERVAL_SECONDS`` set, every worker also starts a background
+runner; a run first claims the ``maintenance`` row of ``cache_versions``
+with a conditional ``UPDATE`` on its timestamp, so only one worker across
+all hosts purges per interval.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from flask import Flask
+from sqlalchemy import ColumnElement, Table, delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from ..config import Settings
+from ..extensions import db
+from ..models.cache_version import CacheVersion
+from ..models.invite import InviteCode
+from ..models.password_reset_tokens import PasswordResetToken
+from ..models.revoked_token import RevokedToken
+
+EXTENSION_KEY = "maintenance_runner"
+LEASE_NAME = "maintenance"
+
+_versions = CacheVersion.__table__
+
+
+@dataclass
+class PurgeReport:
+    """Rows removed per table by one purge."""
+
+    deleted: Dict[str, int] = field(default_factory=dict)
+    batches: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def total(self) -> int:
+        return sum(self.deleted.values())
+
+    def summary(self) -> str:
+        parts = ", ".join(f"{name}={count}" for name, count in self.deleted.items())
+        return f"purged {self.total} row(s) in {self.batches} batch(es): {parts}"
+
+
+class MaintenanceService:
+    """Delete rows that can no longer be used."""
+
+    def purge_expired(
+        self,
+        *,
+        batch_size: int = 500,
+        pause: float = 0.0,
+        retention: timedelta = timedelta(0),
+        now: Optional[datetime] = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> PurgeReport:
+        started = time.monotonic()
+        now = now or datetime.utcnow()
+        cutoff = now - retention
+        invites, resets, revoked = (
+            InviteCode.__table__,
+            PasswordResetToken.__table__,
+            RevokedToken.__table__,
+        )
+        targets = [
+            (
+                invites,
+                or_(
+                    invites.c.expires_at < cutoff,
+                    (
+                        (invites.c.uses >= invites.c.max_uses)
+                        | invites.c.is_active.is_(False)
+                    )
+                    & (invites.c.updated_at < cutoff),
+                ),
+            ),
+            (
+                resets,
+                or_(
+                    resets.c.expires_at < cutoff,
+                    resets.c.used.is_(True) & (resets.c.updated_at < cutoff),
+                ),
+            ),
+            # The blocklist ignores these already, see app.utils.revocation.
+            (revoked, revoked.c.expires_at <= now),
+        ]
+        report = PurgeReport()
+        for table, condition in targets:
+            report.deleted[table.name] = 0
+            while True:
+                count = self._delete_batch(table, condition, batch_size)
+                if not count:
+                    break
+                report.deleted[table.name] += count
+                report.batches += 1
+                if count < batch_size:
+                    break
+                if pause:
+                    sleep(pause)
+        report.elapsed = time.monotonic() - started
+        return report
+
+    def _delete_batch(
+        self, table: Table, condition: ColumnElement[bool], batch_size: int
+    ) -> int:
+        ids: List[int] = list(
+            db.session.execute(
+                select(table.c.id)
+                .where(condition)
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).scalars()
+        )
+        if ids:
+            db.session.execute(delete(table).where(table.c.id.in_(ids)))
+        db.session.commit()
+        return len(ids)
+
+    def claim_run(self, interval: float, now: Optional[datetime] = None) -> bool:
+        """Take this interval's run unless another worker already has.
+
+        A run is due once the lease row is more than half an interval old,
+        so workers waking at slightly different times do not both purge.
+        """
+        now = now or datetime.utcnow()
+        due_before = now - timedelta(seconds=interval / 2)
+        result: Any = db.session.execute(
+            update(_versions)
+            .where(_versions.c.name == LEASE_NAME, _versions.c.updated_at <= due_before)
+            .values(version=_versions.c.version + 1, updated_at=now)
+        )
+        if result.rowcount:
+            db.session.commit()
+            return True
+        exists = db.session.execute(
+            select(_versions.c.id).where(_versions.c.name == LEASE_NAME)
+        ).first()
+        if exists:
+            db.session.rollback()
+            return False
+        try:
+            db.session.execute(
+                insert(_versions).values(
+                    name=LEASE_NAME, version=1, created_at=now, updated_at=now
+                )
+            )
+            db.session.commit()
+        except IntegrityError:
+            # Another worker created the row first and owns this run.
+            db.session.rollback()
+            return False
+        return True
+
+
+maintenance_service = MaintenanceService()
+
+
+def _purge_options(settings: Settings) -> Dict[str, Any]:
+    return {
+        "batch_size": settings.maintenance_batch_size,
+        "pause": settings.maintenance_batch_pause_seconds,
+        "retention": timedelta(hours=settings.maintenance_retention_hours),
+    }
+
+
+class MaintenanceRunner:
+    """Daemon thread that purges every ``interval`` seconds when leader."""
+
+    def __init__(self, app: Flask, settings: Settings) -> None:
+        self.app = app
+        self.settings = settings
+        self.interval = settings.maintenance_interval_seconds
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._owner_pid: Optional[int] = None
+
+    def ensure_started(self) -> None:
+        # Started from the first request so forked workers get their own.
+        if self._thread is not None and self._owner_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._owner_pid != os.getpid():
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="maintenance", daemon=True
+                )
+                self._owner_pid = os.getpid()
+                self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run_once(self) -> Optional[PurgeReport]:
+        with self.app.app_context():
+            if not maintenance_service.claim_run(self.interval):
+                return None
+            report = maintenance_service.purge_expired(**_purge_options(self.settings))
+        self.app.logger.info("Maintenance %s", report.summary())
+        return report
+
+    def _run(self) -> None:
+        # Jitter keeps workers started together from racing for every lease.
+        while not self._stop.wait(self.interval * random.uniform(1.0, 1.1)):
+            try:
+                self.run_once()
+            except Exception:
+                self.app.logger.exception("Maintenance run failed")
+
+
+def init_maintenance(app: Flask, settings: Settings) -> None:
+    if not settings.maintenance_interval_seconds:
+        return
+    runner = MaintenanceRunner(app, settings)
+    app.extensions[EXTENSION_KEY] = runner
+    app.before_request(runner.ensure_started)
+
+
+def register_maintenance_cli(app: Flask) -> None:
+    """Register ``flask purge-expired`` for one-off or cron-driven purges."""
+
+    import click
+
+    @app.cli.command("purge-expired")
+    @click.option("--batch-size", type=int, default=None)
+    @click.option("--pause", type=float, default=None, help="Seconds between batches.")
+    def purge_expired(batch_size: Optional[int], pause: Optional[float]) -> None:
+        settings: Settings = app.config["APP_SETTINGS"]
+        options = _purge_options(settings)
+        if batch_size is not None:
+            options["batch_size"] = batch_size
+        if pause is not None:
+            options["pause"] = pause
+        report = maintenance_service.purge_expired(**options)
+        for name, count in report.deleted.items():
+            click.echo(f"{name}: {count}")
+        click.echo(
+            f"Purged {report.total} row(s) in {report.batches} batch(es)"
+            f" ({report.elapsed:.2f}s)"
+        )
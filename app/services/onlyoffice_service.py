@@ -3,15 +3,35 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Mapping, Optional, Tuple
+from urllib.parse import urlsplit
 
-from flask import url_for
+from flask import Flask, current_app, has_request_context, request, url_for
 
 from ..config import Settings, settings as default_settings
 from ..models.doc import Doc
-from ..models.user import User
+from ..utils.cache import LRUCache
 from ..utils.errors import APIError
-from ..utils.onlyoffice import build_editor_config, verify_callback_token
+from ..utils.identity import UserSnapshot
+from ..utils.onlyoffice import (
+    DEFAULT_PERMISSIONS,
+    build_editor_config,
+    verify_callback_token,
+)
+
+EDITOR_CONFIG_CACHE_KEY = "editor_config_cache"
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def _origin(url: str) -> Optional[Tuple[str, str, int]]:
+    try:
+        parts = urlsplit(url)
+        port = parts.port or DEFAULT_PORTS.get(parts.scheme)
+    except ValueError:
+        return None
+    if not parts.hostname or port is None:
+        return None
+    return parts.scheme, parts.hostname.lower(), port
 
 
 class OnlyOfficeService:
@@ -20,38 +40,134 @@ class OnlyOfficeService:
     def __init__(self, settings: Settings | None = None) -> None:
         self.settings = settings or default_settings
 
-    def document_access_payload(self, doc: Doc, user: User) -> Dict[str, Any]:
+    def document_access_payload(
+        self,
+        doc: Doc,
+        user: UserSnapshot,
+        permissions: Optional[Mapping[str, bool]] = None,
+    ) -> Dict[str, Any]:
+        """Editor config and file URL, signed once per distinct input.
+
+        Entries are keyed by everything that ends up in the payload; the
+        content version changes the key on every save, and
+        :meth:`invalidate_editor_configs` drops the superseded entries.
+        """
+        permissions = permissions or DEFAULT_PERMISSIONS
+        cache: Optional[LRUCache] = current_app.extensions.get(EDITOR_CONFIG_CACHE_KEY)
+        key = (
+            doc.id,
+            doc.content_version,
+            doc.name,
+            doc.path,
+            user.id,
+            user.username,
+            tuple(sorted(permissions.items())),
+            # URLs are external, so they depend on the requested host.
+            request.host_url if has_request_context() else None,
+        )
+        payload = cache.get(key) if cache is not None else None
+        if payload is None:
+            payload = self._build_access_payload(doc, user, permissions)
+            if cache is not None:
+                cache.set(key, payload)
+        return payload
+
+    def invalidate_editor_configs(self, doc_id: int) -> None:
+        cache: Optional[LRUCache] = current_app.extensions.get(EDITOR_CONFIG_CACHE_KEY)
+        if cache is not None:
+            cache.discard_where(lambda key: key[0] == doc_id)
+
+    def _build_access_payload(
+        self, doc: Doc, user: UserSnapshot, permissions: Mapping[str, bool]
+    ) -> Dict[str, Any]:
         file_url = self._build_file_url(doc)
         callback_url = url_for(
             "docs.handle_doc_callback", doc_id=doc.id, _external=True
         )
         config = build_editor_config(
-            doc_id=doc.id,
+            document_key=self.document_key(doc),
             file_name=doc.name,
             file_url=file_url,
             callback_url=callback_url,
             user_id=user.id,
             user_display_name=user.username,
             settings=self.settings,
+            permissions=permissions,
         )
         return {"config": config, "documentUrl": file_url}
 
+    def document_key(self, doc: Doc) -> str:
+        """Key under which the Document Server caches and co-edits ``doc``.
+
+        Stable until the content changes (``content_version``), so every editor
+        opened in between joins the same session and reuses the server's
+        converted copy. The creation time keeps keys unique if ids are
+        reused, e.g. after restoring an older database.
+        """
+        created = int(doc.created_at.timestamp()) if doc.created_at else 0
+        return f"{doc.id}-{doc.content_version}-{created:x}"
+
+    def key_matches(self, doc: Doc, key: str) -> bool:
+        """Whether ``key`` is one of ``doc``'s keys, current or earlier."""
+        created = int(doc.created_at.timestamp()) if doc.created_at else 0
+        doc_id, _, rest = key.partition("-")
+        version, _, created_hex = rest.partition("-")
+        return (
+            doc_id == str(doc.id)
+            and version.isdigit()
+            and created_hex == f"{created:x}"
+        )
+
+    def trusted_save(
+        self,
+        doc: Doc,
+        callback: Mapping[str, Any],
+        *,
+        signed: bool,
+        settings: Optional[Settings] = None,
+    ) -> bool:
+        """Whether a save callback may replace ``doc``'s content.
+
+        It must name one of the document's keys, and be signed with
+        ``OO_JWT_SECRET`` or, only while no secret is configured, point at
+        a file on ``OO_BASE_URL``; anything else could make this server
+        fetch arbitrary URLs into the document.
+        """
+        settings = settings or self.settings
+        if not self.key_matches(doc, str(callback.get("key") or "")):
+            return False
+        if signed:
+            return True
+        if settings.oo_jwt_secret:
+            return False
+        origin = _origin(str(callback.get("url") or ""))
+        return origin is not None and origin == _origin(settings.oo_base_url)
+
     def _build_file_url(self, doc: Doc) -> str:
         return url_for("files.serve_file", path=doc.path, _external=True)
 
     def resolve_file_path(self, doc: Doc) -> Path:
         return Path(self.settings.base_file_dir) / doc.path
 
-    def parse_callback(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+    def parse_callback(
+        self, payload: Dict[str, Any], settings: Optional[Settings] = None
+    ) -> Dict[str, Any]:
+        settings = settings or self.settings
         if "token" in payload:
-            if not self.settings.oo_jwt_secret:
+            if not settings.oo_jwt_secret:
                 raise APIError(
                     code="oo_secret_missing",
                     message="OO_JWT_SECRET not configured",
                     status_code=500,
                 )
-            return verify_callback_token(payload["token"], self.settings.oo_jwt_secret)
+            return verify_callback_token(payload["token"], settings.oo_jwt_secret)
         return payload
 
 
 onlyoffice_service = OnlyOfficeService()
+
+
+def init_editor_config_cache(app: Flask, settings: Settings) -> None:
+    app.extensions[EDITOR_CONFIG_CACHE_KEY] = LRUCache(
+        maxsize=settings.editor_config_cache_size
+    )
@@ -3,6 +3,9 @@
 from __future__ import annotations
 
 from datetime import datetime, timedelta
+from typing import Any, List
+
+from sqlalchemy import ColumnElement, select, update
 
 from ..config import Settings, settings as default_settings
 from ..extensions import db
@@ -12,6 +15,22 @@ from ..utils.errors import APIError
 from ..utils.security import generate_token
 
 
+def _usable(token: str, now: datetime) -> List[ColumnElement[bool]]:
+    return [
+        PasswordResetToken.token == token,
+        PasswordResetToken.used.is_(False),
+        PasswordResetToken.expires_at >= now,
+    ]
+
+
+def invalid_token() -> APIError:
+    return APIError(
+        code="invalid_token",
+        message="Reset token is invalid or expired",
+        status_code=400,
+    )
+
+
 class PasswordService:
     """Utility service for issuing and consuming password reset tokens."""
 
@@ -30,15 +49,30 @@ class PasswordService:
         db.session.commit()
         return token
 
+    def is_usable(self, token: str) -> bool:
+        """Cheap pre-check; :meth:`consume_token` stays the authoritative one."""
+        found = db.session.execute(
+            select(PasswordResetToken.id)
+            .where(*_usable(token, datetime.utcnow()))
+            .limit(1)
+        ).scalar()
+        return found is not None
+
     def consume_token(self, token: str) -> PasswordResetToken:
-        reset = PasswordResetToken.query.filter_by(token=token).one_or_none()
-        if not reset or not reset.is_valid():
-            raise APIError(
-                code="invalid_token",
-                message="Reset token is invalid or expired",
-                status_code=400,
-            )
-        reset.used = True
-        db.session.add(reset)
+        """Mark ``token`` used with one conditional ``UPDATE``.
+
+        Of several concurrent requests with the same token, exactly one sees
+        a matched row; the rest get ``invalid_token``.
+        """
+        now = datetime.utcnow()
+        result: Any = db.session.execute(
+            update(PasswordResetToken)
+            .where(*_usable(token, now))
+            .values(used=True, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount:
+            db.session.rollback()
+            raise invalid_token()
         db.session.commit()
-        return reset
+        return PasswordResetToken.query.filter_by(token=token).populate_existing().one()
@@ -0,0 +1,423 @@
+"""Reagent kit, specification and production batch operations."""
+
+from __future__ import annotations
+
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Integer, String, and_, cast, func, literal, null, or_, select
+from sqlalchemy import union_all
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased, selectinload
+
+from ..extensions import db
+from ..models.reagent_kit_history import ReagentKitHistory
+from ..models.reagent_kit_specs import ReagentKitSpec
+from ..models.reagent_kits import ReagentKit
+from ..models.reagent_production_history import ReagentProductionHistory
+from ..models.reagent_productions import ReagentProduction
+from ..models.reagent_spec_history import ReagentSpecHistory
+from ..utils.delta import unified_diff
+from ..utils.errors import APIError, NotFoundError
+
+KIT_INCLUDES = frozenset({"specs", "productions"})
+# Tie-break order for timeline events sharing a timestamp.
+GENEALOGY_SOURCES = ("kit", "spec", "production")
+
+TimelineKey = Tuple[datetime, int, int]
+
+
+def _encode_timeline_cursor(key: TimelineKey) -> str:
+    created_at, rank, event_id = key
+    raw = f"{created_at.isoformat()}|{rank}|{event_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_timeline_cursor(cursor: str) -> TimelineKey:
+    try:
+        created_at, rank, event_id = (
+            base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        )
+        return datetime.fromisoformat(created_at), int(rank), int(event_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise APIError(
+            code="invalid_cursor", message="Malformed cursor", status_code=400
+        ) from exc
+
+
+def parse_includes(raw: str | None) -> set[str]:
+    """Parse a comma separated ``include`` parameter against known relations."""
+    requested = {part.strip() for part in (raw or "").split(",") if part.strip()}
+    unknown = requested - KIT_INCLUDES
+    if unknown:
+        raise APIError(
+            code="invalid_include",
+            message="Unknown include requested",
+            status_code=400,
+            details={"unknown": sorted(unknown), "allowed": sorted(KIT_INCLUDES)},
+        )
+    return requested
+
+
+class ReagentService:
+    """Load reagent aggregates in a fixed number of queries."""
+
+    def _kit_query(self, includes: Iterable[str]):
+        query = ReagentKit.query
+        if "specs" in includes:
+            query = query.options(selectinload(ReagentKit.latest_spec))
+        return query
+
+    def list_kits(
+        self, *, offset: int, limit: int, includes: Iterable[str] = ()
+    ) -> Tuple[int, List[ReagentKit]]:
+        query = self._kit_query(includes).order_by(ReagentKit.name.asc())
+        total = ReagentKit.query.count()
+        return total, query.offset(offset).limit(limit).all()
+
+    def get_kit(self, kit_id: int, includes: Iterable[str] = ()) -> ReagentKit:
+        kit = self._kit_query(includes).filter(ReagentKit.id == kit_id).one_or_none()
+        if not kit:
+            raise NotFoundError()
+        return kit
+
+    def productions_page(
+        self, kit_id: int, *, cursor: int | None, limit: int
+    ) -> Tuple[List[ReagentProduction], int | None]:
+        """Newest-first production batches after ``cursor`` (keyset on id)."""
+        query = ReagentProduction.query.filter(ReagentProduction.kit_id == kit_id)
+        if cursor is not None:
+            query = query.filter(ReagentProduction.id < cursor)
+        rows = query.order_by(ReagentProduction.id.desc()).limit(limit + 1).all()
+        next_cursor = rows[limit - 1].id if len(rows) > limit else None
+        return rows[:limit], next_cursor
+
+    def get_spec_version(self, kit_id: int, version: str) -> ReagentKitSpec:
+        """Latest spec row of ``kit_id`` labelled ``version``."""
+        spec = (
+            ReagentKitSpec.query.filter_by(kit_id=kit_id, version=version)
+            .order_by(ReagentKitSpec.id.desc())
+            .first()
+        )
+        if not spec:
+            raise NotFoundError(f"Spec version {version} not found")
+        return spec
+
+    def diff_specs(
+        self, kit_id: int, from_version: Optional[str], to_version: Optional[str]
+    ) -> Dict[str, Any]:
+        if not from_version or not to_version:
+            raise APIError(
+                code="invalid_request",
+                message="from and to versions are required",
+                status_code=400,
+            )
+        old = self.get_spec_version(kit_id, from_version)
+        new = self.get_spec_version(kit_id, to_version)
+        return {
+            "from": {"id": old.id, "version": old.version},
+            "to": {"id": new.id, "version": new.version},
+            "diff": unified_diff(old.content, new.content, old.version, new.version),
+        }
+
+    def genealogy(
+        self,
+        kit_id: int,
+        *,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        cursor: Optional[str],
+        limit: int,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Kit, spec and production history of a kit as one ascending timeline.
+
+        All three sources are merged with ``UNION ALL`` and paged with a
+        ``(created_at, source, id)`` keyset, so each branch is a range scan on
+        its ``(parent, created_at)`` index. Production events carry the spec
+        that was current when the batch was produced.
+        """
+        after = _decode_timeline_cursor(cursor) if cursor else None
+
+        def window(column: Any) -> List[Any]:
+            clauses = []
+            if start is not None:
+                clauses.append(column >= start)
+            if end is not None:
+                clauses.append(column < end)
+            if after is not None:
+                clauses.append(column >= after[0])
+            return clauses
+
+        kit_events = select(
+            ReagentKitHistory.id.label("event_id"),
+            literal(0).label("rank"),
+            ReagentKitHistory.action,
+            ReagentKitHistory.notes,
+            ReagentKitHistory.created_at,
+            cast(null(), Integer).label("spec_id"),
+            cast(null(), String).label("spec_version"),
+            cast(null(), Integer).label("production_id"),
+            cast(null(), String).label("batch_code"),
+        ).where(
+            ReagentKitHistory.kit_id == kit_id, *window(ReagentKitHistory.created_at)
+        )
+        spec_events = (
+            select(
+                ReagentSpecHistory.id,
+                literal(1),
+                ReagentSpecHistory.action,
+                ReagentSpecHistory.notes,
+                ReagentSpecHistory.created_at,
+                ReagentKitSpec.id,
+                ReagentKitSpec.version,
+                cast(null(), Integer),
+                cast(null(), String),
+            )
+            .join(ReagentKitSpec, ReagentKitSpec.id == ReagentSpecHistory.spec_id)
+            .where(
+                ReagentKitSpec.kit_id == kit_id,
+                *window(ReagentSpecHistory.created_at),
+            )
+        )
+        current_spec = aliased(ReagentKitSpec)
+        current_spec_id = (
+            select(func.max(ReagentKitSpec.id))
+            .where(
+                ReagentKitSpec.kit_id == ReagentProduction.kit_id,
+                ReagentKitSpec.created_at <= ReagentProduction.created_at,
+            )
+            .correlate(ReagentProduction)
+            .scalar_subquery()
+        )
+        production_events = (
+            select(
+                ReagentProductionHistory.id,
+                literal(2),
+                ReagentProductionHistory.action,
+                ReagentProductionHistory.notes,
+                ReagentProductionHistory.created_at,
+                current_spec.id,
+                current_spec.version,
+                ReagentProduction.id,
+                ReagentProduction.batch_code,
+            )
+            .join(
+                ReagentProduction,
+                ReagentProduction.id == ReagentProductionHistory.production_id,
+            )
+            .outerjoin(current_spec, current_spec.id == current_spec_id)
+            .where(
+                ReagentProduction.kit_id == kit_id,
+                *window(ReagentProductionHistory.created_at),
+            )
+        )
+
+        timeline = union_all(kit_events, spec_events, production_events).subquery()
+        query = select(timeline)
+        if after is not None:
+            created_at, rank, event_id = after
+            query = query.where(
+                or_(
+                    timeline.c.created_at > created_at,
+                    and_(
+                        timeline.c.created_at == created_at,
+                        or_(
+                            timeline.c.rank > rank,
+                            and_(
+                                timeline.c.rank == rank,
+                                timeline.c.event_id > event_id,
+                            ),
+                        ),
+                    ),
+                )
+            )
+        rows = db.session.execute(
+            query.order_by(
+                timeline.c.created_at, timeline.c.rank, timeline.c.event_id
+            ).limit(limit + 1)
+        ).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = _encode_timeline_cursor(
+                (last.created_at, last.rank, last.event_id)
+            )
+        events = [
+            {
+                "source": GENEALOGY_SOURCES[row.rank],
+                "id": row.event_id,
+                "action": row.action,
+                "notes": row.notes,
+                "created_at": row.created_at.isoformat(),
+                "spec": (
+                    {"id": row.spec_id, "version": row.spec_version}
+                    if row.spec_id is not None
+                    else None
+                ),
+                "production": (
+                    {"id": row.production_id, "batch_code": row.batch_code}
+                    if row.production_id is not None
+                    else None
+                ),
+            }
+            for row in rows[:limit]
+        ]
+        return events, next_cursor
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def create_kit(self, payload: Dict[str, Any]) -> ReagentKit:
+        if not payload.get("name"):
+            raise APIError(
+                code="invalid_request", message="name is required", status_code=400
+            )
+        kit = ReagentKit(name=payload["name"], description=payload.get("description"))
+        db.session.add(kit)
+        self._flush()
+        db.session.add(
+            ReagentKitHistory(
+                kit_id=kit.id, action="created", notes=payload.get("description")
+            )
+        )
+        self._commit()
+        return kit
+
+    def update_kit(self, kit: ReagentKit, payload: Dict[str, Any]) -> ReagentKit:
+        for key in ("name", "description"):
+            if key in payload:
+                setattr(kit, key, payload[key])
+        db.session.add(
+            ReagentKitHistory(
+                kit_id=kit.id, action="updated", notes=payload.get("description")
+            )
+        )
+        self._commit()
+        return kit
+
+    def delete_kit(self, kit: ReagentKit) -> None:
+        if ReagentProduction.query.filter_by(kit_id=kit.id).first():
+            raise APIError(
+                code="kit_in_use",
+                message="Kit has production batches and cannot be deleted",
+                status_code=409,
+            )
+        db.session.delete(kit)
+        db.session.commit()
+
+    def add_spec(self, kit: ReagentKit, payload: Dict[str, Any]) -> ReagentKitSpec:
+        if not payload.get("version") or payload.get("content") is None:
+            raise APIError(
+                code="invalid_request",
+                message="version and content are required",
+                status_code=400,
+            )
+        spec = ReagentKitSpec(
+            kit_id=kit.id, version=payload["version"], content=payload["content"]
+        )
+        db.session.add(spec)
+        self._flush()
+        db.session.add(
+            ReagentSpecHistory(spec_id=spec.id, action="created", notes=spec.version)
+        )
+        self._commit()
+        return spec
+
+    def create_production(
+        self, kit: ReagentKit, payload: Dict[str, Any]
+    ) -> ReagentProduction:
+        if not payload.get("batch_code"):
+            raise APIError(
+                code="invalid_request",
+                message="batch_code is required",
+                status_code=400,
+            )
+        quantity = payload.get("quantity", 0)
+        if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity < 0:
+            raise APIError(
+                code="invalid_request",
+                message="quantity must be a non-negative integer",
+                status_code=400,
+            )
+        production = ReagentProduction(
+            kit_id=kit.id,
+            batch_code=payload["batch_code"],
+            unit=payload.get("unit"),
+            initial_quantity=quantity,
+            balance=quantity,
+        )
+        db.session.add(production)
+        self._flush()
+        db.session.add(
+            ReagentProductionHistory(
+                production_id=production.id,
+                action="created",
+                notes=payload.get("notes"),
+            )
+        )
+        self._commit()
+        return production
+
+    def _flush(self) -> None:
+        try:
+            db.session.flush()
+        except IntegrityError as exc:
+            self._integrity_error(exc)
+
+    def _commit(self) -> None:
+        try:
+            db.session.commit()
+        except IntegrityError as exc:
+            self._integrity_error(exc)
+
+    def _integrity_error(self, exc: IntegrityError) -> None:
+        db.session.rollback()
+        raise APIError(
+            code="integrity_error",
+            message="Constraint violation",
+            status_code=400,
+            details={"error": str(exc)},
+        )
+
+
+reagent_service = ReagentService()
+
+
+def register_reagent_cli(app) -> None:
+    """Register ``flask reagent-specs`` for converting spec storage."""
+
+    import click
+
+    @app.cli.command("reagent-specs")
+    @click.option(
+        "--expand",
+        is_flag=True,
+        help="Store every revision as plain text again (before downgrading).",
+    )
+    def reagent_specs(expand: bool) -> None:
+        if expand:
+            specs = ReagentKitSpec.query.filter(
+                ReagentKitSpec.payload.isnot(None)
+            ).all()
+            texts = [(spec, spec.content) for spec in specs]
+            for spec, text in texts:
+                spec.stored_content = text
+                spec.payload = None
+                spec.base_spec_id = None
+            db.session.commit()
+            click.echo(f"Expanded {len(texts)} spec revision(s)")
+            return
+        legacy = (
+            ReagentKitSpec.query.filter(ReagentKitSpec.payload.is_(None))
+            .order_by(ReagentKitSpec.id.asc())
+            .all()
+        )
+        for spec in legacy:
+            spec.content = spec.stored_content or ""
+            # Flush one at a time so each row is encoded against its snapshot.
+            db.session.flush()
+        db.session.commit()
+        click.echo(f"Compacted {len(legacy)} spec revision(s)")
@@ -0,0 +1,177 @@
+"""Stock ledger of reagent production batches with checkpointed balances."""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+
+from ..extensions import db
+from ..models.reagent_balance_checkpoints import ReagentBalanceCheckpoint
+from ..models.reagent_consumptions import MOVEMENT_KINDS, ReagentConsumption
+from ..models.reagent_productions import ReagentProduction
+from ..utils.errors import APIError, NotFoundError
+
+# A balance checkpoint is stored every this many movements of a batch.
+CHECKPOINT_INTERVAL = 50
+
+
+def _signed_delta(kind: str, amount: Any) -> int:
+    if kind not in MOVEMENT_KINDS:
+        raise APIError(
+            code="invalid_request",
+            message="Unknown movement kind",
+            status_code=400,
+            details={"allowed": list(MOVEMENT_KINDS)},
+        )
+    if isinstance(amount, bool) or not isinstance(amount, int):
+        raise APIError(
+            code="invalid_request",
+            message="amount must be an integer",
+            status_code=400,
+        )
+    if kind == "adjust":
+        if amount == 0:
+            raise APIError(
+                code="invalid_request",
+                message="adjust amount must not be zero",
+                status_code=400,
+            )
+        return amount
+    if amount <= 0:
+        raise APIError(
+            code="invalid_request",
+            message="amount must be positive",
+            status_code=400,
+        )
+    return -amount if kind == "consume" else amount
+
+
+class ReagentStockService:
+    """Record batch movements and answer balance queries without full scans.
+
+    The current balance is cached on ``reagent_productions`` and moved in the
+    same statement that reserves the next ledger sequence number. Running
+    balances for history pages are replayed from the nearest checkpoint, so
+    at most ``CHECKPOINT_INTERVAL`` movements are summed per request.
+    """
+
+    def get_production(self, production_id: int) -> ReagentProduction:
+        production = ReagentProduction.query.get(production_id)
+        if not production:
+            raise NotFoundError()
+        return production
+
+    def record_movement(
+        self,
+        production: ReagentProduction,
+        payload: Dict[str, Any],
+        user_id: Optional[int] = None,
+    ) -> ReagentConsumption:
+        kind = payload.get("kind", "consume")
+        delta = _signed_delta(kind, payload.get("amount"))
+        productions = ReagentProduction.__table__
+        # Guarded increment: concurrent writers serialize on the row and can
+        # never take a batch below zero.
+        result = db.session.execute(
+            update(productions)
+            .where(
+                productions.c.id == production.id,
+                productions.c.balance + delta >= 0,
+            )
+            .values(
+                balance=productions.c.balance + delta,
+                movement_count=productions.c.movement_count + 1,
+            )
+        )
+        if not result.rowcount:
+            db.session.rollback()
+            raise APIError(
+                code="insufficient_stock",
+                message="Batch balance is lower than the requested amount",
+                status_code=409,
+                details={"balance": production.balance},
+            )
+        db.session.refresh(production, ["balance", "movement_count"])
+        movement = ReagentConsumption(
+            production_id=production.id,
+            seq=production.movement_count,
+            kind=kind,
+            delta=delta,
+            user_id=user_id,
+            notes=payload.get("notes"),
+        )
+        db.session.add(movement)
+        if movement.seq % CHECKPOINT_INTERVAL == 0:
+            db.session.add(
+                ReagentBalanceCheckpoint(
+                    production_id=production.id,
+                    seq=movement.seq,
+                    balance=production.balance,
+                )
+            )
+        db.session.commit()
+        return movement
+
+    def balance_at(self, production: ReagentProduction, seq: int) -> int:
+        """Balance right after movement ``seq`` (0 is the initial quantity)."""
+        if seq >= production.movement_count:
+            return production.balance
+        checkpoint = db.session.execute(
+            select(ReagentBalanceCheckpoint.seq, ReagentBalanceCheckpoint.balance)
+            .where(
+                ReagentBalanceCheckpoint.production_id == production.id,
+                ReagentBalanceCheckpoint.seq <= seq,
+            )
+            .order_by(ReagentBalanceCheckpoint.seq.desc())
+            .limit(1)
+        ).first()
+        base_seq, balance = (
+            checkpoint if checkpoint else (0, production.initial_quantity)
+        )
+        if seq == base_seq:
+            return balance
+        replayed = db.session.execute(
+            select(func.coalesce(func.sum(ReagentConsumption.delta), 0)).where(
+                ReagentConsumption.production_id == production.id,
+                ReagentConsumption.seq > base_seq,
+                ReagentConsumption.seq <= seq,
+            )
+        ).scalar_one()
+        return balance + int(replayed)
+
+    def movements_page(
+        self, production: ReagentProduction, *, cursor: int | None, limit: int
+    ) -> Tuple[List[Dict[str, Any]], int | None]:
+        """Newest-first movements before ``cursor`` (a ``seq``) with balances."""
+        query = ReagentConsumption.query.filter(
+            ReagentConsumption.production_id == production.id
+        )
+        if cursor is not None:
+            query = query.filter(ReagentConsumption.seq < cursor)
+        rows = query.order_by(ReagentConsumption.seq.desc()).limit(limit + 1).all()
+        next_cursor = rows[limit - 1].seq if len(rows) > limit else None
+        rows = rows[:limit]
+        items = []
+        if rows:
+            balance = self.balance_at(production, rows[0].seq)
+            for row in rows:
+                items.append({**row.to_dict(), "balance_after": balance})
+                balance -= row.delta
+        return items, next_cursor
+
+    def low_stock(
+        self, threshold: int, *, kit_id: int | None = None, limit: int
+    ) -> List[ReagentProduction]:
+        """Batches with ``balance <= threshold``, lowest first (range on index)."""
+        query = ReagentProduction.query.filter(ReagentProduction.balance <= threshold)
+        if kit_id is not None:
+            query = query.filter(ReagentProduction.kit_id == kit_id)
+        return (
+            query.order_by(ReagentProduction.balance.asc(), ReagentProduction.id.asc())
+            .limit(limit)
+            .all()
+        )
+
+
+reagent_stock_service = ReagentStockService()
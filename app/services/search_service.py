@@ -0,0 +1,454 @@
+"""Full-text search over document names, descriptions and contents.
+
+Text is extracted from each document's working file (see
+app.utils.text_extract) and kept in ``doc_search_entries``. On SQLite the
+index is an FTS5 table ranked with BM25; on other databases it is an
+inverted index in ``doc_search_terms`` (one posting per term and document)
+scored the same way in Python. Both are fed the same tokens: case-folded
+words, with CJK runs split into overlapping character pairs since they have
+no spaces to split on. Every query term must match, the last one as a
+prefix.
+
+Committing a new or changed ``Doc`` queues it for indexing on a small thread
+pool (``SEARCH_INDEX_WORKERS``, 0 indexes inline); a file is only
+extracted again once it has been replaced. ``flask search-reindex`` builds
+the index for documents that predate it.
+"""
+
+from __future__ import annotations
+
+import atexit
+import math
+import os
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from flask import Flask, current_app, has_app_context
+from sqlalchemy import delete, event, func, insert, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, scoped_session
+
+from ..config import Settings
+from ..extensions import db
+from ..models.doc import Doc
+from ..models.doc_search import FTS_TABLE, DocSearchEntry, DocSearchTerm
+from ..utils.text_extract import ExtractionError, extract_text
+from .document_service import document_service
+
+EXTENSION_KEY = "search_indexer"
+_PENDING_KEY = "search_index_pending"
+
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+SNIPPET_CHARS = 160
+# Relative weight of a hit in the name, description and content.
+FIELD_WEIGHTS = (10, 4, 1)
+# BM25 term-frequency saturation, as FTS5 uses.
+BM25_K1 = 1.2
+
+_CJK_CHARS = (
+    "\u3040-\u30ff"  # kana
+    "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"  # ideographs
+    "\uac00-\ud7af"  # hangul
+)
+_WORD = re.compile(r"\w+")
+_SCRIPT_RUN = re.compile(f"[{_CJK_CHARS}]+|[^{_CJK_CHARS}]+")
+_CJK = re.compile(f"[{_CJK_CHARS}]")
+
+_entries = DocSearchEntry.__table__
+_terms = DocSearchTerm.__table__
+
+
+def tokenize(value: str) -> List[str]:
+    tokens: List[str] = []
+    for word in _WORD.findall(value.casefold()):
+        if not _CJK.search(word):
+            if len(word) <= MAX_TERM_LENGTH:
+                tokens.append(word)
+            continue
+        for run in _SCRIPT_RUN.findall(word):
+            if not _CJK.match(run):
+                tokens.append(run[:MAX_TERM_LENGTH])
+            elif len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def make_snippet(value: str, terms: Sequence[str], width: int = SNIPPET_CHARS) -> str:
+    """Whitespace-collapsed excerpt of ``value`` around the first hit."""
+    if not value:
+        return ""
+    pattern = re.compile(
+        "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)),
+        re.IGNORECASE,
+    )
+    match = pattern.search(value)
+    start = max(0, match.start() - width // 3) if match else 0
+    end = start + width
+    snippet = " ".join(value[start:end].split())
+    if start > 0:
+        snippet = f"…{snippet}"
+    if end < len(value):
+        snippet = f"{snippet}…"
+    return snippet
+
+
+@dataclass
+class SearchHit:
+    doc: Doc
+    score: float
+    snippet: str
+
+
+class _FtsIndex:
+    """SQLite FTS5: tokens are stored space-separated, ``rowid`` = doc id."""
+
+    def write(self, executor: Any, doc_id: int, fields: Tuple[List[str], ...]) -> None:
+        self.remove(executor, doc_id)
+        executor.execute(
+            text(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, description, content)"
+                " VALUES (:doc_id, :name, :description, :content)"
+            ),
+            {
+                "doc_id": doc_id,
+                "name": " ".join(fields[0]),
+                "description": " ".join(fields[1]),
+                "content": " ".join(fields[2]),
+            },
+        )
+
+    def remove(self, executor: Any, doc_id: int) -> None:
+        executor.execute(
+            text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :doc_id"), {"doc_id": doc_id}
+        )
+
+    def search(
+        self, executor: Any, terms: List[str], limit: int, offset: int
+    ) -> Tuple[int, List[Tuple[int, float]]]:
+        # Tokens are word characters only, so quoting them is safe.
+        match = " ".join(f'"{term}"' for term in terms) + "*"
+        weights = ", ".join(f"{weight:.1f}" for weight in FIELD_WEIGHTS)
+        total = executor.execute(
+            text(f"SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"),
+            {"match": match},
+        ).scalar()
+        rows = executor.execute(
+            text(
+                f"SELECT rowid, bm25({FTS_TABLE}, {weights}) AS rank"
+                f" FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"
+                " ORDER BY rank LIMIT :limit OFFSET :offset"
+            ),
+            {"match": match, "limit": limit, "offset": offset},
+        ).all()
+        # bm25() is negative, lower is better.
+        return int(total or 0), [(row[0], -row[1]) for row in rows]
+
+
+class _PostingsIndex:
+    """Inverted index in ``doc_search_terms`` for databases without FTS5."""
+
+    def write(self, executor: Any, doc_id: int, fields: Tuple[List[str], ...]) -> None:
+        self.remove(executor, doc_id)
+        weights: Counter[str] = Counter()
+        for tokens, field_weight in zip(fields, FIELD_WEIGHTS):
+            for token in tokens:
+                weights[token] += field_weight
+        if weights:
+            executor.execute(
+                insert(_terms),
+                [
+                    {"term": term, "doc_id": doc_id, "weight": weight}
+                    for term, weight in weights.items()
+                ],
+            )
+
+    def remove(self, executor: Any, doc_id: int) -> None:
+        executor.execute(delete(_terms).where(_terms.c.doc_id == doc_id))
+
+    def search(
+        self, executor: Any, terms: List[str], limit: int, offset: int
+    ) -> Tuple[int, List[Tuple[int, float]]]:
+        documents = (
+            executor.execute(select(func.count()).select_from(_entries)).scalar() or 0
+        )
+        scores: Optional[Dict[int, float]] = None
+        for position, term in enumerate(terms):
+            if position == len(terms) - 1:
+                escaped = re.sub(r"([\\%_])", r"\\\1", term)
+                condition = _terms.c.term.like(f"{escaped}%", escape="\\")
+            else:
+                condition = _terms.c.term == term
+            rows = executor.execute(
+                select(_terms.c.doc_id, func.sum(_terms.c.weight))
+                .where(condition)
+                .group_by(_terms.c.doc_id)
+            ).all()
+            frequency = len(rows)
+            idf = math.log(1 + (documents - frequency + 0.5) / (frequency + 0.5))
+            term_scores = {
+                row[0]: idf * row[1] * (BM25_K1 + 1) / (row[1] + BM25_K1)
+                for row in rows
+            }
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {
+                    doc_id: score + term_scores[doc_id]
+                    for doc_id, score in scores.items()
+                    if doc_id in term_scores
+                }
+            if not scores:
+                return 0, []
+        ranked = sorted((scores or {}).items(), key=lambda item: (-item[1], item[0]))
+        return len(ranked), ranked[offset : offset + limit]
+
+
+def _index_for(executor: Any) -> Any:
+    bind = (
+        executor.get_bind()
+        if isinstance(executor, (Session, scoped_session))
+        else executor
+    )
+    return _FtsIndex() if bind.dialect.name == "sqlite" else _PostingsIndex()
+
+
+def _query_terms(query: str) -> List[str]:
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+class SearchService:
+    """Maintain and query the document search index."""
+
+    def search(
+        self, query: str, *, limit: int, offset: int = 0
+    ) -> Tuple[int, List[SearchHit]]:
+        """Ranked documents matching every term of ``query``, with snippets."""
+        terms = _query_terms(query)
+        if not terms:
+            return 0, []
+        total, ranked = _index_for(db.session).search(db.session, terms, limit, offset)
+        ids = [doc_id for doc_id, _score in ranked]
+        if not ids:
+            return total, []
+        docs = {doc.id: doc for doc in Doc.query.filter(Doc.id.in_(ids))}
+        contents: Dict[int, str] = {
+            row[0]: row[1]
+            for row in db.session.execute(
+                select(_entries.c.doc_id, _entries.c.content).where(
+                    _entries.c.doc_id.in_(ids)
+                )
+            )
+        }
+        hits = []
+        for doc_id, score in ranked:
+            doc = docs.get(doc_id)
+            if doc is None:
+                continue
+            content = contents.get(doc_id, "")
+            # Prefer an excerpt showing the hit; else describe the document.
+            snippet = next(
+                (
+                    make_snippet(value, terms)
+                    for value in (content, doc.description or "")
+                    if value and any(term in value.casefold() for term in terms)
+                ),
+                make_snippet(doc.description or content, terms),
+            )
+            hits.append(SearchHit(doc=doc, score=score, snippet=snippet))
+        return total, hits
+
+    def ranked_ids(self, query: str, limit: int) -> List[int]:
+        terms = _query_terms(query)
+        if not terms:
+            return []
+        _total, ranked = _index_for(db.session).search(db.session, terms, limit, 0)
+        return [doc_id for doc_id, _score in ranked]
+
+    def index_document(
+        self, doc_id: int, *, max_chars: int = 1_000_000, force: bool = False
+    ) -> bool:
+        """(Re)index one document; returns whether it is indexed now."""
+        doc: Optional[Doc] = db.session.get(Doc, doc_id)
+        if doc is None:
+            self.remove(doc_id)
+            db.session.commit()
+            return False
+        path = document_service.working_path(doc)
+        try:
+            stat = path.stat()
+            # A saved file is a new inode (see app.utils.blobs).
+            source = f"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        except OSError:
+            source = ""
+        entry = DocSearchEntry.query.filter_by(doc_id=doc.id).first()
+        if entry is None:
+            entry = DocSearchEntry(doc_id=doc.id, source="", content="")
+            db.session.add(entry)
+        if force or entry.source != source:
+            content = ""
+            if source:
+                try:
+                    content = extract_text(path, max_chars)
+                except (ExtractionError, OSError) as exc:
+                    current_app.logger.warning(
+                        "Cannot extract text of doc %s: %s", doc.id, exc
+                    )
+            entry.source = source
+            entry.content = content
+        fields = (
+            tokenize(doc.name),
+            tokenize(doc.description or ""),
+            tokenize(entry.content),
+        )
+        try:
+            db.session.flush()
+            _index_for(db.session).write(db.session, doc.id, fields)
+            db.session.commit()
+        except IntegrityError:
+            # Indexed concurrently by another worker.
+            db.session.rollback()
+            return False
+        return True
+
+    def remove(self, doc_id: int, connection: Any = None) -> None:
+        """Drop a document from the index; caller commits."""
+        executor = connection if connection is not None else db.session
+        _index_for(executor).remove(executor, doc_id)
+        executor.execute(delete(_entries).where(_entries.c.doc_id == doc_id))
+
+
+search_service = SearchService()
+
+
+class SearchIndexer:
+    """Index documents on a lazily started, fork-aware thread pool.
+
+    Each task runs in its own app context, so with ``workers=0`` (inline)
+    indexing still uses a session of its own after the triggering commit.
+    """
+
+    def __init__(
+        self, app: Flask, *, workers: int = 2, max_chars: int = 1_000_000
+    ) -> None:
+        self.app = app
+        self.workers = workers
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._owner_pid: Optional[int] = None
+        self._queued: Set[int] = set()
+
+    def schedule(self, doc_ids: Iterable[int]) -> None:
+        if self.workers <= 0:
+            for doc_id in doc_ids:
+                self._index(doc_id)
+            return
+        with self._lock:
+            executor = self._get_executor()
+            for doc_id in doc_ids:
+                # Already waiting; it will read the latest state when it runs.
+                if doc_id not in self._queued:
+                    self._queued.add(doc_id)
+                    executor.submit(self._run, doc_id)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None and self._owner_pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _run(self, doc_id: int) -> None:
+        with self._lock:
+            # Changes committed from now on queue the document again.
+            self._queued.discard(doc_id)
+        self._index(doc_id)
+
+    def _index(self, doc_id: int) -> None:
+        try:
+            with self.app.app_context():
+                search_service.index_document(doc_id, max_chars=self.max_chars)
+        except Exception:
+            self.app.logger.exception("Indexing doc %s failed", doc_id)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # A pool inherited across fork (e.g. gunicorn --preload) is unusable.
+        if self._executor is None or self._owner_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="search-index"
+            )
+            self._owner_pid = os.getpid()
+            self._queued.clear()
+        return self._executor
+
+
+def init_search_indexer(app: Flask, settings: Settings) -> None:
+    indexer = SearchIndexer(
+        app,
+        workers=settings.search_index_workers,
+        max_chars=settings.search_max_text_chars,
+    )
+    app.extensions[EXTENSION_KEY] = indexer
+    atexit.register(indexer.shutdown)
+
+
+def _doc_changed(_mapper: Any, _connection: Any, target: Doc) -> None:
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, set()).add(target.id)
+
+
+def _doc_deleted(_mapper: Any, connection: Any, target: Doc) -> None:
+    # Same transaction; SQLite does not enforce the cascading foreign keys.
+    search_service.remove(target.id, connection)
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.get(_PENDING_KEY, set()).discard(target.id)
+
+
+event.listen(Doc, "after_insert", _doc_changed)
+event.listen(Doc, "after_update", _doc_changed)
+event.listen(Doc, "after_delete", _doc_deleted)
+
+
+@event.listens_for(Session, "after_commit")
+def _index_after_commit(session: Session) -> None:
+    doc_ids = session.info.pop(_PENDING_KEY, None)
+    if doc_ids and has_app_context():
+        indexer = current_app.extensions.get(EXTENSION_KEY)
+        if indexer is not None:
+            indexer.schedule(sorted(doc_ids))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back(session: Session, _previous_transaction: Any) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def register_search_cli(app: Flask) -> None:
+    """Register ``flask search-reindex`` to (re)build the document index."""
+
+    import click
+
+    @app.cli.command("search-reindex")
+    @click.option("--force", is_flag=True, help="Extract unchanged files again.")
+    def search_reindex(force: bool) -> None:
+        settings: Settings = app.config["APP_SETTINGS"]
+        doc_ids = set(db.session.execute(select(Doc.id)).scalars())
+        stale = set(db.session.execute(select(_entries.c.doc_id)).scalars()) - doc_ids
+        for doc_id in stale:
+            search_service.remove(doc_id)
+        db.session.commit()
+        indexed = sum(
+            search_service.index_document(
+                doc_id, max_chars=settings.search_max_text_chars, force=force
+            )
+            for doc_id in sorted(doc_ids)
+        )
+        click.echo(f"Indexed {indexed} document(s), removed {len(stale)}")
@@ -0,0 +1,307 @@
+"""Storage hierarchy management and bitmap-based free-slot search.
+
+Box occupancy bitmaps follow ``samples.storage_box_id``/``storage_position``
+through mapper events, so every write path (the samples API, generic CRUD)
+keeps them in step. Each change re-reads the box row with ``FOR UPDATE`` and
+writes it back with a compare-and-swap on the old bitmap, so concurrent
+placements in one box cannot lose each other's bits.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db
+from ..models.labs import Lab
+from ..models.samples import Sample
+from ..models.storage_location import PARENT_KIND, STORAGE_KINDS, StorageLocation
+from ..utils import bitmap
+from ..utils.errors import APIError
+
+MAX_BOX_CAPACITY = 1024
+SLOT_RETRIES = 5
+
+_locations = StorageLocation.__table__
+
+
+def _slot_unavailable(box_id: Any, position: Any) -> APIError:
+    return APIError(
+        code="slot_unavailable",
+        message="Storage position is out of range or already occupied",
+        status_code=409,
+        details={"box_id": box_id, "position": position},
+    )
+
+
+def _change_slot(
+    connection: Connection,
+    box_id: int,
+    position: int,
+    *,
+    occupy: bool,
+    lab_id: Optional[int] = None,
+) -> None:
+    """Set (``occupy``) or clear one position bit of a box's bitmap."""
+    for _attempt in range(SLOT_RETRIES):
+        row = connection.execute(
+            select(
+                _locations.c.kind,
+                _locations.c.lab_id,
+                _locations.c.rows,
+                _locations.c.cols,
+                _locations.c.occupancy,
+            )
+            .where(_locations.c.id == box_id)
+            .with_for_update()
+        ).first()
+        if row is None:
+            if occupy:
+                raise _slot_unavailable(box_id, position)
+            return
+        kind, box_lab_id, rows, cols, occupancy = row
+        capacity = (rows or 0) * (cols or 0) if kind == "box" else 0
+        mask = bitmap.from_bytes(occupancy)
+        bit = 1 << position if 0 <= position < capacity else 0
+        if occupy:
+            if not bit or mask & bit or lab_id not in (None, box_lab_id):
+                raise _slot_unavailable(box_id, position)
+            new_mask = mask | bit
+        else:
+            new_mask = mask & ~bit
+        if new_mask == mask:
+            return
+        result: Any = connection.execute(
+            update(_locations)
+            .where(_locations.c.id == box_id, _locations.c.occupancy == occupancy)
+            .values(
+                occupancy=bitmap.to_bytes(new_mask, capacity),
+                updated_at=datetime.utcnow(),
+            )
+        )
+        if result.rowcount:
+            return
+    raise _slot_unavailable(box_id, position)
+
+
+# Slots are claimed before the row is written, so a taken slot surfaces as
+# ``slot_unavailable`` rather than as a unique constraint violation.
+@event.listens_for(Sample, "before_insert")
+def _occupy_inserted_slot(_mapper: Any, connection: Connection, target: Sample) -> None:
+    if target.storage_box_id is not None and target.storage_position is not None:
+        _change_slot(
+            connection,
+            target.storage_box_id,
+            target.storage_position,
+            occupy=True,
+            lab_id=target.lab_id,
+        )
+
+
+@event.listens_for(Sample, "before_update")
+def _move_updated_slot(_mapper: Any, connection: Connection, target: Sample) -> None:
+    state: Any = inspect(target)
+    box_history = state.attrs.storage_box_id.history
+    position_history = state.attrs.storage_position.history
+    if not box_history.has_changes() and not position_history.has_changes():
+        return
+    old_box = box_history.deleted[0] if box_history.deleted else target.storage_box_id
+    old_position = (
+        position_history.deleted[0]
+        if position_history.deleted
+        else target.storage_position
+    )
+    if (old_box, old_position) == (target.storage_box_id, target.storage_position):
+        return
+    if old_box is not None and old_position is not None:
+        _change_slot(connection, old_box, old_position, occupy=False)
+    _occupy_inserted_slot(_mapper, connection, target)
+
+
+@event.listens_for(Sample, "after_delete")
+def _release_deleted_slot(_mapper: Any, connection: Connection, target: Sample) -> None:
+    if target.storage_box_id is not None and target.storage_position is not None:
+        _change_slot(
+            connection, target.storage_box_id, target.storage_position, occupy=False
+        )
+
+
+class StorageService:
+    """Maintain storage locations and the per-box occupancy bitmaps."""
+
+    def create_location(self, lab: Lab, payload: Dict[str, Any]) -> StorageLocation:
+        kind = payload.get("kind")
+        name = payload.get("name")
+        if kind not in STORAGE_KINDS or not name:
+            raise APIError(
+                code="invalid_location",
+                message="kind (unit, rack or box) and name are required",
+                status_code=400,
+            )
+
+        parent_id = payload.get("parent_id")
+        expected_parent = PARENT_KIND[kind]
+        if expected_parent is None:
+            parent_id = None
+        else:
+            parent = StorageLocation.query.get(parent_id) if parent_id else None
+            if not parent or parent.lab_id != lab.id or parent.kind != expected_parent:
+                raise APIError(
+                    code="invalid_parent",
+                    message=f"A {kind} must sit inside a {expected_parent} of this lab",
+                    status_code=400,
+                )
+
+        location = StorageLocation(
+            lab_id=lab.id, parent_id=parent_id, kind=kind, name=name
+        )
+        if kind == "box":
+            try:
+                rows, cols = int(payload.get("rows", 0)), int(payload.get("cols", 0))
+            except (TypeError, ValueError):
+                rows = cols = 0
+            if rows < 1 or cols < 1 or rows * cols > MAX_BOX_CAPACITY:
+                raise APIError(
+                    code="invalid_box_size",
+                    message="Boxes need positive rows and cols within capacity",
+                    status_code=400,
+                    details={"max_capacity": MAX_BOX_CAPACITY},
+                )
+            location.rows, location.cols = rows, cols
+            location.occupied_mask = 0
+
+        db.session.add(location)
+        db.session.commit()
+        return location
+
+    def list_locations(self, lab_id: int) -> List[StorageLocation]:
+        return (
+            StorageLocation.query.filter_by(lab_id=lab_id)
+            .order_by(StorageLocation.id.asc())
+            .all()
+        )
+
+    # ------------------------------------------------------------------
+    # Sample placement
+    # ------------------------------------------------------------------
+    def assign_slot(self, sample: Sample, box_id: Any, position: Any) -> None:
+        """Move ``sample`` into ``box_id``/``position``; caller commits."""
+        if box_id is None:
+            self.release_slot(sample)
+            return
+        box = StorageLocation.query.get(box_id)
+        if not box or box.kind != "box" or box.lab_id != sample.lab_id:
+            raise APIError(
+                code="invalid_box",
+                message="Storage box does not exist in the sample's lab",
+                status_code=400,
+            )
+        try:
+            position = int(position)
+        except (TypeError, ValueError):
+            position = -1
+        if (sample.storage_box_id, sample.storage_position) == (box.id, position):
+            return
+        if not box.is_free(position):
+            raise _slot_unavailable(box.id, position)
+        # The bitmap itself is updated by the mapper events on flush.
+        sample.storage_box_id = box.id
+        sample.storage_position = position
+
+    def release_slot(self, sample: Sample) -> None:
+        """Clear the sample's current slot, if any; caller commits."""
+        sample.storage_box_id = None
+        sample.storage_position = None
+
+    @contextmanager
+    def placement_errors(self) -> Iterator[None]:
+        """Roll back a failed placement; a lost slot race becomes a 409."""
+        try:
+            yield
+        except APIError:
+            db.session.rollback()
+            raise
+        except IntegrityError as exc:
+            db.session.rollback()
+            # uq_samples_storage_slot: its name or columns are in the message.
+            if "storage" not in str(exc.orig):
+                raise
+            raise APIError(
+                code="slot_unavailable",
+                message="Storage position was taken concurrently",
+                status_code=409,
+            ) from None
+
+    # ------------------------------------------------------------------
+    # Free-slot search
+    # ------------------------------------------------------------------
+    def find_free_slots(
+        self, lab_id: int, count: int, *, contiguous: bool = False
+    ) -> Dict[str, Any]:
+        """Locate ``count`` free positions across the lab's boxes.
+
+        All boxes are fetched in a single query and searched with bit
+        operations on their occupancy masks. With ``contiguous`` the slots
+        must be consecutive (row-major) positions inside one box.
+        """
+        boxes = db.session.execute(
+            select(
+                StorageLocation.id,
+                StorageLocation.name,
+                StorageLocation.rows,
+                StorageLocation.cols,
+                StorageLocation.occupancy,
+            )
+            .where(StorageLocation.lab_id == lab_id, StorageLocation.kind == "box")
+            .order_by(StorageLocation.id.asc())
+        ).all()
+
+        allocations: List[Dict[str, Any]] = []
+        remaining = count
+        for box_id, name, box_rows, box_cols, occupancy in boxes:
+            capacity = (box_rows or 0) * (box_cols or 0)
+            free = bitmap.full_mask(capacity) & ~bitmap.from_bytes(occupancy)
+            if contiguous:
+                start = bitmap.first_run(free, count)
+                if start is None:
+                    continue
+                positions = list(range(start, start + count))
+            else:
+                positions = []
+                for position in bitmap.iter_set_bits(free):
+                    positions.append(position)
+                    if len(positions) == remaining:
+                        break
+                if not positions:
+                    continue
+            allocations.append(
+                {
+                    "box_id": box_id,
+                    "box": name,
+                    "positions": [
+                        {"position": p, "row": p // box_cols, "col": p % box_cols}
+                        for p in positions
+                    ],
+                }
+            )
+            remaining -= len(positions)
+            if remaining <= 0:
+                break
+
+        return {
+            "data": allocations,
+            "meta": {
+                "requested": count,
+                "found": count - max(remaining, 0),
+                "contiguous": contiguous,
+                "satisfied": remaining <= 0,
+            },
+        }
+
+
+storage_service = StorageService()
@@ -0,0 +1,204 @@
+"""Batched, asynchronous writer for ``activity_logs`` and ``login_logs``.
+
+Audit rows are queued in memory and inserted by a background thread with
+one multi-row ``INSERT`` per table, once ``AUDIT_BATCH_SIZE`` records are
+queued or ``AUDIT_FLUSH_INTERVAL_SECONDS`` have passed. The queue holds at
+most ``AUDIT_QUEUE_LIMIT`` records; past that, callers insert their record
+in their own session instead of growing it. Pending records are flushed at
+interpreter exit. ``AUDIT_WRITER_ASYNC=false`` inserts every record in the
+caller's session and commits it (used by the tests).
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import Flask, current_app
+from sqlalchemy import Table, insert
+
+from ..config import Settings
+from ..extensions import db
+from ..models.activity_log import ActivityLog
+from ..models.login_log import LoginLog
+
+EXTENSION_KEY = "audit_writer"
+
+Record = Tuple[Table, Dict[str, Any]]
+
+
+class AuditWriter:
+    """Queue audit rows and insert them in batches from a daemon thread."""
+
+    def __init__(
+        self,
+        app: Flask,
+        *,
+        asynchronous: bool = True,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        queue_limit: int = 10000,
+    ) -> None:
+        self.app = app
+        self.asynchronous = asynchronous
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue[Optional[Record]] = queue.Queue(maxsize=queue_limit)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._owner_pid: Optional[int] = None
+
+    def add(self, table: Table, **values: Any) -> None:
+        # Stamped now, not when the batch is written.
+        now = datetime.utcnow()
+        values.setdefault("created_at", now)
+        values.setdefault("updated_at", now)
+        record = (table, values)
+        if not self.asynchronous:
+            self._write_inline(record)
+            return
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            # Back-pressure instead of unbounded memory: this caller pays.
+            self.app.logger.warning("Audit queue full, writing record inline")
+            self._write_inline(record)
+
+    def flush(self) -> None:
+        """Write everything queued so far on the calling thread."""
+        batch: List[Record] = []
+        while True:
+            try:
+                record = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is not None:
+                batch.append(record)
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            thread = self._thread if self._owner_pid == os.getpid() else None
+            self._thread = None
+        if thread is not None:
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            thread.join(timeout)
+        self.flush()
+
+    def _ensure_thread(self) -> None:
+        # A thread does not survive fork (e.g. gunicorn --preload).
+        if self._thread is not None and self._owner_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._owner_pid != os.getpid():
+                self._thread = threading.Thread(
+                    target=self._run, name="audit-writer", daemon=True
+                )
+                self._owner_pid = os.getpid()
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                record = self._queue.get()
+            except Exception:  # pragma: no cover - interpreter teardown
+                return
+            if record is None:
+                return
+            batch = [record]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    record = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if record is None:
+                    stop = True
+                    break
+                batch.append(record)
+            self._write(batch)
+            if stop:
+                return
+
+    def _write_inline(self, record: Record) -> None:
+        # Part of the caller's transaction, as a direct ORM write would be;
+        # a second connection could wait on the caller's SQLite lock.
+        _insert(db.session, [record])
+        db.session.commit()
+
+    def _write(self, batch: List[Record]) -> None:
+        try:
+            with self.app.app_context(), db.engine.begin() as connection:
+                _insert(connection, batch)
+        except Exception:
+            self.app.logger.exception("Dropped %d audit records", len(batch))
+
+
+def _insert(executor: Any, batch: List[Record]) -> None:
+    """One multi-row ``INSERT`` per table."""
+    rows: Dict[Table, List[Dict[str, Any]]] = {}
+    for table, values in batch:
+        rows.setdefault(table, []).append(values)
+    for table, table_rows in rows.items():
+        executor.execute(insert(table).values(table_rows))
+
+
+def init_audit_writer(app: Flask, settings: Settings) -> None:
+    writer = AuditWriter(
+        app,
+        asynchronous=settings.audit_writer_async,
+        batch_size=settings.audit_batch_size,
+        flush_interval=settings.audit_flush_interval_seconds,
+        queue_limit=settings.audit_queue_limit,
+    )
+    app.extensions[EXTENSION_KEY] = writer
+    atexit.register(writer.shutdown)
+
+
+def _writer() -> AuditWriter:
+    return current_app.extensions[EXTENSION_KEY]
+
+
+def record_activity(
+    actor_id: Optional[int],
+    action: str,
+    target_type: str,
+    target_id: Optional[str],
+    details: Optional[dict] = None,
+) -> None:
+    _writer().add(
+        ActivityLog.__table__,
+        actor_id=actor_id,
+        action=action,
+        target_type=target_type,
+        target_id=target_id,
+        details=details or {},
+    )
+
+
+def record_login(
+    user_id: int, ip_address: Optional[str], user_agent: Optional[str]
+) -> None:
+    _writer().add(
+        LoginLog.__table__,
+        user_id=user_id,
+        ip_address=ip_address,
+        user_agent=user_agent,
+    )
@@ -0,0 +1,58 @@
+"""Integer-backed bitmap helpers used for compact occupancy tracking."""
+
+from __future__ import annotations
+
+from typing import Iterator
+
+
+def from_bytes(raw: bytes | None) -> int:
+    """Decode a little-endian stored bitmap into an integer mask."""
+    if not raw:
+        return 0
+    return int.from_bytes(raw, "little")
+
+
+def to_bytes(mask: int, size: int) -> bytes:
+    """Encode ``mask`` into the minimum number of bytes for ``size`` bits."""
+    return (mask & full_mask(size)).to_bytes((size + 7) // 8, "little")
+
+
+def full_mask(size: int) -> int:
+    """Return a mask with the lowest ``size`` bits set."""
+    return (1 << size) - 1 if size > 0 else 0
+
+
+def popcount(mask: int) -> int:
+    return mask.bit_count()
+
+
+def iter_set_bits(mask: int) -> Iterator[int]:
+    """Yield indexes of set bits from lowest to highest."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def run_starts(mask: int, length: int) -> int:
+    """Return a mask of positions starting ``length`` consecutive set bits.
+
+    Uses logarithmic shift-and-AND folding, so the cost depends on
+    ``log2(length)`` rather than the number of bits in ``mask``.
+    """
+    if length <= 0:
+        return 0
+    covered = 1
+    while covered < length:
+        step = min(covered, length - covered)
+        mask &= mask >> step
+        covered += step
+    return mask
+
+
+def first_run(mask: int, length: int) -> int | None:
+    """Return the start index of the first run of ``length`` set bits."""
+    starts = run_starts(mask, length)
+    if not starts:
+        return None
+    return (starts & -starts).bit_length() - 1
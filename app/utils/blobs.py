@@ -0,0 +1,146 @@
+"""Content-addressable blob store under ``BASE_FILE_DIR``.
+
+Blobs are immutable files named by the SHA-256 of their content and sharded
+as ``_blobs/ab/cd/abcd...``, so identical content is stored once. Content
+comes in as a copy (streamed through a private temp file that is then
+linked into place) and goes out to working files as a copy, so no blob
+ever shares an inode with a path that editors or uploads may write to.
+Blobs are read-only.
+"""
+
+from __future__ import annotations
+
+import errno
+import hashlib
+import os
+import shutil
+import stat
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Iterable, Tuple
+
+from flask import Flask, current_app
+
+from ..config import Settings
+
+EXTENSION_KEY = "blob_store"
+BLOB_DIR = "_blobs"
+CHUNK_SIZE = 1024 * 1024
+READ_ONLY = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+
+def _link_or_copy(source: Path, target: Path) -> None:
+    """Create ``target`` as a hardlink of ``source``, or a copy if links fail."""
+    try:
+        os.link(source, target)
+    except OSError as exc:
+        # Other filesystem, or links not supported.
+        if exc.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+            raise
+        if target.exists():
+            raise FileExistsError(errno.EEXIST, "File exists", str(target)) from None
+        partial = target.with_name(f".{target.name}.{uuid.uuid4().hex}")
+        try:
+            shutil.copyfile(source, partial)
+            os.replace(partial, target)
+        finally:
+            partial.unlink(missing_ok=True)
+
+
+class BlobStore:
+    """SHA-256 addressed, deduplicated files below ``root``."""
+
+    def __init__(self, base_dir: Path) -> None:
+        self.base_dir = Path(base_dir)
+        self.root = self.base_dir / BLOB_DIR
+        self.tmp_dir = self.root / "tmp"
+
+    def relative_path(self, digest: str) -> str:
+        """Path of a blob relative to ``BASE_FILE_DIR`` (as served by /files)."""
+        return f"{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}"
+
+    def path(self, digest: str) -> Path:
+        return self.base_dir / self.relative_path(digest)
+
+    def exists(self, digest: str) -> bool:
+        return self.path(digest).is_file()
+
+    def ingest(self, source: Path) -> Tuple[str, int]:
+        """Store a copy of ``source``'s content; returns (digest, size)."""
+        digest, size = hash_file(source)
+        if self.exists(digest):
+            return digest, size
+        # The copy is hashed again as it is written: if ``source`` changed
+        # in between, the digest describes what was actually stored.
+        with open(source, "rb") as handle:
+            return self.write(iter(lambda: handle.read(CHUNK_SIZE), b""))
+
+    def write(self, chunks: Iterable[bytes]) -> Tuple[str, int]:
+        """Store streamed content; returns (digest, size)."""
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.tmp_dir / uuid.uuid4().hex
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp, "wb") as handle:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    handle.write(chunk)
+                    size += len(chunk)
+                handle.flush()
+                os.fsync(handle.fileno())
+            digest = hasher.hexdigest()
+            blob = self.path(digest)
+            if not blob.exists():
+                self._publish(tmp, blob)
+            return digest, size
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def copy_to(self, digest: str, target: Path) -> None:
+        """Atomically replace ``target`` with a fresh copy of blob ``digest``."""
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex}")
+        try:
+            with self.open(digest) as blob, open(tmp, "wb") as handle:
+                shutil.copyfileobj(blob, handle, CHUNK_SIZE)
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(tmp, target)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def open(self, digest: str) -> BinaryIO:
+        return open(self.path(digest), "rb")
+
+    def _publish(self, source: Path, blob: Path) -> None:
+        """Move the private temp file ``source`` into the store as ``blob``."""
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            _link_or_copy(source, blob)
+        except FileExistsError:
+            # Another writer stored the same content first.
+            return
+        os.chmod(blob, READ_ONLY)
+
+
+def _hash_stream(handle: BinaryIO) -> Tuple[str, int]:
+    hasher = hashlib.sha256()
+    size = 0
+    while chunk := handle.read(CHUNK_SIZE):
+        hasher.update(chunk)
+        size += len(chunk)
+    return hasher.hexdigest(), size
+
+
+def hash_file(path: Path) -> Tuple[str, int]:
+    with open(path, "rb") as handle:
+        return _hash_stream(handle)
+
+
+def init_blob_store(app: Flask, settings: Settings) -> None:
+    app.extensions[EXTENSION_KEY] = BlobStore(settings.base_file_dir)
+
+
+def blob_store() -> BlobStore:
+    return current_app.extensions[EXTENSION_KEY]
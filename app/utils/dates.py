@@ -0,0 +1,28 @@
+"""Query-string date helpers."""
+
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from .errors import APIError
+
+
+def parse_moment(raw: str | None, field: str) -> datetime | None:
+    """Parse an optional ISO 8601 date/datetime parameter or raise a 400.
+
+    Values with an offset (``+02:00``, ``Z``) are converted to naive UTC,
+    which is how timestamps are stored.
+    """
+    if not raw:
+        return None
+    try:
+        moment = datetime.fromisoformat(raw)
+    except ValueError as exc:
+        raise APIError(
+            code="invalid_date",
+            message=f"{field} must be an ISO 8601 date or datetime",
+            status_code=400,
+        ) from exc
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
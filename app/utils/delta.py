@@ -0,0 +1,69 @@
+"""Line-based delta encoding built on difflib and zlib."""
+
+from __future__ import annotations
+
+import difflib
+import json
+import zlib
+
+COMPRESSION_LEVEL = 9
+
+
+def checksum(text: str) -> int:
+    return zlib.crc32(text.encode("utf-8"))
+
+
+def compress_text(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def decompress_text(payload: bytes) -> str:
+    return zlib.decompress(payload).decode("utf-8")
+
+
+def encode_delta(base: str, target: str) -> bytes:
+    """Encode ``target`` as copy/insert operations against ``base`` lines.
+
+    Unchanged line ranges become ``[start, end]`` references into ``base``;
+    everything else is stored as literal text. The op list leads with a CRC32
+    of ``base`` so a delta is never applied to the wrong text, and the whole
+    payload is zlib-compressed.
+    """
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+    ops: list[object] = [checksum(base)]
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(target_lines[j1:j2]))
+    return zlib.compress(
+        json.dumps(ops, separators=(",", ":")).encode("utf-8"), COMPRESSION_LEVEL
+    )
+
+
+def apply_delta(base: str, delta: bytes) -> str:
+    """Rebuild the target text from ``base`` and an :func:`encode_delta` payload."""
+    base_crc, *ops = json.loads(zlib.decompress(delta))
+    if base_crc != checksum(base):
+        raise ValueError("delta does not match its base text")
+    base_lines = base.splitlines(keepends=True)
+    parts: list[str] = []
+    for op in ops:
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            parts.extend(base_lines[op[0] : op[1]])
+    return "".join(parts)
+
+
+def unified_diff(old: str, new: str, old_label: str, new_label: str) -> str:
+    return "".join(
+        difflib.unified_diff(
+            old.splitlines(keepends=True),
+            new.splitlines(keepends=True),
+            fromfile=old_label,
+            tofile=new_label,
+        )
+    )
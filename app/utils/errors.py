@@ -81,19 +81,23 @@ def register_error_handlers(app: Flask) -> None:
         }
         return jsonify(payload), 500
 
-    # Flask-JWT-Extended error hooks
+    # Flask-JWT-Extended error hooks. These run as Flask error handlers, so
+    # they must return a response: an exception raised here becomes a 500.
+    def _unauthorized(message: str):
+        return handle_api_error(UnauthorizedError(message=message))
+
     @jwt.unauthorized_loader
     def _missing_jwt(reason: str):
-        raise UnauthorizedError(message=reason)
+        return _unauthorized(reason)
 
     @jwt.invalid_token_loader
     def _invalid_jwt(reason: str):
-        raise UnauthorizedError(message=reason)
+        return _unauthorized(reason)
 
     @jwt.revoked_token_loader
     def _revoked_jwt(jwt_header, jwt_payload):
-        raise UnauthorizedError(message="Token has been revoked.")
+        return _unauthorized("Token has been revoked.")
 
     @jwt.expired_token_loader
     def _expired_jwt(jwt_header, jwt_payload):
-        raise UnauthorizedError(message="Token has expired.")
+        return _unauthorized("Token has expired.")
@@ -0,0 +1,171 @@
+"""Per-worker cache of authenticated user snapshots.
+
+Each app keeps an LRU of immutable :class:`UserSnapshot` objects keyed by
+user id, so resolving the user behind a token costs no queries on a hit.
+Writes to users, their scopes or role assignments in this process evict the
+affected entries; changes made by other workers become visible once the
+entry's TTL (``IDENTITY_CACHE_TTL_SECONDS``) runs out.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Optional, Tuple
+
+from flask import Flask, current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session, selectinload
+
+from ..config import Settings
+from ..models.role import Role
+from ..models.user import User
+from ..models.user_permissions import UserPermissionEntry
+from ..models.user_role import UserRole
+from .cache import LRUCache
+
+EXTENSION_KEY = "identity_cache"
+_PENDING_KEY = "identity_cache_evict"
+EVERYONE = -1
+# Only these columns end up in a snapshot; ``last_login_at`` and friends
+# change on every login and must not evict the entry.
+SNAPSHOT_COLUMNS = ("username", "is_active", "is_admin")
+
+
+@dataclass(frozen=True, slots=True)
+class UserSnapshot:
+    """Read-only view of the user fields needed to authorize a request."""
+
+    id: int
+    username: str
+    is_active: bool
+    is_admin: bool
+    scopes: Tuple[str, ...]
+    roles: Tuple[str, ...]
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserSnapshot":
+        return cls(
+            id=user.id,
+            username=user.username,
+            is_active=bool(user.is_active),
+            is_admin=bool(user.is_admin),
+            scopes=tuple(user.scopes),
+            roles=tuple(
+                assignment.role.name for assignment in user.roles if assignment.role
+            ),
+        )
+
+    def has_scope(self, scope: str) -> bool:
+        return scope in self.scopes
+
+
+def init_identity_cache(app: Flask, settings: Settings) -> None:
+    app.extensions[EXTENSION_KEY] = LRUCache(
+        maxsize=settings.identity_cache_size,
+        ttl=settings.identity_cache_ttl_seconds,
+    )
+
+
+def _cache() -> Optional[LRUCache[int, UserSnapshot]]:
+    if not has_app_context():
+        return None
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def load_identity(user_id: Any) -> Optional[UserSnapshot]:
+    """Return the snapshot for ``user_id``, loading it on a cache miss."""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    cache = _cache()
+    snapshot = cache.get(user_id) if cache is not None else None
+    if snapshot is not None:
+        return snapshot
+    user = (
+        User.query.options(
+            selectinload(User.permissions),
+            selectinload(User.roles).selectinload(UserRole.role),
+        )
+        .filter(User.id == user_id)
+        .one_or_none()
+    )
+    if user is None:
+        return None
+    snapshot = UserSnapshot.from_user(user)
+    if cache is not None and cache.ttl:
+        cache.set(user_id, snapshot)
+    return snapshot
+
+
+def invalidate_identity(user_id: Optional[int] = None) -> None:
+    """Drop one cached user, or every entry when ``user_id`` is ``None``."""
+    cache = _cache()
+    if cache is None:
+        return
+    if user_id is None:
+        cache.clear()
+    else:
+        cache.pop(user_id)
+
+
+def _evict(session: Optional[Session], user_id: Optional[int]) -> None:
+    # Evict now and again after commit, so a concurrent request that reloads
+    # the row before the commit cannot keep the old state cached.
+    invalidate_identity(user_id)
+    if session is not None:
+        pending = session.info.setdefault(_PENDING_KEY, set())
+        pending.add(EVERYONE if user_id is None else user_id)
+
+
+def _user_changed(_mapper: Any, _connection: Any, target: User) -> None:
+    state: Any = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in SNAPSHOT_COLUMNS):
+        _evict(object_session(target), target.id)
+
+
+def _user_deleted(_mapper: Any, _connection: Any, target: User) -> None:
+    _evict(object_session(target), target.id)
+
+
+def _membership_changed(_mapper: Any, _connection: Any, target: Any) -> None:
+    _evict(object_session(target), target.user_id)
+
+
+def _role_changed(_mapper: Any, _connection: Any, target: Role) -> None:
+    # Role names are denormalized into every snapshot holding the role.
+    _evict(object_session(target), None)
+
+
+event.listen(User, "after_update", _user_changed)
+event.listen(User, "after_delete", _user_deleted)
+for _model in (UserPermissionEntry, UserRole):
+    for _name in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _name, _membership_changed)
+event.listen(Role, "after_update", _role_changed)
+event.listen(Role, "after_delete", _role_changed)
+
+_WATCHED_TABLES = frozenset(
+    model.__table__ for model in (User, UserPermissionEntry, UserRole, Role)
+)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bulk_write(orm_execute_state: Any) -> None:
+    """Bulk ``Query.update()``/``delete()`` skip mapper events; flush all."""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.local_table in _WATCHED_TABLES:
+        _evict(orm_execute_state.session, None)
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_committed(session: Session) -> None:
+    for user_id in session.info.pop(_PENDING_KEY, ()):
+        invalidate_identity(None if user_id == EVERYONE else user_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back(session: Session, _previous_transaction: Any) -> None:
+    session.info.pop(_PENDING_KEY, None)
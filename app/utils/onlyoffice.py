@@ -2,38 +2,40 @@
 
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, Mapping, Optional
 
 import jwt
 
 from ..config import Settings
 
+DEFAULT_PERMISSIONS: Mapping[str, bool] = {
+    "download": True,
+    "edit": True,
+    "print": True,
+    "review": True,
+}
+
 
 def build_editor_config(
     *,
-    doc_id: int,
+    document_key: str,
     file_name: str,
     file_url: str,
     callback_url: str,
     user_id: int,
     user_display_name: str,
     settings: Settings,
+    permissions: Optional[Mapping[str, bool]] = None,
 ) -> Dict[str, Any]:
     """Generate an OnlyOffice editor configuration payload."""
 
     config: Dict[str, Any] = {
         "document": {
             "fileType": file_name.split(".")[-1] if "." in file_name else "docx",
-            "key": f"{doc_id}-{int(datetime.utcnow().timestamp())}",
+            "key": document_key,
             "title": file_name,
             "url": file_url,
-            "permissions": {
-                "download": True,
-                "edit": True,
-                "print": True,
-                "review": True,
-            },
+            "permissions": dict(permissions or DEFAULT_PERMISSIONS),
         },
         "editorConfig": {
             "callbackUrl": callback_url,
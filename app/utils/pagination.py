@@ -38,3 +38,30 @@ def resolve_pagination(
     limit = size
     offset = (page - 1) * size
     return Pagination(page=page, size=size, limit=limit, offset=offset)
+
+
+@dataclass(slots=True)
+class CursorPagination:
+    cursor: int | None
+    limit: int
+
+
+def resolve_cursor(
+    request: Request, prefix: str = "", default_size: int = DEFAULT_PAGE_SIZE
+) -> CursorPagination:
+    """Resolve ``<prefix>cursor``/``<prefix>limit`` keyset pagination params.
+
+    The cursor is the id of the last item already seen; results continue with
+    strictly smaller ids.
+    """
+    try:
+        cursor: int | None = int(request.args[f"{prefix}cursor"])
+    except (KeyError, ValueError):
+        cursor = None
+
+    try:
+        limit = int(request.args.get(f"{prefix}limit", default_size))
+    except ValueError:
+        limit = default_size
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    return CursorPagination(cursor=cursor, limit=limit)
@@ -0,0 +1,233 @@
+"""Password hashing offloaded to a bounded process pool.
+
+PBKDF2/scrypt hold the GIL for the whole computation, so hashing inside a
+request thread stalls every other request of that worker. Hashes are
+computed in a small process pool instead; when more than
+``PASSWORD_HASH_QUEUE_LIMIT`` hashes are pending, callers fail fast with a
+503 rather than queueing behind a login burst. ``PASSWORD_HASH_WORKERS=0``
+hashes inline (used by the tests and one-off scripts).
+"""
+
+from __future__ import annotations
+
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from typing import Any, Callable, List, Optional, Sequence, TypeVar
+
+from flask import Flask
+from passlib.context import CryptContext
+from passlib.registry import get_crypt_handler
+
+from ..config import Settings
+from .errors import APIError
+
+SUPPORTED_SCHEMES = ("pbkdf2_sha256", "scrypt")
+# Forking a threaded server process can copy a held lock into the child;
+# start pool workers from a clean interpreter instead.
+START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+T = TypeVar("T")
+
+
+@lru_cache(maxsize=8)
+def _context(scheme: str, rounds: int) -> CryptContext:
+    """Policy: ``scheme`` at exactly ``rounds``; anything else needs a rehash."""
+    return CryptContext(
+        schemes=[scheme, *(other for other in SUPPORTED_SCHEMES if other != scheme)],
+        default=scheme,
+        deprecated=[other for other in SUPPORTED_SCHEMES if other != scheme],
+        **{
+            f"{scheme}__default_rounds": rounds,
+            f"{scheme}__min_rounds": rounds,
+            f"{scheme}__max_rounds": rounds,
+        },
+    )
+
+
+# Module-level so they can be pickled into pool workers.
+def _hash(raw_password: str, scheme: str, rounds: int) -> str:
+    return _context(scheme, rounds).hash(raw_password)
+
+
+def _verify(raw_password: str, hashed_password: str, scheme: str, rounds: int) -> bool:
+    try:
+        return _context(scheme, rounds).verify(raw_password, hashed_password)
+    except ValueError:
+        # Unknown or malformed hash format.
+        return False
+
+
+def _busy() -> APIError:
+    return APIError(
+        code="hashing_busy",
+        message="Too many password operations in progress, retry shortly",
+        status_code=503,
+    )
+
+
+def _timed_out() -> APIError:
+    return APIError(
+        code="hashing_timeout",
+        message="Password operation timed out, retry shortly",
+        status_code=503,
+    )
+
+
+class PasswordHasher:
+    """Run hash/verify calls on a lazily started, fork-aware process pool."""
+
+    def __init__(
+        self,
+        *,
+        workers: int = 0,
+        queue_limit: int = 32,
+        scheme: str = "pbkdf2_sha256",
+        rounds: Optional[int] = None,
+        timeout: float = 10.0,
+    ) -> None:
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._owner_pid: Optional[int] = None
+        self._pending = 0
+        self.workers = 0
+        self.configure(
+            workers=workers,
+            queue_limit=queue_limit,
+            scheme=scheme,
+            rounds=rounds,
+            timeout=timeout,
+        )
+
+    def configure(
+        self,
+        *,
+        workers: int,
+        queue_limit: int,
+        scheme: str,
+        rounds: Optional[int],
+        timeout: float,
+    ) -> None:
+        """``rounds`` is the scheme's cost parameter; ``None`` keeps passlib's."""
+        if scheme not in SUPPORTED_SCHEMES:
+            raise ValueError(f"Unsupported password scheme: {scheme}")
+        rounds = rounds or get_crypt_handler(scheme).default_rounds
+        with self._lock:
+            if self._executor is not None and workers != self.workers:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            self.workers = workers
+            self.queue_limit = queue_limit
+            self.scheme = scheme
+            self.rounds = rounds
+            self.timeout = timeout
+
+    def hash(self, raw_password: str) -> str:
+        return self._run(_hash, raw_password, self.scheme, self.rounds)
+
+    def hash_many(self, raw_passwords: Sequence[str]) -> List[str]:
+        """Hash a batch on the pool, at most one task per worker at a time.
+
+        Each window is admitted like single calls are and waits at most
+        ``timeout``, so logins queue behind one window, not the whole batch.
+        """
+        if self.workers <= 0 or len(raw_passwords) <= 1:
+            return [self.hash(raw) for raw in raw_passwords]
+        hashes: List[str] = []
+        for start in range(0, len(raw_passwords), self.workers):
+            window: List["Future[str]"] = []
+            try:
+                for raw in raw_passwords[start : start + self.workers]:
+                    window.append(self._submit(_hash, raw, self.scheme, self.rounds))
+                deadline = time.monotonic() + self.timeout
+                hashes.extend(
+                    future.result(timeout=max(0.0, deadline - time.monotonic()))
+                    for future in window
+                )
+            except FutureTimeoutError as exc:
+                raise _timed_out() from exc
+            finally:
+                # No-op for finished futures; drops queued ones on failure.
+                for future in window:
+                    future.cancel()
+        return hashes
+
+    def verify(self, raw_password: str, hashed_password: str) -> bool:
+        return self._run(
+            _verify, raw_password, hashed_password, self.scheme, self.rounds
+        )
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """Whether a stored hash uses an outdated scheme or cost (cheap, inline)."""
+        try:
+            return _context(self.scheme, self.rounds).needs_update(hashed_password)
+        except ValueError:
+            return True
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor = self._executor if self._owner_pid == os.getpid() else None
+            self._executor = None
+        # Outside the lock: cancelled futures release their slots via callbacks.
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, func: Callable[..., T], *args: Any) -> T:
+        if self.workers <= 0:
+            return func(*args)
+        future = self._submit(func, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError as exc:
+            # The slot stays taken until the pool actually finishes the task.
+            raise _timed_out() from exc
+
+    def _submit(self, func: Callable[..., T], *args: Any) -> "Future[T]":
+        """Queue one task, holding a ``_pending`` slot until it completes."""
+        with self._lock:
+            if self._pending >= self.queue_limit:
+                raise _busy()
+            self._pending += 1
+            executor = self._get_executor()
+        try:
+            future = executor.submit(func, *args)
+        except BaseException:
+            self._release_slot()
+            raise
+        future.add_done_callback(self._release_slot)
+        return future
+
+    def _release_slot(self, _future: Optional[Future] = None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # A pool inherited across fork (e.g. gunicorn --preload) is unusable.
+        if self._executor is None or self._owner_pid != os.getpid():
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(START_METHOD),
+            )
+            self._owner_pid = os.getpid()
+        return self._executor
+
+
+password_hasher = PasswordHasher()
+atexit.register(password_hasher.shutdown)
+
+
+def init_password_hasher(app: Flask, settings: Settings) -> None:
+    password_hasher.configure(
+        workers=settings.password_hash_workers,
+        queue_limit=settings.password_hash_queue_limit,
+        scheme=settings.password_hash_scheme,
+        rounds=settings.password_hash_rounds,
+        timeout=settings.password_hash_timeout_seconds,
+    )
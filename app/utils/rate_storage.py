@@ -0,0 +1,239 @@
+"""Flask-Limiter storage shared by all workers of a host through ``mmap``.
+
+``mmap:///path/to/file?slots=65536&stripes=256`` maps a fixed-size table of
+counters that every gunicorn worker opens, so limits hold per host instead
+of per worker. Keys are hashed into one of ``stripes`` groups; a group is
+guarded by a thread lock plus an ``fcntl`` lock on one byte of the file, and
+each key probes a few slots inside its group. When none is free, the slot
+closest to expiring is reused, so the file never grows past
+``slots * 32`` bytes. Both windows of a sliding-window counter live in the
+same group, so a check and its increment happen under one lock.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from math import floor
+from typing import Any, Iterator, List, Optional, Tuple, Type, Union
+from urllib.parse import parse_qs, urlparse
+
+from limits.storage import SlidingWindowCounterSupport, Storage
+from limits.storage.base import TimestampedSlidingWindow
+
+MAGIC = b"LABRL\x00\x01\x00"
+HEADER = struct.Struct("<8sII")
+HEADER_SIZE = 64
+# key digest, expiry (epoch seconds, 0 when free), counter
+SLOT = struct.Struct("<16sdq")
+EMPTY_DIGEST = bytes(16)
+MAX_PROBES = 8
+DEFAULT_SLOTS = 65536
+DEFAULT_STRIPES = 256
+
+
+def _digest(key: str) -> bytes:
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+
+class MmapStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """Fixed-window and sliding-window-counter storage in a shared file."""
+
+    STORAGE_SCHEME = ["mmap"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options: Any) -> None:
+        parsed = urlparse(uri)
+        query = {name: values[-1] for name, values in parse_qs(parsed.query).items()}
+        if not parsed.path:
+            raise ValueError("mmap storage needs a file path: mmap:///path/to/file")
+        self.path = parsed.path
+        self.stripes = int(query.get("stripes", DEFAULT_STRIPES))
+        slots = int(query.get("slots", DEFAULT_SLOTS))
+        self.slots_per_stripe = max(1, slots // self.stripes)
+        self.slots = self.slots_per_stripe * self.stripes
+        self.probes = min(MAX_PROBES, self.slots_per_stripe)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._size = HEADER_SIZE + self.slots * SLOT.size
+        self._initialize()
+        self._map = mmap.mmap(self._fd, self._size)
+        self._reset_thread_locks()
+        # Thread locks may be held by another thread at fork time.
+        os.register_at_fork(after_in_child=self._reset_thread_locks)
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    def _reset_thread_locks(self) -> None:
+        self._locks: List[threading.Lock] = [
+            threading.Lock() for _ in range(self.stripes)
+        ]
+
+    def _initialize(self) -> None:
+        """(Re)create the table unless it already has this geometry."""
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            header = os.pread(self._fd, HEADER.size, 0)
+            expected = HEADER.pack(MAGIC, self.slots, self.stripes)
+            if header != expected or os.fstat(self._fd).st_size != self._size:
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, self._size)
+                os.pwrite(self._fd, expected, 0)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    @property
+    def base_exceptions(self) -> Union[Type[Exception], Tuple[Type[Exception], ...]]:
+        return OSError
+
+    @contextmanager
+    def _stripe(self, stripe: int) -> Iterator[None]:
+        with self._locks[stripe]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+
+    def _stripe_of(self, key: str) -> int:
+        return int.from_bytes(_digest(key)[:4], "little") % self.stripes
+
+    def _find(
+        self, stripe: int, digest: bytes, now: float, create: bool
+    ) -> Optional[int]:
+        """Offset of ``digest``'s slot; with ``create``, claim one if missing."""
+        base = HEADER_SIZE + stripe * self.slots_per_stripe * SLOT.size
+        start = int.from_bytes(digest[4:8], "little")
+        free: Optional[int] = None
+        victim, victim_expiry = base, float("inf")
+        for probe in range(self.probes):
+            offset = base + ((start + probe) % self.slots_per_stripe) * SLOT.size
+            slot_digest, expiry, _count = SLOT.unpack_from(self._map, offset)
+            if slot_digest == digest:
+                return offset
+            if expiry <= now:
+                if free is None:
+                    free = offset
+            elif expiry < victim_expiry:
+                victim, victim_expiry = offset, expiry
+        if not create:
+            return None
+        offset = free if free is not None else victim
+        SLOT.pack_into(self._map, offset, digest, 0.0, 0)
+        return offset
+
+    def _read(self, stripe: int, key: str, now: float) -> Tuple[int, float]:
+        offset = self._find(stripe, _digest(key), now, create=False)
+        if offset is None:
+            return 0, now
+        _digest_, expiry, count = SLOT.unpack_from(self._map, offset)
+        return (count, expiry) if expiry > now else (0, now)
+
+    def _incr(
+        self, stripe: int, key: str, expiry: float, amount: int, now: float
+    ) -> int:
+        digest = _digest(key)
+        offset = self._find(stripe, digest, now, create=True)
+        assert offset is not None
+        _digest_, expires_at, count = SLOT.unpack_from(self._map, offset)
+        if expires_at <= now:
+            count, expires_at = 0, now + expiry
+        count += amount
+        SLOT.pack_into(self._map, offset, digest, expires_at, count)
+        return count
+
+    def _clear(self, stripe: int, key: str) -> None:
+        offset = self._find(stripe, _digest(key), time.time(), create=False)
+        if offset is not None:
+            SLOT.pack_into(self._map, offset, EMPTY_DIGEST, 0.0, 0)
+
+    def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+        stripe = self._stripe_of(key)
+        with self._stripe(stripe):
+            return self._incr(stripe, key, expiry, amount, time.time())
+
+    def get(self, key: str) -> int:
+        stripe = self._stripe_of(key)
+        with self._stripe(stripe):
+            return self._read(stripe, key, time.time())[0]
+
+    def get_expiry(self, key: str) -> float:
+        stripe = self._stripe_of(key)
+        with self._stripe(stripe):
+            return self._read(stripe, key, time.time())[1]
+
+    def clear(self, key: str) -> None:
+        stripe = self._stripe_of(key)
+        with self._stripe(stripe):
+            self._clear(stripe, key)
+
+    def _window(
+        self, stripe: int, key: str, expiry: int, now: float
+    ) -> Tuple[int, float, int, float]:
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        previous_count = self._read(stripe, previous_key, now)[0]
+        current_count = self._read(stripe, current_key, now)[0]
+        previous_ttl = (
+            (1 - (((now - expiry) / expiry) % 1)) * expiry if previous_count else 0.0
+        )
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(
+        self, key: str, limit: int, expiry: int, amount: int = 1
+    ) -> bool:
+        if amount > limit:
+            return False
+        stripe = self._stripe_of(key)
+        now = time.time()
+        with self._stripe(stripe):
+            previous_count, previous_ttl, current_count, _ = self._window(
+                stripe, key, expiry, now
+            )
+            weighted = previous_count * previous_ttl / expiry + current_count
+            if floor(weighted) + amount > limit:
+                return False
+            _previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+            # Kept for two windows: it is the previous window next time.
+            self._incr(stripe, current_key, 2 * expiry, amount, now)
+            return True
+
+    def get_sliding_window(
+        self, key: str, expiry: int
+    ) -> Tuple[int, float, int, float]:
+        stripe = self._stripe_of(key)
+        with self._stripe(stripe):
+            return self._window(stripe, key, expiry, time.time())
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        stripe = self._stripe_of(key)
+        with self._stripe(stripe):
+            for window_key in self.sliding_window_keys(key, expiry, time.time()):
+                self._clear(stripe, window_key)
+
+    def check(self) -> bool:
+        return not self._map.closed
+
+    def reset(self) -> Optional[int]:
+        cleared = 0
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                for index in range(self.slots):
+                    offset = HEADER_SIZE + index * SLOT.size
+                    _digest_, expiry, _count = SLOT.unpack_from(self._map, offset)
+                    if expiry > now:
+                        cleared += 1
+                self._map[HEADER_SIZE:] = bytes(self.slots * SLOT.size)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        finally:
+            for lock in self._locks:
+                lock.release()
+        return cleared
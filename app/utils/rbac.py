@@ -0,0 +1,162 @@
+"""Role permission matrix compiled into integer bitsets.
+
+Every (resource, action) pair granted to some role gets a bit; each role is
+compiled to the OR of its bits, with ``manage`` on a resource implying every
+action on it. A user's mask is the OR of their roles' masks (memoized per
+role combination), so a permission check is a single ``&``. The compiled
+matrix is cached per app and rebuilt when the ``rbac`` cache version moves,
+which any write to ``roles`` or ``role_permissions`` does; other workers
+notice within ``RBAC_REFRESH_SECONDS``.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from flask import Flask, current_app, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from ..config import Settings
+from ..extensions import db
+from ..models.role import Role
+from ..models.role_permission import RolePermission
+from .versions import bump_version, read_version
+
+EXTENSION_KEY = "permission_matrix"
+VERSION_NAME = "rbac"
+_PENDING_KEY = "permission_matrix_stale"
+MANAGE = "manage"
+# Actions offered by the admin panel; ``manage`` grants all of them.
+KNOWN_ACTIONS = ("manage", "write", "read", "comment", "share")
+
+
+class PermissionMatrix:
+    """Immutable role -> permission bitsets for one ``rbac`` version."""
+
+    def __init__(self, version: int, grants: Iterable[Tuple[str, str, str]]) -> None:
+        self.version = version
+        by_role: Dict[str, set[Tuple[str, str]]] = {}
+        actions: Dict[str, set[str]] = {}
+        for role, resource, action in grants:
+            by_role.setdefault(role, set()).add((resource, action))
+            actions.setdefault(resource, set(KNOWN_ACTIONS)).add(action)
+        self.bits: Dict[Tuple[str, str], int] = {}
+        for resource in sorted(actions):
+            for action in sorted(actions[resource]):
+                self.bits[(resource, action)] = 1 << len(self.bits)
+        self.role_masks: Dict[str, int] = {}
+        for role, pairs in by_role.items():
+            mask = 0
+            for resource, action in pairs:
+                if action == MANAGE:
+                    for implied in actions[resource]:
+                        mask |= self.bits[(resource, implied)]
+                else:
+                    mask |= self.bits[(resource, action)]
+            self.role_masks[role] = mask
+        self._user_masks: Dict[Tuple[str, ...], int] = {}
+
+    def bit(self, resource: str, action: str) -> int:
+        return self.bits.get((resource, action), 0)
+
+    def mask(self, roles: Tuple[str, ...]) -> int:
+        mask = self._user_masks.get(roles)
+        if mask is None:
+            mask = 0
+            for role in roles:
+                mask |= self.role_masks.get(role, 0)
+            self._user_masks[roles] = mask
+        return mask
+
+    def allows(self, roles: Tuple[str, ...], resource: str, action: str) -> bool:
+        return bool(self.mask(roles) & self.bit(resource, action))
+
+
+class PermissionCache:
+    """Holds the compiled matrix and recompiles it on version changes."""
+
+    def __init__(
+        self, refresh_interval: float, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.refresh_interval = refresh_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._matrix: Optional[PermissionMatrix] = None
+        self._next_check = 0.0
+
+    def matrix(self) -> PermissionMatrix:
+        matrix = self._matrix
+        if matrix is not None and self._clock() < self._next_check:
+            return matrix
+        with self._lock:
+            version = read_version(VERSION_NAME)
+            if self._matrix is None or self._matrix.version != version:
+                self._matrix = compile_matrix(version)
+            self._next_check = self._clock() + self.refresh_interval
+            return self._matrix
+
+    def mark_stale(self) -> None:
+        self._next_check = 0.0
+
+
+def compile_matrix(version: int) -> PermissionMatrix:
+    rows = db.session.execute(
+        select(Role.name, RolePermission.resource, RolePermission.action).join(
+            RolePermission, RolePermission.role_id == Role.id
+        )
+    ).all()
+    return PermissionMatrix(version, ((row[0], row[1], row[2]) for row in rows))
+
+
+def init_permission_cache(app: Flask, settings: Settings) -> None:
+    app.extensions[EXTENSION_KEY] = PermissionCache(settings.rbac_refresh_seconds)
+
+
+def permission_matrix() -> PermissionMatrix:
+    cache: PermissionCache = current_app.extensions[EXTENSION_KEY]
+    return cache.matrix()
+
+
+def _bump(session: Optional[Session], connection: Connection) -> None:
+    bump_version(VERSION_NAME, connection)
+    if session is not None:
+        session.info[_PENDING_KEY] = True
+
+
+def _matrix_changed(_mapper: Any, connection: Connection, target: Any) -> None:
+    _bump(Session.object_session(target), connection)
+
+
+for _model in (Role, RolePermission):
+    for _name in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _name, _matrix_changed)
+
+_WATCHED_TABLES = frozenset(model.__table__ for model in (Role, RolePermission))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bulk_write(orm_execute_state: Any) -> None:
+    """Bulk ``Query.update()``/``delete()`` skip mapper events."""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.local_table in _WATCHED_TABLES:
+        session = orm_execute_state.session
+        _bump(session, session.connection())
+
+
+@event.listens_for(Session, "after_commit")
+def _refresh_after_commit(session: Session) -> None:
+    if session.info.pop(_PENDING_KEY, False) and has_app_context():
+        cache = current_app.extensions.get(EXTENSION_KEY)
+        if cache is not None:
+            cache.mark_stale()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back(session: Session, _previous_transaction: Any) -> None:
+    session.info.pop(_PENDING_KEY, None)
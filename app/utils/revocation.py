@@ -0,0 +1,196 @@
+"""JWT revocation with an in-memory blocklist per worker.
+
+Revocations are rows of ``revoked_tokens``, each tagged with the
+``token_revocations`` cache version it was written under. Every app keeps
+the unexpired ones in dictionaries, so checking a token is a couple of
+lookups; at most every ``TOKEN_REVOCATION_REFRESH_SECONDS`` a request pulls
+the rows newer than the last version it has seen. Revocations committed in
+this process are picked up by the next check.
+"""
+
+from __future__ import annotations
+
+import calendar
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from flask import Flask, current_app, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from ..config import Settings
+from ..extensions import db, jwt
+from ..models.revoked_token import RevokedToken
+from .versions import bump_version
+
+EXTENSION_KEY = "token_blocklist"
+VERSION_NAME = "token_revocations"
+_PENDING_KEY = "token_blocklist_stale"
+
+
+def _epoch(moment: datetime) -> int:
+    return calendar.timegm(moment.utctimetuple())
+
+
+def _token_subject(claims: Mapping[str, Any]) -> Optional[Tuple[str, int]]:
+    """``("user", id)`` or ``("api_key", id)`` for the token's subject."""
+    identity = claims.get("sub")
+    kind = "user"
+    if isinstance(identity, dict):
+        if identity.get("sub_type") == "api_key":
+            kind = "api_key"
+            identity = identity.get("api_key_id")
+        elif identity.get("sub_type") == "user":
+            identity = identity.get("user_id")
+        else:
+            return None
+    try:
+        return kind, int(identity)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBlocklist:
+    """Revoked ``jti``s and per-user/per-key cutoffs, refreshed incrementally."""
+
+    def __init__(
+        self, refresh_interval: float, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.refresh_interval = refresh_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._jtis: Dict[str, int] = {}
+        # subject -> (latest revoked ``iat``, expiry), both epoch seconds.
+        self._cutoffs: Dict[Tuple[str, int], tuple[int, int]] = {}
+        self._seq = 0
+        self._next_refresh = 0.0
+
+    def is_revoked(self, claims: Mapping[str, Any]) -> bool:
+        if self._clock() >= self._next_refresh:
+            self.refresh()
+        if claims.get("jti") in self._jtis:
+            return True
+        subject = _token_subject(claims)
+        cutoff = self._cutoffs.get(subject) if subject is not None else None
+        return cutoff is not None and int(claims.get("iat", 0)) <= cutoff[0]
+
+    def mark_stale(self) -> None:
+        self._next_refresh = 0.0
+
+    def refresh(self) -> None:
+        # One refresher at a time; concurrent checks use the current state.
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            rows = db.session.execute(
+                select(
+                    RevokedToken.seq,
+                    RevokedToken.jti,
+                    RevokedToken.user_id,
+                    RevokedToken.api_key_id,
+                    RevokedToken.issued_before,
+                    RevokedToken.expires_at,
+                )
+                .where(
+                    RevokedToken.seq > self._seq,
+                    RevokedToken.expires_at > datetime.utcnow(),
+                )
+                .order_by(RevokedToken.seq)
+            ).all()
+            now = int(time.time())
+            jtis = {jti: exp for jti, exp in self._jtis.items() if exp > now}
+            cutoffs = {
+                subject: cutoff
+                for subject, cutoff in self._cutoffs.items()
+                if cutoff[1] > now
+            }
+            for row in rows:
+                expires = _epoch(row.expires_at)
+                if row.jti:
+                    jtis[row.jti] = expires
+                if row.issued_before is not None:
+                    issued = _epoch(row.issued_before)
+                    for subject in (
+                        ("user", row.user_id),
+                        ("api_key", row.api_key_id),
+                    ):
+                        if subject[1] is None:
+                            continue
+                        previous = cutoffs.get(subject)
+                        if previous is None or issued > previous[0]:
+                            cutoffs[subject] = (issued, expires)
+                self._seq = max(self._seq, row.seq)
+            # Swap whole dicts so lock-free readers never see a partial update.
+            self._jtis, self._cutoffs = jtis, cutoffs
+            self._next_refresh = self._clock() + self.refresh_interval
+        finally:
+            self._lock.release()
+
+
+def init_token_blocklist(app: Flask, settings: Settings) -> None:
+    app.extensions[EXTENSION_KEY] = TokenBlocklist(
+        settings.token_revocation_refresh_seconds
+    )
+
+
+def is_token_revoked(claims: Mapping[str, Any]) -> bool:
+    """Whether a decoded token is on the current app's blocklist."""
+    blocklist: Optional[TokenBlocklist] = current_app.extensions.get(EXTENSION_KEY)
+    return blocklist is not None and blocklist.is_revoked(claims)
+
+
+@jwt.token_in_blocklist_loader
+def _token_in_blocklist(_jwt_header: Dict[str, Any], jwt_payload: Dict[str, Any]):
+    return is_token_revoked(jwt_payload)
+
+
+def _add(**values: Any) -> RevokedToken:
+    revoked = RevokedToken(seq=bump_version(VERSION_NAME), **values)
+    db.session.add(revoked)
+    db.session.info[_PENDING_KEY] = True
+    return revoked
+
+
+def revoke_token(claims: Mapping[str, Any]) -> RevokedToken:
+    """Revoke one decoded token until it expires; the caller commits."""
+    return _add(
+        jti=claims["jti"],
+        user_id=None,
+        expires_at=datetime.utcfromtimestamp(int(claims["exp"])),
+    )
+
+
+def _revoke_issued(**subject: Any) -> RevokedToken:
+    settings: Settings = current_app.config["APP_SETTINGS"]
+    now = datetime.utcnow()
+    lifetime = max(settings.jwt_access_delta, settings.jwt_refresh_delta)
+    return _add(
+        issued_before=now,
+        expires_at=now + lifetime + timedelta(seconds=1),
+        **subject,
+    )
+
+
+def revoke_user_tokens(user_id: int) -> RevokedToken:
+    """Revoke every token issued to ``user_id`` so far; the caller commits."""
+    return _revoke_issued(user_id=user_id)
+
+
+def revoke_api_key_tokens(api_key_id: int) -> RevokedToken:
+    """Revoke every token exchanged for API key ``api_key_id``; the caller commits."""
+    return _revoke_issued(api_key_id=api_key_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _refresh_after_commit(session: Session) -> None:
+    if session.info.pop(_PENDING_KEY, False) and has_app_context():
+        blocklist = current_app.extensions.get(EXTENSION_KEY)
+        if blocklist is not None:
+            blocklist.mark_stale()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back(session: Session, _previous_transaction: Any) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -2,33 +2,48 @@
 
 from __future__ import annotations
 
+import hashlib
 import secrets
-from typing import Iterable, Sequence, Tuple, Dict, Any
-
-from flask_jwt_extended import get_jwt, get_jwt_identity, decode_token
-from flask_jwt_extended.exceptions import JWTExtendedException
-from passlib.hash import pbkdf2_sha256, scrypt
-
+import time
+from typing import Iterable, List, Sequence, Tuple, Dict, Any
+
+from flask import Flask, current_app
+from flask_jwt_extended import (
+    decode_token,
+    get_jwt,
+    get_jwt_identity,
+    get_unverified_jwt_headers,
+)
+from flask_jwt_extended.exceptions import JWTExtendedException, RevokedTokenError
+
+from ..config import Settings
 from ..models.user import User
+from .cache import LRUCache
 from .errors import UnauthorizedError
+from .identity import UserSnapshot, load_identity
+from .passwords import password_hasher
+from .rbac import permission_matrix
+from .revocation import is_token_revoked
 
 
 def hash_password(raw_password: str) -> str:
-    """Return a PBKDF2 hashed password string."""
-    return pbkdf2_sha256.hash(raw_password)
+    """Hash with the configured scheme and cost on the hashing pool."""
+    return password_hasher.hash(raw_password)
+
+
+def hash_passwords(raw_passwords: Sequence[str]) -> List[str]:
+    """Hash a batch in parallel on the hashing pool, keeping the order."""
+    return password_hasher.hash_many(raw_passwords)
 
 
 def verify_password(raw_password: str, hashed_password: str) -> bool:
-    """Validate a PBKDF2 or scrypt hash."""
-    if hashed_password.startswith("$pbkdf2-sha256$"):
-        return pbkdf2_sha256.verify(raw_password, hashed_password)
-    if hashed_password.startswith("$scrypt$"):
-        return scrypt.verify(raw_password, hashed_password)
-    # Default to PBKDF2 for legacy hashes without prefix
-    try:
-        return pbkdf2_sha256.verify(raw_password, hashed_password)
-    except ValueError:
-        return False
+    """Validate a PBKDF2 or scrypt hash on the hashing pool."""
+    return password_hasher.verify(raw_password, hashed_password)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True when a stored hash predates the configured scheme or cost."""
+    return password_hasher.needs_rehash(hashed_password)
 
 
 def generate_token(length: int = 32) -> str:
@@ -54,6 +69,18 @@ def require_any_scope(required_scopes: Iterable[str]) -> None:
         )
 
 
+def require_permission(resource: str, action: str) -> None:
+    """Ensure the current user's roles grant ``action`` on ``resource``."""
+    user = get_current_user()
+    if user.is_admin:
+        return
+    if not permission_matrix().allows(user.roles, resource, action):
+        raise UnauthorizedError(
+            message="Permission denied",
+            details={"resource": resource, "action": action},
+        )
+
+
 def ensure_admin() -> None:
     """Require that the JWT belongs to an administrator."""
     claims = get_jwt()
@@ -61,29 +88,65 @@ def ensure_admin() -> None:
         raise UnauthorizedError(message="Admin privileges required")
 
 
-def get_current_user() -> User:
-    """Return the authenticated user from the current JWT."""
+def get_current_user() -> UserSnapshot:
+    """Return the (cached) authenticated user from the current JWT."""
     identity = get_jwt_identity() or {}
     if identity.get("sub_type") != "user":
         raise UnauthorizedError(message="User token required")
-    user_id = identity.get("user_id")
-    user: User | None = User.query.get(user_id)
+    user = load_identity(identity.get("user_id"))
     if not user or not user.is_active:
         raise UnauthorizedError(message="User not found or inactive")
     return user
 
 
+def get_current_user_record() -> User:
+    """Load the authenticated user's row, for requests that modify it."""
+    snapshot = get_current_user()
+    user: User | None = User.query.get(snapshot.id)
+    if not user:
+        raise UnauthorizedError(message="User not found or inactive")
+    return user
+
+
 def token_from_invite(code: str) -> str:
     """Generate deterministic tokens for invite codes (used for testing)."""
     return secrets.token_urlsafe(16) + code[-4:]
 
 
+TOKEN_CACHE_KEY = "decoded_token_cache"
+
+
+def init_token_cache(app: Flask, settings: Settings) -> None:
+    """Cache of verified query-string tokens used by the web and admin pages."""
+    app.extensions[TOKEN_CACHE_KEY] = LRUCache(maxsize=settings.token_cache_size)
+
+
+def _decode_verified(
+    token: str, allow_expired: bool
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    # Keyed by digest so raw tokens are not kept in memory; entries live
+    # until the token's ``exp``. Revocation is still checked on every call.
+    cache = None if allow_expired else current_app.extensions.get(TOKEN_CACHE_KEY)
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    entry = cache.get(key) if cache is not None else None
+    if entry is None:
+        decoded = decode_token(token, allow_expired=allow_expired)
+        entry = (get_unverified_jwt_headers(token), decoded)
+        remaining = decoded.get("exp", 0) - time.time()
+        if cache is not None and remaining > 0:
+            cache.set(key, entry, ttl=remaining)
+    header, decoded = entry
+    if is_token_revoked(decoded):
+        raise RevokedTokenError(header, decoded)
+    return header, dict(decoded)
+
+
 def decode_user_token(
     token: str, *, allow_expired: bool = False
-) -> Tuple[User, Dict[str, Any]]:
+) -> Tuple[UserSnapshot, Dict[str, Any]]:
     """Decode a standalone JWT access token and return the associated user."""
     try:
-        decoded = decode_token(token, allow_expired=allow_expired)
+        _header, decoded = _decode_verified(token, allow_expired)
     except JWTExtendedException as exc:
         raise UnauthorizedError(message=str(exc)) from exc
     identity = decoded.get("sub")
@@ -94,7 +157,7 @@ def decode_user_token(
         user_id = identity.get("user_id")
     else:
         user_id = identity
-    user = User.query.get(user_id)
+    user = load_identity(user_id)
     if not user:
         raise UnauthorizedError(message="User not found")
     return user, decoded
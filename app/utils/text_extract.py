@@ -0,0 +1,111 @@
+"""Plain text from Office Open XML documents, for the search index.
+
+``.docx``, ``.xlsx`` and ``.pptx`` files are zip archives of XML parts; the
+text lives in ``w:t``, ``t`` and ``a:t`` elements respectively. Parts are
+parsed incrementally straight from the archive, and parts that would
+inflate past ``MAX_PART_BYTES`` are refused, so a crafted archive cannot
+exhaust memory. Output stops at ``limit`` characters.
+"""
+
+from __future__ import annotations
+
+import re
+import zipfile
+from pathlib import Path
+from typing import IO, FrozenSet, Iterator, List
+from xml.etree.ElementTree import ParseError, iterparse
+
+MAX_PART_BYTES = 64 * 1024 * 1024
+PLAIN_TEXT_SUFFIXES = (".txt", ".md", ".csv")
+
+_PART_NUMBER = re.compile(r"(\d+)\.xml$")
+
+
+class ExtractionError(ValueError):
+    """The file is not a readable document of the type its name claims."""
+
+
+def _numbered(names: List[str], pattern: str) -> List[str]:
+    """Parts matching ``pattern`` in numeric order (slide2 before slide10)."""
+    regex = re.compile(pattern)
+    matches = [name for name in names if regex.fullmatch(name)]
+
+    def number(name: str) -> int:
+        found = _PART_NUMBER.search(name)
+        return int(found.group(1)) if found else 0
+
+    return sorted(matches, key=number)
+
+
+def _docx_parts(names: List[str]) -> List[str]:
+    return ["word/document.xml"] + _numbered(
+        names, r"word/(header|footer|footnotes|endnotes)\d*\.xml"
+    )
+
+
+def _xlsx_parts(names: List[str]) -> List[str]:
+    # Cell text is in the shared strings; inline strings stay in the sheets.
+    return ["xl/sharedStrings.xml"] + _numbered(names, r"xl/worksheets/sheet\d+\.xml")
+
+
+def _pptx_parts(names: List[str]) -> List[str]:
+    return _numbered(names, r"ppt/slides/slide\d+\.xml") + _numbered(
+        names, r"ppt/notesSlides/notesSlide\d+\.xml"
+    )
+
+
+# suffix -> (parts to read, local names of text elements, of line breaks)
+_FORMATS = {
+    ".docx": (_docx_parts, frozenset({"t"}), frozenset({"p", "tab", "br"})),
+    ".xlsx": (_xlsx_parts, frozenset({"t"}), frozenset({"si", "is"})),
+    ".pptx": (_pptx_parts, frozenset({"t"}), frozenset({"p", "br"})),
+}
+
+
+def _xml_text(
+    stream: IO[bytes], text_tags: FrozenSet[str], break_tags: FrozenSet[str]
+) -> Iterator[str]:
+    for _event, element in iterparse(stream, events=("end",)):
+        tag = element.tag.rpartition("}")[2]
+        if tag in text_tags and element.text:
+            yield element.text
+        elif tag in break_tags:
+            yield "\n"
+        # Only the current element's text is needed; keep memory flat.
+        element.clear()
+
+
+def extract_text(path: Path, limit: int = 1_000_000) -> str:
+    """Return up to ``limit`` characters of ``path``'s text.
+
+    Unsupported file types give ``""``; damaged files raise
+    :class:`ExtractionError`.
+    """
+    suffix = path.suffix.lower()
+    if suffix in PLAIN_TEXT_SUFFIXES:
+        with open(path, encoding="utf-8", errors="replace") as handle:
+            return handle.read(limit)
+    if suffix not in _FORMATS:
+        return ""
+    select_parts, text_tags, break_tags = _FORMATS[suffix]
+    pieces: List[str] = []
+    length = 0
+    try:
+        with zipfile.ZipFile(path) as archive:
+            infos = {info.filename: info for info in archive.infolist()}
+            for name in select_parts(list(infos)):
+                info = infos.get(name)
+                if info is None:
+                    continue
+                if info.file_size > MAX_PART_BYTES:
+                    raise ExtractionError(f"{name} is too large to index")
+                with archive.open(info) as stream:
+                    for piece in _xml_text(stream, text_tags, break_tags):
+                        pieces.append(piece)
+                        length += len(piece)
+                        if length >= limit:
+                            return "".join(pieces)[:limit]
+    except (zipfile.BadZipFile, ParseError, RuntimeError) as exc:
+        # RuntimeError: encrypted members.
+        raise ExtractionError(f"Cannot read {path.name}: {exc}") from exc
+    return "".join(pieces)
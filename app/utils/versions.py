@@ -0,0 +1,45 @@
+"""Helpers for the shared ``cache_versions`` counters."""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.engine import Connection
+
+from ..extensions import db
+from ..models.cache_version import CacheVersion
+
+_versions = CacheVersion.__table__
+
+
+def bump_version(name: str, connection: Optional[Connection] = None) -> int:
+    """Increment ``name`` inside the current transaction and return it.
+
+    Pass ``connection`` from flush-time event hooks; otherwise the statement
+    runs on ``db.session``.
+    """
+    executor: Any = connection if connection is not None else db.session
+    now = datetime.utcnow()
+    result = executor.execute(
+        update(_versions)
+        .where(_versions.c.name == name)
+        .values(version=_versions.c.version + 1, updated_at=now)
+    )
+    if not result.rowcount:
+        executor.execute(
+            insert(_versions).values(
+                name=name, version=1, created_at=now, updated_at=now
+            )
+        )
+    return executor.execute(
+        select(_versions.c.version).where(_versions.c.name == name)
+    ).scalar_one()
+
+
+def read_version(name: str) -> int:
+    version = db.session.execute(
+        select(_versions.c.version).where(_versions.c.name == name)
+    ).scalar()
+    return version or 0
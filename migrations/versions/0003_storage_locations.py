@@ -0,0 +1,55 @@
+"""storage locations with box occupancy bitmaps"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0003_storage_locations"
+down_revision = "0002_admin_panel"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "storage_locations",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("lab_id", sa.Integer(), sa.ForeignKey("labs.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("parent_id", sa.Integer(), sa.ForeignKey("storage_locations.id", ondelete="CASCADE"), nullable=True),
+        sa.Column("kind", sa.String(length=16), nullable=False),
+        sa.Column("name", sa.String(length=128), nullable=False),
+        sa.Column("rows", sa.Integer(), nullable=True),
+        sa.Column("cols", sa.Integer(), nullable=True),
+        sa.Column("occupancy", sa.LargeBinary(), nullable=True),
+    )
+    op.create_index("ix_storage_locations_lab_id", "storage_locations", ["lab_id"])
+
+    with op.batch_alter_table("samples") as batch_op:
+        batch_op.add_column(sa.Column("storage_box_id", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("storage_position", sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            "fk_samples_storage_box_id_storage_locations",
+            "storage_locations",
+            ["storage_box_id"],
+            ["id"],
+            ondelete="SET NULL",
+        )
+        batch_op.create_unique_constraint(
+            "uq_samples_storage_slot", ["storage_box_id", "storage_position"]
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("samples") as batch_op:
+        batch_op.drop_constraint("uq_samples_storage_slot", type_="unique")
+        batch_op.drop_constraint(
+            "fk_samples_storage_box_id_storage_locations", type_="foreignkey"
+        )
+        batch_op.drop_column("storage_position")
+        batch_op.drop_column("storage_box_id")
+    op.drop_index("ix_storage_locations_lab_id", table_name="storage_locations")
+    op.drop_table("storage_locations")
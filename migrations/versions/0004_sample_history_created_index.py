@@ -0,0 +1,19 @@
+"""index sample_history.created_at for turnaround analytics"""
+
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0004_sample_history_created_index"
+down_revision = "0003_storage_locations"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_sample_history_created_at", "sample_history", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_sample_history_created_at", table_name="sample_history")
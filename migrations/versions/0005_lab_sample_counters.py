@@ -0,0 +1,35 @@
+"""per-lab, per-status sample counters"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0005_lab_sample_counters"
+down_revision = "0004_sample_history_created_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "lab_sample_counters",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("lab_id", sa.Integer(), sa.ForeignKey("labs.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("status", sa.String(length=32), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False, server_default="0"),
+        sa.UniqueConstraint("lab_id", "status", name="uq_lab_sample_counters_lab_status"),
+    )
+    # Seed from the existing samples so the counters start in sync.
+    op.execute(
+        "INSERT INTO lab_sample_counters (lab_id, status, count, created_at, updated_at) "
+        "SELECT lab_id, status, COUNT(*), CURRENT_TIMESTAMP, CURRENT_TIMESTAMP "
+        "FROM samples GROUP BY lab_id, status"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("lab_sample_counters")
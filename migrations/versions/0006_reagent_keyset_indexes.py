@@ -0,0 +1,25 @@
+"""keyset indexes for reagent kit specs and productions"""
+
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0006_reagent_keyset_indexes"
+down_revision = "0005_lab_sample_counters"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_reagent_kit_specs_kit_id_id", "reagent_kit_specs", ["kit_id", "id"]
+    )
+    op.create_index(
+        "ix_reagent_productions_kit_id_id", "reagent_productions", ["kit_id", "id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_reagent_productions_kit_id_id", table_name="reagent_productions")
+    op.drop_index("ix_reagent_kit_specs_kit_id_id", table_name="reagent_kit_specs")
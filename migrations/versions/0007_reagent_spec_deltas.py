@@ -0,0 +1,40 @@
+"""delta-compressed reagent kit spec storage"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0007_reagent_spec_deltas"
+down_revision = "0006_reagent_keyset_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("reagent_kit_specs") as batch_op:
+        batch_op.alter_column("content", existing_type=sa.Text(), nullable=True)
+        batch_op.add_column(sa.Column("payload", sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column("base_spec_id", sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            "fk_reagent_kit_specs_base_spec_id_reagent_kit_specs",
+            "reagent_kit_specs",
+            ["base_spec_id"],
+            ["id"],
+        )
+    op.create_index(
+        "ix_reagent_kit_specs_base_spec_id", "reagent_kit_specs", ["base_spec_id"]
+    )
+
+
+def downgrade() -> None:
+    # Encoded rows must be expanded first: ``flask reagent-specs --expand``.
+    op.drop_index("ix_reagent_kit_specs_base_spec_id", table_name="reagent_kit_specs")
+    with op.batch_alter_table("reagent_kit_specs") as batch_op:
+        batch_op.drop_constraint(
+            "fk_reagent_kit_specs_base_spec_id_reagent_kit_specs", type_="foreignkey"
+        )
+        batch_op.drop_column("base_spec_id")
+        batch_op.drop_column("payload")
+        batch_op.alter_column("content", existing_type=sa.Text(), nullable=False)
@@ -0,0 +1,33 @@
+"""(parent, created_at) indexes for the reagent genealogy timeline"""
+
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0008_reagent_genealogy_indexes"
+down_revision = "0007_reagent_spec_deltas"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("ix_reagent_kit_history_kit_id_created_at", "reagent_kit_history", "kit_id"),
+    ("ix_reagent_kit_specs_kit_id_created_at", "reagent_kit_specs", "kit_id"),
+    ("ix_reagent_productions_kit_id_created_at", "reagent_productions", "kit_id"),
+    ("ix_reagent_spec_history_spec_id_created_at", "reagent_spec_history", "spec_id"),
+    (
+        "ix_reagent_production_history_production_id_created_at",
+        "reagent_production_history",
+        "production_id",
+    ),
+)
+
+
+def upgrade() -> None:
+    for name, table, column in INDEXES:
+        op.create_index(name, table, [column, "created_at"])
+
+
+def downgrade() -> None:
+    for name, table, _column in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
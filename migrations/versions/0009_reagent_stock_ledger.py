@@ -0,0 +1,56 @@
+"""reagent batch stock ledger with balance checkpoints"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0009_reagent_stock_ledger"
+down_revision = "0008_reagent_genealogy_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("reagent_productions") as batch_op:
+        batch_op.add_column(sa.Column("unit", sa.String(length=16), nullable=True))
+        batch_op.add_column(sa.Column("initial_quantity", sa.Integer(), nullable=False, server_default="0"))
+        batch_op.add_column(sa.Column("balance", sa.Integer(), nullable=False, server_default="0"))
+        batch_op.add_column(sa.Column("movement_count", sa.Integer(), nullable=False, server_default="0"))
+    op.create_index("ix_reagent_productions_balance", "reagent_productions", ["balance"])
+
+    op.create_table(
+        "reagent_consumptions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("production_id", sa.Integer(), sa.ForeignKey("reagent_productions.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("seq", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=16), nullable=False),
+        sa.Column("delta", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("notes", sa.Text(), nullable=True),
+        sa.UniqueConstraint("production_id", "seq", name="uq_reagent_consumptions_production_seq"),
+    )
+    op.create_table(
+        "reagent_balance_checkpoints",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("production_id", sa.Integer(), sa.ForeignKey("reagent_productions.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("seq", sa.Integer(), nullable=False),
+        sa.Column("balance", sa.Integer(), nullable=False),
+        sa.UniqueConstraint("production_id", "seq", name="uq_reagent_balance_checkpoints_production_seq"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("reagent_balance_checkpoints")
+    op.drop_table("reagent_consumptions")
+    op.drop_index("ix_reagent_productions_balance", table_name="reagent_productions")
+    with op.batch_alter_table("reagent_productions") as batch_op:
+        batch_op.drop_column("movement_count")
+        batch_op.drop_column("balance")
+        batch_op.drop_column("initial_quantity")
+        batch_op.drop_column("unit")
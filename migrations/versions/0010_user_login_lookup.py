@@ -0,0 +1,44 @@
+"""normalized username/email columns for indexed login lookups"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0010_user_login_lookup"
+down_revision = "0009_reagent_stock_ledger"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(
+            sa.Column("email_normalized", sa.String(length=255), nullable=True)
+        )
+        batch_op.add_column(
+            sa.Column("username_normalized", sa.String(length=64), nullable=True)
+        )
+    op.execute(
+        "UPDATE users SET email_normalized = lower(trim(email)), "
+        "username_normalized = lower(trim(username))"
+    )
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.alter_column(
+            "email_normalized", existing_type=sa.String(length=255), nullable=False
+        )
+        batch_op.alter_column(
+            "username_normalized", existing_type=sa.String(length=64), nullable=False
+        )
+    # Not unique: existing rows may differ only by case.
+    op.create_index("ix_users_email_normalized", "users", ["email_normalized"])
+    op.create_index("ix_users_username_normalized", "users", ["username_normalized"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_username_normalized", table_name="users")
+    op.drop_index("ix_users_email_normalized", table_name="users")
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("username_normalized")
+        batch_op.drop_column("email_normalized")
@@ -0,0 +1,32 @@
+"""content-addressed blobs for documents and versions"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0013_doc_blobs"
+down_revision = "0012_api_keys"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("docs") as batch_op:
+        batch_op.add_column(sa.Column("blob_sha256", sa.String(length=64), nullable=True))
+    with op.batch_alter_table("doc_versions") as batch_op:
+        batch_op.add_column(sa.Column("blob_sha256", sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column("size", sa.Integer(), nullable=True))
+    op.create_index("ix_docs_blob_sha256", "docs", ["blob_sha256"])
+    op.create_index("ix_doc_versions_blob_sha256", "doc_versions", ["blob_sha256"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_doc_versions_blob_sha256", table_name="doc_versions")
+    op.drop_index("ix_docs_blob_sha256", table_name="docs")
+    with op.batch_alter_table("doc_versions") as batch_op:
+        batch_op.drop_column("size")
+        batch_op.drop_column("blob_sha256")
+    with op.batch_alter_table("docs") as batch_op:
+        batch_op.drop_column("blob_sha256")
@@ -0,0 +1,22 @@
+"""document content version for stable editor keys"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0014_doc_content_version"
+down_revision = "0013_doc_blobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("docs") as batch_op:
+        batch_op.add_column(sa.Column("content_version", sa.Integer(), nullable=False, server_default="1"))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("docs") as batch_op:
+        batch_op.drop_column("content_version")
@@ -0,0 +1,40 @@
+"""queued onlyoffice save downloads"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0015_doc_save_jobs"
+down_revision = "0014_doc_content_version"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "doc_save_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("job_key", sa.String(length=64), nullable=False),
+        sa.Column("doc_id", sa.Integer(), sa.ForeignKey("docs.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("document_key", sa.String(length=128), nullable=False),
+        sa.Column("status", sa.Integer(), nullable=False),
+        sa.Column("url", sa.Text(), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("state", sa.String(length=16), nullable=False, server_default="pending"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("claimed_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.Column("doc_version_id", sa.Integer(), sa.ForeignKey("doc_versions.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.UniqueConstraint("job_key", name="uq_doc_save_jobs_job_key"),
+    )
+    op.create_index("ix_doc_save_jobs_state", "doc_save_jobs", ["state"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_doc_save_jobs_state", table_name="doc_save_jobs")
+    op.drop_table("doc_save_jobs")
@@ -0,0 +1,52 @@
+"""full-text search index over documents"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0016_doc_search"
+down_revision = "0015_doc_save_jobs"
+branch_labels = None
+depends_on = None
+
+FTS_TABLE = "doc_search_fts"
+
+
+def upgrade() -> None:
+    op.create_table(
+        "doc_search_entries",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("doc_id", sa.Integer(), sa.ForeignKey("docs.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("source", sa.String(length=64), nullable=False, server_default=""),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.UniqueConstraint("doc_id", name="uq_doc_search_entries_doc_id"),
+    )
+    op.create_table(
+        "doc_search_terms",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("term", sa.String(length=64), nullable=False),
+        sa.Column("doc_id", sa.Integer(), sa.ForeignKey("docs.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("weight", sa.Integer(), nullable=False, server_default="1"),
+    )
+    op.create_index("ix_doc_search_terms_term_doc_id", "doc_search_terms", ["term", "doc_id"])
+    op.create_index("ix_doc_search_terms_doc_id", "doc_search_terms", ["doc_id"])
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            "USING fts5(name, description, content, tokenize = 'unicode61 remove_diacritics 0')"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    op.drop_index("ix_doc_search_terms_doc_id", table_name="doc_search_terms")
+    op.drop_index("ix_doc_search_terms_term_doc_id", table_name="doc_search_terms")
+    op.drop_table("doc_search_terms")
+    op.drop_table("doc_search_entries")
@@ -0,0 +1,31 @@
+"""revoke every token issued for an api key"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0017_api_key_revocation"
+down_revision = "0016_doc_search"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("revoked_tokens") as batch_op:
+        batch_op.add_column(
+            sa.Column(
+                "api_key_id",
+                sa.Integer(),
+                sa.ForeignKey("api_keys.id", name="fk_revoked_tokens_api_key_id", ondelete="CASCADE"),
+                nullable=True,
+            )
+        )
+        batch_op.create_index("ix_revoked_tokens_api_key_id", ["api_key_id"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("revoked_tokens") as batch_op:
+        batch_op.drop_index("ix_revoked_tokens_api_key_id")
+        batch_op.drop_column("api_key_id")
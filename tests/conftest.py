@@ -43,6 +43,12 @@ def app(tmp_path: Path) -> Generator:
         api_keys_json={TEST_API_KEY: ["db", "doc"]},
         enable_swagger=False,
         base_file_dir=base_dir,
+        password_hash_workers=0,
+        audit_writer_async=False,
+        doc_save_async=False,
+        search_index_workers=0,
+        # Written right away, not by an atexit hook after the tables are gone.
+        api_key_last_used_flush_seconds=0,
     )
 
     application = create_app(settings_override=settings)
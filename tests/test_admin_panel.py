@@ -2,10 +2,20 @@
 
 from __future__ import annotations
 
+import io
+
+import pytest
+from flask_jwt_extended import verify_jwt_in_request
+
 from app.extensions import db
+from app.models.role import Role
 from app.models.user import User
 from app.models.user_permissions import UserPermissionEntry
-from app.utils.security import hash_password
+from app.models.user_role import UserRole
+from app.utils.errors import UnauthorizedError
+from app.utils.rbac import permission_matrix
+from app.utils.security import hash_password, require_permission
+from tests.test_auth import auth_header
 
 
 def login_and_get_token(client):
@@ -56,3 +66,106 @@ def test_admin_user_listing_and_scope_toggle(client, admin_user):
     assert deactivate.status_code == 200
     db.session.refresh(user)
     assert user.is_active is False
+
+
+def test_role_changes_recompile_permission_matrix(app, client, admin_user):
+    token = login_and_get_token(client)
+    viewer = Role.query.filter_by(name="viewer").one()
+    user = User(
+        username="reader",
+        email="reader@example.com",
+        password_hash=hash_password("reader-pass"),
+    )
+    user.roles.append(UserRole(role_id=viewer.id))
+    db.session.add(user)
+    db.session.commit()
+
+    matrix = permission_matrix()
+    assert matrix.allows(("viewer",), "documents", "read")
+    assert not matrix.allows(("viewer",), "documents", "write")
+    # ``manage`` implies every action on the resource.
+    assert matrix.allows(("admin",), "documents", "comment")
+    assert matrix.mask(("viewer", "editor")) == (
+        matrix.mask(("viewer",)) | matrix.mask(("editor",))
+    )
+
+    reader_token = client.post(
+        "/auth/login", json={"username": "reader", "password": "reader-pass"}
+    ).get_json()["access_token"]
+    with app.test_request_context(headers=auth_header(reader_token)):
+        verify_jwt_in_request()
+        require_permission("documents", "read")
+        with pytest.raises(UnauthorizedError):
+            require_permission("documents", "write")
+
+    res = client.post(
+        f"/admin/roles/{viewer.id}/permissions",
+        data={
+            "token": token,
+            "resource": "documents",
+            "action": "write",
+            "mode": "add",
+        },
+    )
+    assert res.status_code == 302
+    updated = permission_matrix()
+    assert updated.version > matrix.version
+    assert updated.allows(("viewer",), "documents", "write")
+
+    client.post(
+        f"/admin/roles/{viewer.id}/permissions",
+        data={
+            "token": token,
+            "resource": "documents",
+            "action": "write",
+            "mode": "remove",
+        },
+    )
+    assert not permission_matrix().allows(("viewer",), "documents", "write")
+
+    client.post("/admin/roles/create", data={"token": token, "name": "auditor"})
+    auditor = Role.query.filter_by(name="auditor").one()
+    before = permission_matrix().version
+    client.post(f"/admin/roles/{auditor.id}/delete", data={"token": token})
+    assert permission_matrix().version > before
+
+
+def test_csv_import_creates_users_in_one_transaction(client, admin_user):
+    token = login_and_get_token(client)
+    db.session.add(Role(name="analyst"))
+    db.session.commit()
+
+    def upload(text: str):
+        return client.post(
+            "/admin/users/import",
+            data={"token": token, "csv_file": (io.BytesIO(text.encode()), "u.csv")},
+            content_type="multipart/form-data",
+            follow_redirects=True,
+        )
+
+    invalid = upload(
+        "username,email,roles\n"
+        "ok,ok@example.com,\n"
+        "admin,other@example.com,\n"
+        "bad,bad@example.com,nope\n"
+    )
+    assert b"No users were imported" in invalid.data
+    assert User.query.filter_by(username="ok").first() is None
+
+    resp = upload(
+        "username,email,password,roles,scopes,status\n"
+        "alice,alice@example.com,pw-alice,analyst,doc,\n"
+        "bob,Bob@Example.com,,,,inactive\n"
+    )
+    assert b"Imported 2 user(s)" in resp.data
+    alice = User.query.filter_by(username="alice").one()
+    bob = User.query.filter_by(username_normalized="bob").one()
+    assert alice.scopes == ["doc"] and sorted(bob.scopes) == ["db", "doc"]
+    assert not bob.is_active and alice.is_active
+    assert [assignment.role.name for assignment in alice.roles] == ["analyst"]
+    assert UserRole.query.filter_by(user_id=bob.id).count() == 0
+
+    login = client.post(
+        "/auth/login", json={"username": "alice", "password": "pw-alice"}
+    )
+    assert login.status_code == 200
@@ -0,0 +1,104 @@
+"""Sample turnaround analytics tests."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.extensions import db
+from app.models.sample_history import SampleHistory, status_action
+from app.models.samples import Sample
+from app.services.analytics_service import CACHE_SIZE, sample_analytics_service
+
+from tests.test_auth import auth_header
+
+
+def _login_admin(client) -> str:
+    res = client.post("/auth/login", json={"username": "admin", "password": "password"})
+    return res.get_json()["access_token"]
+
+
+def test_turnaround_median_and_p95_per_week(client, admin_user, sample_data):
+    lab, _ = sample_data
+    sample_analytics_service.clear_cache()
+    monday = datetime(2024, 3, 4, 9, 0)
+    hours = [1, 2, 3, 4, 10]
+    for index, hour in enumerate(hours):
+        sample = Sample(lab_id=lab.id, code=f"TAT-{index}")
+        db.session.add(sample)
+        db.session.flush()
+        db.session.add_all(
+            [
+                SampleHistory(sample_id=sample.id, action="created", created_at=monday),
+                SampleHistory(
+                    sample_id=sample.id,
+                    action=status_action("done"),
+                    created_at=monday + timedelta(hours=hour),
+                ),
+                SampleHistory(
+                    sample_id=sample.id,
+                    action="updated",
+                    created_at=monday + timedelta(hours=hour + 1),
+                ),
+            ]
+        )
+    db.session.commit()
+
+    token = _login_admin(client)
+    res = client.get(
+        "/api/v1/analytics/samples/turnaround?from=2024-03-01&to=2024-04-01",
+        headers=auth_header(token),
+    )
+    assert res.status_code == 200
+    body = res.get_json()
+    assert body["meta"]["events"] == len(hours)
+    (row,) = body["data"]
+    seconds = np.array(hours) * 3600.0
+    assert row["lab_id"] == lab.id
+    assert row["week"] == "2024-03-04"
+    assert row["status"] == "done"
+    assert row["count"] == len(hours)
+    assert row["median_seconds"] == np.percentile(seconds, 50)
+    assert row["p95_seconds"] == np.percentile(seconds, 95)
+
+
+def test_status_change_is_recorded_in_history(client, admin_user, sample_data):
+    _, sample = sample_data
+    token = _login_admin(client)
+    client.put(
+        f"/api/v1/samples/{sample.id}",
+        headers=auth_header(token),
+        json={"status": "received"},
+    )
+    actions = [entry.action for entry in SampleHistory.query.all()]
+    assert actions == ["status:received"]
+
+
+def test_turnaround_rejects_inverted_window(client, admin_user):
+    token = _login_admin(client)
+    res = client.get(
+        "/api/v1/analytics/samples/turnaround?from=2024-05-01&to=2024-04-01",
+        headers=auth_header(token),
+    )
+    assert res.status_code == 400
+
+
+def test_turnaround_accepts_offsets_and_bounds_its_cache(client, admin_user):
+    token = _login_admin(client)
+    res = client.get(
+        "/api/v1/analytics/samples/turnaround",
+        query_string={"from": "2024-04-01T02:00:00+02:00", "to": "2024-05-01T00:00Z"},
+        headers=auth_header(token),
+    )
+    assert res.status_code == 200
+    assert (datetime(2024, 4, 1), datetime(2024, 5, 1)) in (
+        sample_analytics_service._cache
+    )
+
+    for day in range(CACHE_SIZE + 5):
+        start = datetime(2023, 1, 1) + timedelta(days=day)
+        sample_analytics_service.turnaround(
+            start, start + timedelta(days=1), ttl_seconds=60
+        )
+    assert len(sample_analytics_service._cache) == CACHE_SIZE
@@ -2,11 +2,24 @@
 
 from __future__ import annotations
 
+import time
+
+import pytest
 from flask_jwt_extended import decode_token
+from sqlalchemy import event
 
 from app.extensions import db
+from app.models.api_key import ApiKey
+from app.models.login_log import LoginLog
 from app.models.user import User
 from app.models.user_permissions import UserPermissionEntry
+from app.models.user_role import UserRole
+from app.services import auth_service as auth_service_module
+from app.services.api_key_service import EXTENSION_KEY as API_KEY_CACHE
+from app.services.api_key_service import api_key_service
+from app.utils.audit import AuditWriter
+from app.utils.errors import APIError
+from app.utils.passwords import PasswordHasher
 from app.utils.security import hash_password
 from tests.conftest import TEST_API_KEY
 
@@ -113,3 +126,540 @@ def test_create_invite_requires_admin(client, admin_user):
     assert res.status_code == 201
     payload = res.get_json()
     assert "code" in payload
+
+
+def test_identity_cache_serves_snapshots_and_invalidates(app, admin_user):
+    from sqlalchemy import event
+
+    from app.utils.identity import load_identity
+
+    statements: list[str] = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    first = load_identity(admin_user.id)
+    assert first is not None
+    assert set(first.scopes) == {"db", "doc"} and "admin" in first.roles
+
+    event.listen(db.engine, "before_cursor_execute", _record)
+    try:
+        assert load_identity(admin_user.id) is first
+    finally:
+        event.remove(db.engine, "before_cursor_execute", _record)
+    assert statements == []
+
+    # Login bookkeeping does not touch the snapshot.
+    user = User.query.get(admin_user.id)
+    user.last_login_at = user.created_at
+    db.session.commit()
+    assert load_identity(admin_user.id) is first
+
+    entry = UserPermissionEntry.query.filter_by(user_id=user.id, scope="db").one()
+    db.session.delete(entry)
+    db.session.commit()
+    assert load_identity(admin_user.id).scopes == ("doc",)
+
+    user.is_active = False
+    db.session.commit()
+    assert load_identity(admin_user.id).is_active is False
+
+    # Bulk deletes bypass mapper events but still evict.
+    UserRole.query.filter(UserRole.user_id == user.id).delete(synchronize_session=False)
+    db.session.commit()
+    assert load_identity(admin_user.id).roles == ()
+
+
+def test_login_matches_normalized_username_or_email(app, client, admin_user):
+    from sqlalchemy import event
+
+    statements: list[str] = []
+
+    def record(_conn, _cursor, statement, *_args):
+        # Lookups by primary key (refresh after commit) are not credential checks.
+        if "FROM users" in statement and "WHERE users.id =" not in statement:
+            statements.append(statement)
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        res = client.post(
+            "/auth/login", json={"username": " ADMIN ", "password": "password"}
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert res.status_code == 200
+    assert len(statements) == 1
+    assert "username_normalized" in statements[0]
+
+    res = client.post(
+        "/auth/login", json={"username": "Admin@Example.COM", "password": "password"}
+    )
+    assert res.status_code == 200
+    # LIKE wildcards are no longer interpreted.
+    res = client.post("/auth/login", json={"username": "adm%", "password": "password"})
+    assert res.status_code == 401
+
+    user = User.query.get(admin_user.id)
+    user.username = "Chief"
+    db.session.commit()
+    assert user.username_normalized == "chief"
+    assert "username_normalized" not in user.to_dict()
+
+    token = client.post(
+        "/auth/login", json={"username": "chief", "password": "password"}
+    ).get_json()["access_token"]
+    res = client.put(
+        f"/api/v1/table/users/{admin_user.id}",
+        headers=auth_header(token),
+        json={"username_normalized": "other", "email_normalized": "other@x.org"},
+    )
+    assert res.status_code == 200
+    db.session.expire_all()
+    user = User.query.get(admin_user.id)
+    assert (user.username_normalized, user.email_normalized) == (
+        "chief",
+        "admin@example.com",
+    )
+
+
+def test_login_upgrades_outdated_password_hash(client, admin_user):
+    from passlib.hash import pbkdf2_sha256
+
+    user = User.query.get(admin_user.id)
+    user.password_hash = pbkdf2_sha256.using(rounds=1000).hash("password")
+    db.session.commit()
+
+    res = client.post("/auth/login", json={"username": "admin", "password": "password"})
+    assert res.status_code == 200
+    db.session.expire_all()
+    upgraded = User.query.get(admin_user.id).password_hash
+    assert upgraded.startswith(f"$pbkdf2-sha256${pbkdf2_sha256.default_rounds}$")
+
+    res = client.post("/auth/login", json={"username": "admin", "password": "password"})
+    assert res.status_code == 200
+    db.session.expire_all()
+    assert User.query.get(admin_user.id).password_hash == upgraded
+
+
+def _drain(hasher: PasswordHasher, limit: float = 30.0) -> None:
+    # Slots are released by done-callbacks, just after result() returns.
+    deadline = time.monotonic() + limit
+    while hasher._pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_password_pool_hashes_and_sheds_load():
+    hasher = PasswordHasher(workers=1, queue_limit=1, rounds=1000)
+    try:
+        hashed = hasher.hash("secret")
+        assert hasher.verify("secret", hashed)
+        assert not hasher.verify("wrong", hashed)
+        assert not hasher.needs_rehash(hashed)
+        batch = hasher.hash_many(["a", "b", "c"])
+        assert [hasher.verify(raw, h) for raw, h in zip("abc", batch)] == [True] * 3
+        _drain(hasher)
+        assert hasher._pending == 0
+
+        hasher._pending = hasher.queue_limit
+        with pytest.raises(APIError) as excinfo:
+            hasher.hash("secret")
+        assert excinfo.value.status_code == 503
+    finally:
+        hasher._pending = 0
+        hasher.shutdown()
+
+
+def test_password_pool_hashes_batches_one_window_at_a_time(monkeypatch):
+    hasher = PasswordHasher(workers=2, queue_limit=4, rounds=1000)
+    futures: list = []
+    in_flight: list[int] = []
+    submit = hasher._submit
+
+    def recording_submit(*args):
+        futures.append(submit(*args))
+        in_flight.append(sum(not future.done() for future in futures))
+        return futures[-1]
+
+    monkeypatch.setattr(hasher, "_submit", recording_submit)
+    try:
+        batch = hasher.hash_many(["a", "b", "c", "d", "e"])
+        # Never more than one task per worker, so single calls get a turn.
+        assert len(in_flight) == 5 and max(in_flight) <= hasher.workers
+        assert [hasher.verify(raw, h) for raw, h in zip("abcde", batch)] == [True] * 5
+    finally:
+        hasher.shutdown()
+
+
+def test_password_pool_keeps_timed_out_tasks_admitted():
+    # Starting a fresh pool worker takes far longer than the timeout.
+    hasher = PasswordHasher(workers=1, queue_limit=1, rounds=1000, timeout=0.001)
+    try:
+        with pytest.raises(APIError) as excinfo:
+            hasher.hash("secret")
+        assert excinfo.value.code == "hashing_timeout"
+        # Still running in the pool, so it still counts against the limit.
+        assert hasher._pending == 1
+        with pytest.raises(APIError) as excinfo:
+            hasher.hash("secret")
+        assert excinfo.value.code == "hashing_busy"
+        _drain(hasher)
+        assert hasher._pending == 0
+    finally:
+        hasher.shutdown()
+
+
+def test_audit_writer_batches_login_records(app, client, admin_user):
+    from sqlalchemy import event
+
+    from app.models.activity_log import ActivityLog
+    from app.models.login_log import LoginLog
+    from app.utils.audit import EXTENSION_KEY
+
+    writer = app.extensions[EXTENSION_KEY]
+    writer.asynchronous = True
+    writer.flush_interval = 60
+    inserts: list[str] = []
+
+    def record(_conn, _cursor, statement, *_args):
+        if statement.startswith("INSERT INTO"):
+            inserts.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        for _ in range(3):
+            res = client.post(
+                "/auth/login", json={"username": "admin", "password": "password"}
+            )
+            assert res.status_code == 200
+        assert inserts == []
+        assert LoginLog.query.count() == 0
+        writer.shutdown()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+
+    # One multi-row INSERT per table.
+    assert len(inserts) == 2
+    assert LoginLog.query.filter_by(user_id=admin_user.id).count() == 3
+    assert ActivityLog.query.filter_by(action="login").count() == 3
+
+
+def test_audit_writer_overflow_writes_in_callers_session(app, admin_user, monkeypatch):
+    writer = AuditWriter(app, queue_limit=1, flush_interval=60)
+    monkeypatch.setattr(writer, "_ensure_thread", lambda: None)
+
+    def second_connection(batch):
+        raise AssertionError("overflow must not open another connection")
+
+    monkeypatch.setattr(writer, "_write", second_connection)
+    writer.add(LoginLog.__table__, user_id=admin_user.id)  # fills the queue
+    writer.add(LoginLog.__table__, user_id=admin_user.id)
+    assert writer._queue.qsize() == 1
+    assert LoginLog.query.filter_by(user_id=admin_user.id).count() == 1
+
+
+def test_logout_and_deactivation_revoke_tokens(app, client, admin_user):
+    from app.utils.revocation import EXTENSION_KEY, TokenBlocklist
+
+    tokens = client.post(
+        "/auth/login", json={"username": "admin", "password": "password"}
+    ).get_json()
+    access, refresh = tokens["access_token"], tokens["refresh_token"]
+    assert client.get("/api/v1/docs", headers=auth_header(access)).status_code == 200
+
+    res = client.post(
+        "/auth/logout", headers=auth_header(access), json={"refresh_token": refresh}
+    )
+    assert res.status_code == 200
+    assert client.get("/api/v1/docs", headers=auth_header(access)).status_code == 401
+    assert client.post("/auth/refresh", headers=auth_header(refresh)).status_code == 401
+
+    # Another worker only sees new revocations once its refresh interval passes.
+    now = [0.0]
+    other = TokenBlocklist(refresh_interval=30, clock=lambda: now[0])
+    guest = User(
+        username="guest", email="guest@example.com", password_hash=hash_password("pw")
+    )
+    db.session.add(guest)
+    db.session.add(UserPermissionEntry(user=guest, scope="doc"))
+    db.session.commit()
+    guest_claims = decode_token(
+        client.post(
+            "/auth/login", json={"username": "guest", "password": "pw"}
+        ).get_json()["access_token"]
+    )
+    assert not other.is_revoked(guest_claims)
+
+    admin_token = client.post(
+        "/auth/login", json={"username": "admin", "password": "password"}
+    ).get_json()["access_token"]
+    res = client.post(
+        f"/admin/users/{guest.id}/status",
+        data={"token": admin_token, "action": "toggle_active"},
+    )
+    assert res.status_code == 302
+    assert app.extensions[EXTENSION_KEY].is_revoked(guest_claims)
+    assert not other.is_revoked(guest_claims)
+    now[0] = 31.0
+    assert other.is_revoked(guest_claims)
+
+
+def test_db_api_keys_are_cached_and_rotate_without_restart(app, client):
+    from sqlalchemy import event
+
+    from app.models.api_key import ApiKey
+    from app.services.api_key_service import EXTENSION_KEY, api_key_service
+
+    key, raw_key = api_key_service.create_key("ci", ["db"])
+    assert ApiKey.query.get(key.id).key_hash != raw_key
+    cache = app.extensions[EXTENSION_KEY]
+    cache.refresh_interval = 60
+    cache.flush_interval = 60
+
+    res = client.post("/auth/", json={"api_key": raw_key})
+    assert res.status_code == 200
+    claims = decode_token(res.get_json()["access_token"])
+    assert claims["scopes"] == ["db"]
+    assert claims["sub"] == {"sub_type": "api_key", "api_key_id": key.id}
+
+    statements: list[str] = []
+
+    def record(_conn, _cursor, statement, *_args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        assert client.post("/auth/", json={"api_key": raw_key}).status_code == 200
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+    assert not any("api_keys" in statement for statement in statements)
+
+    assert ApiKey.query.get(key.id).last_used_at is None
+    cache.flush()
+    db.session.expire_all()
+    assert ApiKey.query.get(key.id).last_used_at is not None
+
+    api_key_service.revoke_key(key.id)
+    assert client.post("/auth/", json={"api_key": raw_key}).status_code == 401
+
+    # Imported legacy keys are governed by their row from then on.
+    assert api_key_service.import_keys({TEST_API_KEY: ["db", "doc"]}) == 1
+    imported = ApiKey.query.filter_by(prefix=TEST_API_KEY[:4]).one()
+    api_key_service.revoke_key(imported.id)
+    assert client.post("/auth/", json={"api_key": TEST_API_KEY}).status_code == 401
+
+
+def test_revoking_api_key_revokes_its_tokens(app, client):
+    key, raw_key = api_key_service.create_key("ci", ["db"])
+    tokens = client.post("/auth/", json={"api_key": raw_key}).get_json()
+    access = auth_header(tokens["access_token"])
+    assert client.get("/api/v1/meta", headers=access).status_code == 200
+
+    # Renewed tokens follow the key's current scopes.
+    ApiKey.query.get(key.id).scopes = ["db", "doc"]
+    db.session.commit()
+    refreshed = client.post(
+        "/auth/refresh", headers=auth_header(tokens["refresh_token"])
+    )
+    assert refreshed.status_code == 200
+    assert refreshed.get_json()["scopes"] == ["db", "doc"]
+
+    api_key_service.revoke_key(key.id)
+    assert client.get("/api/v1/meta", headers=access).status_code == 401
+    refresh = client.post("/auth/refresh", headers=auth_header(tokens["refresh_token"]))
+    assert refresh.status_code == 401
+
+
+def test_api_key_usage_flush_failure_does_not_fail_requests(app, client):
+    key, raw_key = api_key_service.create_key("ci", ["db"])
+    cache = app.extensions[API_KEY_CACHE]
+
+    def fail_update(_conn, _cursor, statement, *_args):
+        if statement.startswith("UPDATE api_keys"):
+            raise RuntimeError("database unavailable")
+
+    event.listen(db.engine, "before_cursor_execute", fail_update)
+    try:
+        assert client.post("/auth/", json={"api_key": raw_key}).status_code == 200
+    finally:
+        event.remove(db.engine, "before_cursor_execute", fail_update)
+    # Kept for the next flush.
+    assert key.id in cache._used
+    cache.flush()
+    db.session.expire_all()
+    assert ApiKey.query.get(key.id).last_used_at is not None
+
+
+def test_purge_expired_removes_unusable_rows_in_batches(app, admin_user):
+    from datetime import datetime, timedelta
+
+    from app.models.invite import InviteCode
+    from app.models.password_reset_tokens import PasswordResetToken
+    from app.models.revoked_token import RevokedToken
+    from app.services.maintenance_service import maintenance_service
+
+    now = datetime.utcnow()
+    past, future = now - timedelta(hours=1), now + timedelta(hours=1)
+    db.session.add_all(
+        [
+            InviteCode(code="expired", expires_at=past),
+            InviteCode(code="used-up", uses=1, max_uses=1),
+            InviteCode(code="disabled", is_active=False),
+            InviteCode(code="open", expires_at=future),
+            PasswordResetToken(token="old", user=admin_user, expires_at=past),
+            PasswordResetToken(
+                token="used", user=admin_user, expires_at=future, used=True
+            ),
+            PasswordResetToken(token="fresh", user=admin_user, expires_at=future),
+            RevokedToken(seq=1, jti="gone", expires_at=past),
+            RevokedToken(seq=2, jti="live", expires_at=future),
+        ]
+    )
+    db.session.commit()
+
+    pauses: list[float] = []
+    kept = maintenance_service.purge_expired(
+        retention=timedelta(hours=2), sleep=pauses.append
+    )
+    # Used rows are kept for the retention period; revocations are not.
+    assert kept.deleted == {
+        "invite_codes": 0,
+        "password_reset_tokens": 0,
+        "revoked_tokens": 1,
+    }
+
+    report = maintenance_service.purge_expired(
+        batch_size=2, pause=0.5, now=now + timedelta(seconds=1), sleep=pauses.append
+    )
+    assert report.deleted == {
+        "invite_codes": 3,
+        "password_reset_tokens": 2,
+        "revoked_tokens": 0,
+    }
+    assert report.batches == 3
+    assert pauses == [0.5, 0.5]
+    remaining = {invite.code for invite in InviteCode.query.all()}
+    assert remaining & {"expired", "used-up", "disabled", "open"} == {"open"}
+    assert [reset.token for reset in PasswordResetToken.query.all()] == ["fresh"]
+    assert [row.jti for row in RevokedToken.query.all()] == ["live"]
+
+    # One worker per interval wins the run.
+    assert maintenance_service.claim_run(60, now=now)
+    assert not maintenance_service.claim_run(60, now=now + timedelta(seconds=10))
+    assert maintenance_service.claim_run(60, now=now + timedelta(seconds=31))
+
+
+def test_invites_and_reset_tokens_are_redeemed_atomically(app, client, admin_user):
+    from app.models.invite import InviteCode
+    from app.models.password_reset_tokens import PasswordResetToken
+
+    db.session.add(InviteCode(code="ONCE", max_uses=1))
+    db.session.add(InviteCode(code="MINE", email="Only@Example.com", max_uses=5))
+    db.session.commit()
+
+    def register(username: str, email: str, code: str = "ONCE"):
+        return client.post(
+            "/auth/register",
+            json={
+                "username": username,
+                "email": email,
+                "password": "secret",
+                "invite_code": code,
+            },
+        )
+
+    assert register("wrong", "other@example.com", "MINE").status_code == 400
+    assert register("mine", "only@example.com", "MINE").status_code == 201
+    assert register("first", "first@example.com").status_code == 201
+    second = register("second", "second@example.com")
+    assert second.status_code == 400
+    assert second.get_json()["error"]["code"] == "invalid_invite"
+    db.session.expire_all()
+    assert InviteCode.query.filter_by(code="ONCE").one().uses == 1
+    assert User.query.filter_by(username="second").first() is None
+
+    token = client.post(
+        "/auth/request_password_reset", json={"email": "admin@example.com"}
+    ).get_json()["token"]
+    # Loaded before it is consumed, as a concurrent request would have.
+    stale = PasswordResetToken.query.filter_by(token=token).one()
+    assert not stale.used
+    body = {"token": token, "password": "newpass"}
+    assert client.post("/auth/perform_password_reset", json=body).status_code == 200
+    reused = client.post("/auth/perform_password_reset", json=body)
+    assert reused.status_code == 400
+    assert reused.get_json()["error"]["code"] == "invalid_token"
+
+
+def test_unusable_invites_and_reset_tokens_skip_hashing(client, monkeypatch):
+    hashed: list[str] = []
+
+    def counting_hash(raw_password: str) -> str:
+        hashed.append(raw_password)
+        return hash_password(raw_password)
+
+    monkeypatch.setattr(auth_service_module, "hash_password", counting_hash)
+    res = client.post(
+        "/auth/register",
+        json={
+            "username": "nobody",
+            "email": "nobody@example.com",
+            "password": "secret",
+            "invite_code": "NO-SUCH-CODE",
+        },
+    )
+    assert res.get_json()["error"]["code"] == "invalid_invite"
+    res = client.post(
+        "/auth/perform_password_reset",
+        json={"token": "no-such-token", "password": "secret"},
+    )
+    assert res.get_json()["error"]["code"] == "invalid_token"
+    assert hashed == []
+
+
+def test_register_with_bad_invite_does_not_reveal_existing_users(client, admin_user):
+    for username, email in (
+        ("admin", "fresh@example.com"),
+        ("fresh", "admin@example.com"),
+        ("fresh", "fresh@example.com"),
+    ):
+        res = client.post(
+            "/auth/register",
+            json={
+                "username": username,
+                "email": email,
+                "password": "secret",
+                "invite_code": "bogus",
+            },
+        )
+        assert res.status_code == 400
+        assert res.get_json()["error"]["code"] == "invalid_invite"
+
+
+def test_bulk_invites_are_created_in_one_request(client, admin_user):
+    from app.models.invite import InviteCode
+
+    token = client.post(
+        "/auth/login", json={"username": "admin", "password": "password"}
+    ).get_json()["access_token"]
+    res = client.post(
+        "/auth/invites/bulk",
+        json={"emails": ["a@example.com", "b@example.com"], "max_uses": 2},
+        headers=auth_header(token),
+    )
+    assert res.status_code == 201
+    invites = res.get_json()["invites"]
+    assert [invite["email"] for invite in invites] == ["a@example.com", "b@example.com"]
+    stored = InviteCode.query.filter(
+        InviteCode.code.in_([invite["code"] for invite in invites])
+    ).all()
+    assert {invite.max_uses for invite in stored} == {2}
+
+    res = client.post(
+        "/auth/invites/bulk", json={"count": 3}, headers=auth_header(token)
+    )
+    assert res.get_json()["count"] == 3
+    too_many = client.post(
+        "/auth/invites/bulk", json={"count": 5000}, headers=auth_header(token)
+    )
+    assert too_many.status_code == 400
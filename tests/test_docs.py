@@ -2,8 +2,16 @@
 
 from __future__ import annotations
 
+import jwt as pyjwt
+import pytest
+
 from app.extensions import db
+from app.models.doc_save_job import DONE, PENDING, RUNNING, DocSaveJob
 from app.models.file_ledger import FileLedger
+from app.services.doc_save_service import doc_save_service
+from app.services.document_service import document_service
+from app.services.onlyoffice_service import onlyoffice_service
+from app.utils.blobs import blob_store
 
 from tests.test_auth import auth_header
 
@@ -48,3 +56,424 @@ def test_edit_config_and_callback(client, admin_user, sample_doc):
     file_res = client.get(f"/files/{sample_doc.path}")
     assert file_res.status_code == 200
     assert file_res.data == b"demo document"
+
+
+def test_files_support_ranges_validators_and_offload(app, client, sample_doc):
+    url = f"/files/{sample_doc.path}"
+    full = client.get(url)
+    etag = full.headers["ETag"]
+    assert full.headers["Accept-Ranges"] == "bytes"
+    assert full.headers["Last-Modified"]
+
+    partial = client.get(url, headers={"Range": "bytes=5-12"})
+    assert partial.status_code == 206
+    assert partial.data == b"document"
+    assert partial.headers["Content-Range"] == "bytes 5-12/13"
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    settings = app.config["APP_SETTINGS"]
+    app.config["APP_SETTINGS"] = settings.copy(
+        update={"file_offload": "x-accel-redirect"}
+    )
+    try:
+        offloaded = client.get(url)
+        assert offloaded.status_code == 200
+        assert offloaded.data == b""
+        assert offloaded.headers["X-Accel-Redirect"] == (
+            f"/protected-files/{sample_doc.path}"
+        )
+        assert offloaded.headers["ETag"] == etag
+        assert "Content-Length" not in offloaded.headers
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+        app.config["APP_SETTINGS"] = settings.copy(
+            update={"file_offload": "x-sendfile"}
+        )
+        sendfile = client.get(url)
+        path = settings.base_file_dir / sample_doc.path
+        assert sendfile.headers["X-Sendfile"] == str(path.resolve())
+    finally:
+        app.config["APP_SETTINGS"] = settings
+
+
+def test_versions_are_deduplicated_blobs_apart_from_working_files(
+    app, client, sample_doc
+):
+    import hashlib
+    import os
+
+    from app.models.doc import Doc
+    from app.models.doc_version import DocVersion
+
+    token = client.post(
+        "/auth/login", json={"username": "admin", "password": "password"}
+    ).get_json()["access_token"]
+    base_dir = app.config["APP_SETTINGS"].base_file_dir
+    working = base_dir / sample_doc.path
+
+    def record_version() -> DocVersion:
+        res = client.post(
+            f"/admin/documents/{sample_doc.id}/versions",
+            data={"token": token, "note": "snapshot"},
+        )
+        assert res.status_code == 302
+        return DocVersion.query.order_by(DocVersion.version_number.desc()).first()
+
+    def save(content: bytes) -> None:
+        # Editors replace the working file, they never write it in place.
+        tmp = working.with_suffix(".tmp")
+        tmp.write_bytes(content)
+        os.replace(tmp, working)
+
+    first = record_version()
+    digest = hashlib.sha256(b"demo document").hexdigest()
+    assert first.blob_sha256 == digest and first.size == 13
+    assert first.path == f"_blobs/{digest[:2]}/{digest[2:4]}/{digest}"
+    blob = base_dir / first.path
+    # A copy: the working file stays writable and the blob cannot change.
+    assert not os.path.samefile(blob, working)
+    assert os.access(working, os.W_OK)
+    working.write_bytes(b"edited in place")
+    assert blob.read_bytes() == b"demo document"
+    assert Doc.query.get(sample_doc.id).blob_sha256 == digest
+
+    save(b"second draft")
+    second = record_version()
+    assert second.version_number == 2 and second.blob_sha256 != digest
+
+    save(b"demo document")
+    third = record_version()
+    assert third.blob_sha256 == digest
+    # Back to the first content: stored once.
+    assert not os.path.samefile(working, blob)
+    assert os.stat(blob).st_nlink == 1
+    assert len(list(blob.parent.parent.parent.glob("*/*/*"))) == 2
+    assert client.get(f"/files/{third.path}").data == b"demo document"
+
+
+def test_editor_document_key_changes_only_with_content(client, sample_doc):
+    from app.models.doc import Doc
+
+    token = client.post(
+        "/auth/login", json={"username": "admin", "password": "password"}
+    ).get_json()["access_token"]
+
+    def key() -> str:
+        res = client.get(
+            f"/api/v1/docs/{sample_doc.id}/edit", headers=auth_header(token)
+        )
+        return res.get_json()["config"]["document"]["key"]
+
+    first = key()
+    assert first.startswith(f"{sample_doc.id}-1-")
+    assert key() == first
+
+    doc = Doc.query.get(sample_doc.id)
+    doc.content_version += 1
+    db.session.commit()
+    assert key().startswith(f"{sample_doc.id}-2-")
+
+    # Pointing the record at another file is new content too.
+    working = document_service.working_path(doc)
+    (working.parent / "moved.docx").write_bytes(b"demo document")
+    res = client.put(
+        f"/api/v1/table/docs/{sample_doc.id}",
+        json={"path": "moved.docx", "content_version": 1},
+        headers=auth_header(token),
+    )
+    assert res.status_code == 200
+    assert key().startswith(f"{sample_doc.id}-3-")
+
+    # A file replaced outside the editor is picked up by the next snapshot.
+    (working.parent / "moved.docx").write_bytes(b"replaced on disk")
+    document_service.create_version(doc, created_by=None)
+    assert key().startswith(f"{sample_doc.id}-4-")
+    document_service.create_version(doc, created_by=None)
+    assert key().startswith(f"{sample_doc.id}-4-")
+
+
+def test_editor_configs_are_built_once_per_version(
+    app, client, sample_doc, monkeypatch
+):
+    import importlib
+
+    from app.models.doc import Doc
+
+    module = importlib.import_module("app.services.onlyoffice_service")
+    builds: list[str] = []
+    original = module.build_editor_config
+
+    def counting_build(**kwargs):
+        builds.append(kwargs["document_key"])
+        return original(**kwargs)
+
+    monkeypatch.setattr(module, "build_editor_config", counting_build)
+    token = client.post(
+        "/auth/login", json={"username": "admin", "password": "password"}
+    ).get_json()["access_token"]
+    url = f"/api/v1/docs/{sample_doc.id}/edit"
+
+    first = client.get(url, headers=auth_header(token)).get_json()
+    assert client.get(url, headers=auth_header(token)).get_json() == first
+    assert len(builds) == 1
+
+    doc = Doc.query.get(sample_doc.id)
+    doc.content_version += 1
+    db.session.commit()
+    module.onlyoffice_service.invalidate_editor_configs(doc.id)
+    assert len(app.extensions[module.EDITOR_CONFIG_CACHE_KEY]) == 0
+    second = client.get(url, headers=auth_header(token)).get_json()
+    assert second["config"]["document"]["key"] != first["config"]["document"]["key"]
+    assert len(builds) == 2
+
+
+def test_save_callback_downloads_edited_file_once(app, client, admin_user, sample_doc):
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from app.models.doc import Doc
+    from app.models.doc_version import DocVersion
+    from app.services.doc_save_service import doc_save_worker
+
+    edited = b"edited document " * 50000
+    requests: list[str] = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.path)
+            if self.path == "/cache/redirect.docx":
+                self.send_response(302)
+                self.send_header("Location", "http://169.254.169.254/latest")
+                self.end_headers()
+                return
+            if self.path != "/cache/edited.docx":
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(edited)))
+            self.end_headers()
+            self.wfile.write(edited)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    url = f"/api/v1/docs/{sample_doc.id}/callback"
+    settings = app.config["APP_SETTINGS"]
+    # Unsigned callbacks are only trusted for files on the Document Server.
+    app.config["APP_SETTINGS"] = settings.copy(update={"oo_base_url": base})
+    key = onlyoffice_service.document_key(sample_doc)
+    try:
+        for untrusted in (
+            {"key": "1-1-0", "status": 2, "url": f"{base}/cache/edited.docx"},
+            {"key": key, "status": 2, "url": "http://169.254.169.254/latest"},
+        ):
+            assert client.post(url, json=untrusted).status_code == 200
+        assert DocSaveJob.query.count() == 0
+
+        payload = {
+            "key": key,
+            "status": 2,
+            "url": f"{base}/cache/edited.docx",
+            "users": [str(admin_user.id)],
+        }
+        for _ in range(2):
+            res = client.post(url, json=payload)
+            assert res.status_code == 200
+            assert res.get_json() == {"error": 0, "status": "received"}
+
+        redirect = {"key": key, "status": 6, "url": f"{base}/cache/redirect.docx"}
+        assert client.post(url, json=redirect).status_code == 200
+        later = {"key": key, "status": 6, "url": f"{base}/cache/later.docx"}
+        assert client.post(url, json=later).status_code == 200
+    finally:
+        app.config["APP_SETTINGS"] = settings
+        server.shutdown()
+        server.server_close()
+
+    assert requests.count("/cache/edited.docx") == 1
+    jobs = {job.url.rsplit("/", 1)[1]: job for job in DocSaveJob.query.all()}
+    assert jobs["edited.docx"].state == DONE
+    assert jobs["edited.docx"].user_id == admin_user.id
+    # Redirects are not followed.
+    assert jobs["redirect.docx"].state == PENDING
+    assert "Redirect" in jobs["redirect.docx"].error
+    # Saves of one document land in order: the later one waits its turn.
+    assert jobs["later.docx"].state == PENDING and jobs["later.docx"].attempts == 0
+
+    doc = Doc.query.get(sample_doc.id)
+    assert doc.content_version == 2
+    versions = DocVersion.query.filter_by(doc_id=doc.id).all()
+    assert [v.id for v in versions] == [jobs["edited.docx"].doc_version_id]
+    assert versions[0].size == len(edited) and versions[0].blob_sha256
+    working = app.config["APP_SETTINGS"].base_file_dir / doc.path
+    assert working.read_bytes() == edited
+    assert not list(working.parent.glob(".*"))
+
+    # Failed jobs are retried by the next run, still ahead of later saves.
+    attempts = jobs["redirect.docx"].attempts
+    assert doc_save_worker().run_pending() == 1
+    assert DocSaveJob.query.get(jobs["redirect.docx"].id).attempts == attempts + 1
+    assert DocSaveJob.query.get(jobs["later.docx"].id).attempts == 0
+
+
+def test_signed_callbacks_must_name_their_document(app, client, sample_doc):
+    settings = app.config["APP_SETTINGS"]
+    app.config["APP_SETTINGS"] = settings.copy(update={"oo_jwt_secret": "oo-secret"})
+    url = f"/api/v1/docs/{sample_doc.id}/callback"
+    key = onlyoffice_service.document_key(sample_doc)
+    # Nothing listens there; the download fails, but only after queueing.
+    save = {"status": 2, "url": "http://127.0.0.1:9/cache/edited.docx"}
+    try:
+        other = pyjwt.encode({**save, "key": "999-1-0"}, "oo-secret")
+        assert client.post(url, json={"token": other}).status_code == 200
+        # With a secret configured, unsigned callbacks never replace content.
+        assert client.post(url, json={**save, "key": key}).status_code == 200
+        assert DocSaveJob.query.count() == 0
+
+        signed = pyjwt.encode({**save, "key": key}, "oo-secret")
+        assert client.post(url, json={"token": signed}).status_code == 200
+        assert DocSaveJob.query.one().document_key == key
+    finally:
+        app.config["APP_SETTINGS"] = settings
+
+
+def test_reclaimed_save_does_not_overwrite_a_later_one(app, sample_doc, monkeypatch):
+    working = document_service.working_path(sample_doc)
+    contents = {"old": b"older content", "new": b"newer content"}
+    monkeypatch.setattr(
+        doc_save_service,
+        "_download",
+        lambda url, timeout: blob_store().write([contents[url]]),
+    )
+    older, newer = (
+        DocSaveJob(
+            job_key=name,
+            doc_id=sample_doc.id,
+            document_key="key",
+            status=6,
+            url=name,
+            state=RUNNING,
+            attempts=1,
+        )
+        for name in ("old", "new")
+    )
+    db.session.add_all([older, newer])
+    db.session.commit()
+
+    # The newer job finished while the older one's worker only looked dead.
+    assert doc_save_service.run(newer.id, timeout=1, max_attempts=3)
+    assert not doc_save_service.run(older.id, timeout=1, max_attempts=3)
+    assert DocSaveJob.query.get(older.id).state == DONE
+    assert working.read_bytes() == contents["new"]
+
+
+def _office_file(path, parts):
+    import zipfile
+
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, xml in parts.items():
+            archive.writestr(name, xml)
+
+
+@pytest.mark.parametrize("backend", ["_FtsIndex", "_PostingsIndex"])
+def test_search_ranks_names_descriptions_and_file_contents(
+    app, client, sample_doc, monkeypatch, backend
+):
+    import importlib
+
+    from app.models.doc import Doc
+
+    module = importlib.import_module("app.services.search_service")
+    index = getattr(module, backend)()
+    monkeypatch.setattr(module, "_index_for", lambda executor: index)
+    # Documents from before the index (here: the fixture's) need a rebuild.
+    rebuild = app.test_cli_runner().invoke(args=["search-reindex"])
+    assert "Indexed 1 document(s)" in rebuild.output
+
+    base_dir = app.config["APP_SETTINGS"].base_file_dir
+    w = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+    a = (
+        'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+        'xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main"'
+    )
+    _office_file(
+        base_dir / "protocol.docx",
+        {
+            "word/document.xml": f"<w:document {w}><w:body>"
+            "<w:p><w:r><w:t>Centrifuge the samples at 4000 rpm.</w:t></w:r></w:p>"
+            "<w:p><w:r><w:t>实验室安全规范</w:t></w:r></w:p>"
+            "</w:body></w:document>",
+        },
+    )
+    _office_file(
+        base_dir / "inventory.xlsx",
+        {
+            "xl/sharedStrings.xml": '<sst xmlns="http://schemas.openxmlformats.org/'
+            'spreadsheetml/2006/main"><si><t>Reagent</t></si>'
+            "<si><t>Centrifuge tubes</t></si></sst>",
+        },
+    )
+    _office_file(
+        base_dir / "talk.pptx",
+        {
+            "ppt/slides/slide1.xml": f"<p:sld {a}><a:p><a:r><a:t>Quarterly"
+            "</a:t></a:r></a:p></p:sld>",
+        },
+    )
+    docs = [
+        Doc(name="Bench protocol", path="protocol.docx"),
+        Doc(name="Inventory", path="inventory.xlsx", description="stock sheet"),
+        Doc(name="Centrifuge manual", path="talk.pptx"),
+    ]
+    db.session.add_all(docs)
+    db.session.commit()
+    token = client.post(
+        "/auth/login", json={"username": "admin", "password": "password"}
+    ).get_json()["access_token"]
+
+    def search(q):
+        res = client.get(
+            "/api/v1/docs/search", query_string={"q": q}, headers=auth_header(token)
+        )
+        assert res.status_code == 200
+        return res.get_json()
+
+    result = search("centrifuge")
+    assert result["meta"]["total"] == 3
+    # A name hit outranks hits in the file contents.
+    assert result["data"][0]["name"] == "Centrifuge manual"
+    snippets = {hit["name"]: hit["snippet"] for hit in result["data"]}
+    assert snippets["Bench protocol"].startswith("Centrifuge the samples")
+    assert "Centrifuge tubes" in snippets["Inventory"]
+
+    assert [hit["name"] for hit in search("SAMPLES centri")["data"]] == [
+        "Bench protocol"
+    ]
+    assert [hit["name"] for hit in search("quarter")["data"]] == ["Centrifuge manual"]
+    assert [hit["name"] for hit in search("安全")["data"]] == ["Bench protocol"]
+    assert [hit["name"] for hit in search("demo")["data"]] == [sample_doc.name]
+    assert search("centrifuge nowhere")["meta"]["total"] == 0
+
+    # Replacing the file or renaming the document reindexes it.
+    _office_file(
+        base_dir / "replacement.pptx",
+        {
+            "ppt/slides/slide1.xml": f"<p:sld {a}><a:p><a:r><a:t>Annual"
+            "</a:t></a:r></a:p></p:sld>",
+        },
+    )
+    (base_dir / "replacement.pptx").replace(base_dir / "talk.pptx")
+    docs[2].name = "Rotor manual"
+    db.session.commit()
+    assert search("quarterly")["meta"]["total"] == 0
+    assert [hit["name"] for hit in search("annual rotor")["data"]] == ["Rotor manual"]
+
+    db.session.delete(docs[0])
+    db.session.commit()
+    assert [hit["name"] for hit in search("centrifuge")["data"]] == ["Inventory"]
+
+    missing = client.get("/api/v1/docs/search", headers=auth_header(token))
+    assert missing.status_code == 400
@@ -2,8 +2,10 @@
 
 from __future__ import annotations
 
+import sqlalchemy as sa
 from flask import Response
 
+from app.extensions import db
 from tests.test_auth import auth_header
 
 
@@ -92,3 +94,169 @@ def test_sample_creation_without_lab_is_rejected(client, admin_user):
     assert resp.status_code == 400
     body = resp.get_json()
     assert body["error"]["code"] == "lab_not_found"
+
+
+def test_storage_hierarchy_and_free_slots(client, admin_user, sample_data):
+    token = _login_admin(client)
+    lab, sample = sample_data
+
+    def create(payload):
+        res = client.post(
+            f"/api/v1/labs/{lab.id}/storage", headers=auth_header(token), json=payload
+        )
+        assert res.status_code == 201, res.get_json()
+        return res.get_json()["data"]
+
+    unit = create({"kind": "unit", "name": "Freezer -80"})
+    rack = create({"kind": "rack", "name": "Rack 1", "parent_id": unit["id"]})
+    box = create(
+        {"kind": "box", "name": "Box A", "parent_id": rack["id"], "rows": 2, "cols": 4}
+    )
+    assert box["capacity"] == 8 and box["free"] == 8
+
+    orphan = client.post(
+        f"/api/v1/labs/{lab.id}/storage",
+        headers=auth_header(token),
+        json={"kind": "box", "name": "Loose", "rows": 1, "cols": 1},
+    )
+    assert orphan.status_code == 400
+
+    placed = client.put(
+        f"/api/v1/samples/{sample.id}",
+        headers=auth_header(token),
+        json={"storage_box_id": box["id"], "storage_position": 2},
+    )
+    assert placed.status_code == 200
+    assert placed.get_json()["data"]["storage_position"] == 2
+
+    clash = client.post(
+        "/api/v1/samples",
+        headers=auth_header(token),
+        json={
+            "lab_id": lab.id,
+            "code": "SAMPLE-2",
+            "storage_box_id": box["id"],
+            "storage_position": 2,
+        },
+    )
+    assert clash.status_code == 409
+
+    contiguous = client.get(
+        f"/api/v1/labs/{lab.id}/free-slots?count=4&contiguous=true",
+        headers=auth_header(token),
+    )
+    body = contiguous.get_json()
+    assert body["meta"]["satisfied"] is True
+    assert [p["position"] for p in body["data"][0]["positions"]] == [3, 4, 5, 6]
+
+    too_many = client.get(
+        f"/api/v1/labs/{lab.id}/free-slots?count=8", headers=auth_header(token)
+    )
+    assert too_many.get_json()["meta"] == {
+        "requested": 8,
+        "found": 7,
+        "contiguous": False,
+        "satisfied": False,
+    }
+
+    def box_state():
+        listing = client.get(
+            f"/api/v1/labs/{lab.id}/storage", headers=auth_header(token)
+        )
+        return next(loc for loc in listing.get_json()["data"] if loc["kind"] == "box")
+
+    # Generic CRUD keeps the bitmap in step and cannot write it directly.
+    moved = client.put(
+        f"/api/v1/table/samples/{sample.id}",
+        headers=auth_header(token),
+        json={"storage_position": 5},
+    )
+    assert moved.status_code == 200
+    taken = client.post(
+        "/api/v1/table/samples",
+        headers=auth_header(token),
+        json={
+            "lab_id": lab.id,
+            "code": "SAMPLE-3",
+            "storage_box_id": box["id"],
+            "storage_position": 5,
+        },
+    )
+    assert taken.status_code == 409
+    assert taken.get_json()["error"]["code"] == "slot_unavailable"
+    client.put(
+        f"/api/v1/table/storage_locations/{box['id']}",
+        headers=auth_header(token),
+        json={"occupancy": None, "rows": 10},
+    )
+    assert (box_state()["capacity"], box_state()["free"]) == (8, 7)
+    refill = client.post(
+        "/api/v1/samples",
+        headers=auth_header(token),
+        json={
+            "lab_id": lab.id,
+            "code": "SAMPLE-4",
+            "storage_box_id": box["id"],
+            "storage_position": 2,
+        },
+    )
+    assert refill.status_code == 201
+    assert box_state()["free"] == 6
+
+    for sample_id in (sample.id, refill.get_json()["data"]["id"]):
+        delete = client.delete(
+            f"/api/v1/samples/{sample_id}", headers=auth_header(token)
+        )
+        assert delete.status_code == 204
+    assert box_state()["free"] == 8
+
+
+def test_lab_counters_track_sample_writes(client, app, admin_user, sample_data):
+    from app.services.counter_service import sample_counter_service
+
+    token = _login_admin(client)
+    lab, sample = sample_data
+
+    def counters():
+        res = client.get(f"/api/v1/labs/{lab.id}/counters", headers=auth_header(token))
+        assert res.status_code == 200
+        return res.get_json()["data"]
+
+    assert counters()["by_status"] == {"pending": 1}
+
+    client.post(
+        "/api/v1/samples",
+        headers=auth_header(token),
+        json={"lab_id": lab.id, "code": "SAMPLE-2", "status": "ready"},
+    )
+    generic = client.post(
+        "/api/v1/table/samples",
+        headers=auth_header(token),
+        json={"lab_id": lab.id, "code": "SAMPLE-3", "status": "ready"},
+    )
+    client.put(
+        f"/api/v1/samples/{sample.id}",
+        headers=auth_header(token),
+        json={"status": "ready"},
+    )
+    client.put(
+        f"/api/v1/table/samples/{generic.get_json()['data']['id']}",
+        headers=auth_header(token),
+        json={"status": "archived"},
+    )
+    assert counters() == {
+        "lab_id": lab.id,
+        "total": 3,
+        "by_status": {"ready": 2, "archived": 1},
+    }
+
+    client.delete(f"/api/v1/samples/{sample.id}", headers=auth_header(token))
+    assert counters()["by_status"] == {"ready": 1, "archived": 1}
+    assert sample_counter_service.drift() == {}
+
+    db.session.execute(sa.text("UPDATE lab_sample_counters SET count = 99"))
+    db.session.commit()
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["sample-counters", "--rebuild"])
+    assert "Rebuilt 2 counter row(s)" in result.output
+    assert sample_counter_service.drift() == {}
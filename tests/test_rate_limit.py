@@ -0,0 +1,80 @@
+"""Tests for the shared-file rate limit storage."""
+
+from __future__ import annotations
+
+import multiprocessing
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import SlidingWindowCounterRateLimiter
+
+from app import create_app
+from app.config import Settings
+from app.extensions import limiter
+from app.utils.rate_storage import MmapStorage
+
+
+def _hit_many(uri: str, count: int) -> None:
+    storage = storage_from_string(uri)
+    for _ in range(count):
+        storage.incr("shared", 60)
+
+
+def test_mmap_storage_is_shared_between_processes(tmp_path):
+    uri = f"mmap://{tmp_path}/limits?slots=64&stripes=4"
+    storage = storage_from_string(uri)
+    assert isinstance(storage, MmapStorage)
+
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_hit_many, args=(uri, 200)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert storage.get("shared") == 800
+
+    storage.clear("shared")
+    assert storage.get("shared") == 0
+
+
+def test_mmap_sliding_window_limits_and_evicts(tmp_path):
+    first = MmapStorage(f"mmap://{tmp_path}/limits?slots=16&stripes=2")
+    second = MmapStorage(f"mmap://{tmp_path}/limits?slots=16&stripes=2")
+    limiter = SlidingWindowCounterRateLimiter(first)
+    other_worker = SlidingWindowCounterRateLimiter(second)
+    limit = parse("3/minute")
+
+    assert limiter.hit(limit, "login", "10.0.0.1")
+    assert other_worker.hit(limit, "login", "10.0.0.1")
+    assert limiter.hit(limit, "login", "10.0.0.1")
+    assert not other_worker.hit(limit, "login", "10.0.0.1")
+    assert limiter.hit(limit, "login", "10.0.0.2")
+
+    # More live keys than slots: memory stays fixed, oldest entries go.
+    for index in range(100):
+        first.incr(f"key-{index}", 60)
+    assert first.get("key-99") == 1
+    assert sum(first.get(f"key-{index}") for index in range(100)) <= first.slots
+    assert first.reset() == first.slots
+
+
+def test_app_uses_shared_file_without_redis(tmp_path):
+    settings = Settings(
+        secret_key="test",
+        jwt_secret_key="test-jwt",
+        database_uri=f"sqlite:///{tmp_path}/test.db",
+        rate_redis_url=None,
+        rate_limit_shared_file=str(tmp_path / "limits"),
+        password_hash_workers=0,
+        audit_writer_async=False,
+    )
+    app = create_app(settings_override=settings)
+    with app.app_context():
+        assert isinstance(limiter.storage, MmapStorage)
+    assert app.config["RATELIMIT_STRATEGY"] == "sliding-window-counter"
+
+    # Other backends keep Flask-Limiter's default strategy.
+    in_memory = create_app(
+        settings_override=settings.copy(update={"rate_limit_shared_file": None})
+    )
+    assert "RATELIMIT_STRATEGY" not in in_memory.config
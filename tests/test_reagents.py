@@ -0,0 +1,315 @@
+"""Reagent kit and production API tests."""
+
+from __future__ import annotations
+
+import importlib
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app.extensions import db
+
+from tests.test_auth import auth_header
+
+
+def _login_admin(client) -> str:
+    res = client.post("/auth/login", json={"username": "admin", "password": "password"})
+    return res.get_json()["access_token"]
+
+
+@contextmanager
+def count_queries():
+    statements: list[str] = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+
+def _create_kit(client, token, name="PCR Master Mix"):
+    res = client.post(
+        "/api/v1/reagent-kits",
+        headers=auth_header(token),
+        json={"name": name, "description": "qPCR"},
+    )
+    assert res.status_code == 201
+    return res.get_json()["data"]
+
+
+def test_kit_detail_with_includes_uses_fixed_queries(client, admin_user):
+    token = _login_admin(client)
+    kit = _create_kit(client, token)
+    for version in ("1.0", "1.1", "2.0"):
+        res = client.post(
+            f"/api/v1/reagent-kits/{kit['id']}/specs",
+            headers=auth_header(token),
+            json={"version": version, "content": f"spec {version}"},
+        )
+        assert res.status_code == 201
+    for index in range(5):
+        res = client.post(
+            f"/api/v1/reagent-kits/{kit['id']}/productions",
+            headers=auth_header(token),
+            json={"batch_code": f"B-{index}"},
+        )
+        assert res.status_code == 201
+
+    with count_queries() as statements:
+        res = client.get(
+            f"/api/v1/reagent-kits/{kit['id']}"
+            "?include=specs,productions&productions_limit=2",
+            headers=auth_header(token),
+        )
+    assert res.status_code == 200
+    assert len(statements) == 3
+    body = res.get_json()
+    assert body["data"]["latest_spec"]["version"] == "2.0"
+    assert [p["batch_code"] for p in body["data"]["productions"]] == ["B-4", "B-3"]
+
+    cursor = body["meta"]["productions_next_cursor"]
+    page = client.get(
+        f"/api/v1/reagent-kits/{kit['id']}/productions?cursor={cursor}&limit=5",
+        headers=auth_header(token),
+    ).get_json()
+    assert [p["batch_code"] for p in page["data"]] == ["B-2", "B-1", "B-0"]
+    assert page["meta"]["next_cursor"] is None
+
+
+def test_kit_listing_and_unknown_include(client, admin_user):
+    token = _login_admin(client)
+    _create_kit(client, token, "Kit A")
+    _create_kit(client, token, "Kit B")
+
+    listing = client.get(
+        "/api/v1/reagent-kits?include=specs", headers=auth_header(token)
+    )
+    assert listing.status_code == 200
+    assert listing.get_json()["meta"]["total"] == 2
+    assert listing.get_json()["data"][0]["latest_spec"] is None
+
+    bad = client.get("/api/v1/reagent-kits?include=owners", headers=auth_header(token))
+    assert bad.status_code == 400
+    assert bad.get_json()["error"]["code"] == "invalid_include"
+
+
+def test_spec_versions_stored_as_deltas_and_diffed(client, admin_user):
+    from app.models.reagent_kit_specs import (
+        SNAPSHOT_INTERVAL,
+        ReagentKitSpec,
+        _content_cache,
+    )
+
+    token = _login_admin(client)
+    kit = _create_kit(client, token)
+    lines = [f"step {index}: mix reagent {index}\n" for index in range(60)]
+    contents = []
+    for revision in range(SNAPSHOT_INTERVAL + 2):
+        lines[revision] = f"step {revision}: revised in v{revision}\n"
+        contents.append("".join(lines))
+        res = client.post(
+            f"/api/v1/reagent-kits/{kit['id']}/specs",
+            headers=auth_header(token),
+            json={"version": f"v{revision}", "content": contents[-1]},
+        )
+        assert res.status_code == 201
+        assert "payload" not in res.get_json()["data"]
+
+    specs = ReagentKitSpec.query.order_by(ReagentKitSpec.id).all()
+    storage = [spec.storage for spec in specs]
+    assert storage[0] == "snapshot"
+    assert storage[1:SNAPSHOT_INTERVAL] == ["delta"] * (SNAPSHOT_INTERVAL - 1)
+    assert storage[SNAPSHOT_INTERVAL] == "snapshot"
+    assert specs[5].base_spec_id == specs[0].id
+    assert all(spec.stored_content is None for spec in specs)
+
+    _content_cache.clear()
+    db.session.expire_all()
+    specs = ReagentKitSpec.query.order_by(ReagentKitSpec.id).all()
+    assert [spec.content for spec in specs] == contents
+
+    res = client.get(
+        f"/api/v1/reagent-kits/{kit['id']}/specs/diff?from=v2&to=v4",
+        headers=auth_header(token),
+    )
+    assert res.status_code == 200
+    diff = res.get_json()["data"]["diff"]
+    assert "-step 3: mix reagent 3\n" in diff
+    assert "+step 4: revised in v4\n" in diff
+    missing = client.get(
+        f"/api/v1/reagent-kits/{kit['id']}/specs/diff?from=v2&to=v99",
+        headers=auth_header(token),
+    )
+    assert missing.status_code == 404
+
+    # Generic CRUD cannot rewrite the encoded columns and break the chain.
+    tampered = client.put(
+        f"/api/v1/table/reagent_kit_specs/{specs[3].id}",
+        headers=auth_header(token),
+        json={"payload": None, "base_spec_id": None},
+    )
+    assert tampered.status_code == 200
+    _content_cache.clear()
+    db.session.expire_all()
+    assert ReagentKitSpec.query.get(specs[3].id).content == contents[3]
+    specs = ReagentKitSpec.query.order_by(ReagentKitSpec.id).all()
+
+    # Rewriting a snapshot first turns its deltas into standalone snapshots.
+    snapshot = specs[0]
+    snapshot.content = "replaced\n"
+    db.session.commit()
+    _content_cache.clear()
+    db.session.expire_all()
+    specs = ReagentKitSpec.query.order_by(ReagentKitSpec.id).all()
+    assert specs[0].content == "replaced\n"
+    assert specs[1].storage == "snapshot"
+    assert [spec.content for spec in specs[1:]] == contents[1:]
+
+    res = client.delete(f"/api/v1/reagent-kits/{kit['id']}", headers=auth_header(token))
+    assert res.status_code == 204
+    assert ReagentKitSpec.query.count() == 0
+
+
+def test_kit_genealogy_timeline(client, admin_user):
+    token = _login_admin(client)
+    kit = _create_kit(client, token)
+    base = f"/api/v1/reagent-kits/{kit['id']}"
+    for step in ("1.0", "2.0"):
+        client.post(
+            f"{base}/specs",
+            headers=auth_header(token),
+            json={"version": step, "content": f"spec {step}"},
+        )
+        client.post(
+            f"{base}/productions",
+            headers=auth_header(token),
+            json={"batch_code": f"B-{step}", "notes": f"made on {step}"},
+        )
+    _create_kit(client, token, "Other Kit")
+
+    res = client.get(f"{base}/genealogy", headers=auth_header(token))
+    assert res.status_code == 200
+    events = res.get_json()["data"]
+    assert [event["source"] for event in events] == [
+        "kit",
+        "spec",
+        "production",
+        "spec",
+        "production",
+    ]
+    productions = [event for event in events if event["source"] == "production"]
+    assert [event["production"]["batch_code"] for event in productions] == [
+        "B-1.0",
+        "B-2.0",
+    ]
+    assert [event["spec"]["version"] for event in productions] == ["1.0", "2.0"]
+
+    seen = []
+    cursor = None
+    while True:
+        url = f"{base}/genealogy?limit=2" + (f"&cursor={cursor}" if cursor else "")
+        page = client.get(url, headers=auth_header(token)).get_json()
+        seen.extend(page["data"])
+        cursor = page["meta"]["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == events
+
+    windowed = client.get(
+        f"{base}/genealogy?from={events[3]['created_at']}",
+        headers=auth_header(token),
+    ).get_json()["data"]
+    assert windowed == events[3:]
+
+    bad = client.get(f"{base}/genealogy?cursor=nope", headers=auth_header(token))
+    assert bad.status_code == 400
+
+
+def test_production_stock_ledger_with_checkpoints(client, admin_user, monkeypatch):
+    from app.models.reagent_balance_checkpoints import ReagentBalanceCheckpoint
+
+    # ``app.services`` re-exports the singleton under the module's name.
+    stock = importlib.import_module("app.services.reagent_stock_service")
+    monkeypatch.setattr(stock, "CHECKPOINT_INTERVAL", 3)
+    token = _login_admin(client)
+    kit = _create_kit(client, token)
+    created = client.post(
+        f"/api/v1/reagent-kits/{kit['id']}/productions",
+        headers=auth_header(token),
+        json={"batch_code": "LOT-1", "quantity": 100, "unit": "uL"},
+    )
+    assert created.status_code == 201
+    production = created.get_json()["data"]
+    assert production["balance"] == 100
+    url = f"/api/v1/reagent-productions/{production['id']}/movements"
+
+    moves = [("consume", 10), ("consume", 20), ("restock", 5), ("adjust", -3)]
+    moves += [("consume", 1)] * 4
+    for kind, amount in moves:
+        res = client.post(
+            url, headers=auth_header(token), json={"kind": kind, "amount": amount}
+        )
+        assert res.status_code == 201
+    assert res.get_json()["meta"]["balance"] == 68
+    assert res.get_json()["data"]["seq"] == 8
+    assert [cp.seq for cp in ReagentBalanceCheckpoint.query.all()] == [3, 6]
+
+    too_much = client.post(
+        url, headers=auth_header(token), json={"kind": "consume", "amount": 69}
+    )
+    assert too_much.status_code == 409
+    assert too_much.get_json()["error"]["code"] == "insufficient_stock"
+
+    page = client.get(f"{url}?limit=5", headers=auth_header(token)).get_json()
+    assert [m["balance_after"] for m in page["data"]] == [68, 69, 70, 71, 72]
+    older = client.get(
+        f"{url}?limit=5&cursor={page['meta']['next_cursor']}",
+        headers=auth_header(token),
+    ).get_json()
+    assert [m["balance_after"] for m in older["data"]] == [75, 70, 90]
+    assert older["meta"]["next_cursor"] is None
+
+    client.post(
+        f"/api/v1/reagent-kits/{kit['id']}/productions",
+        headers=auth_header(token),
+        json={"batch_code": "LOT-2", "quantity": 500},
+    )
+    low = client.get(
+        "/api/v1/reagent-productions/low-stock?threshold=100",
+        headers=auth_header(token),
+    ).get_json()
+    assert [p["batch_code"] for p in low["data"]] == ["LOT-1"]
+
+
+def test_production_stock_is_read_only_over_generic_crud(client, admin_user):
+    token = _login_admin(client)
+    kit = _create_kit(client, token)
+    created = client.post(
+        "/api/v1/table/reagent_productions",
+        headers=auth_header(token),
+        json={
+            "kit_id": kit["id"],
+            "batch_code": "LOT-CRUD",
+            "initial_quantity": 100,
+            "balance": 100,
+            "movement_count": 1,
+        },
+    )
+    assert created.status_code == 201
+    row = created.get_json()["data"]
+    assert (row["initial_quantity"], row["balance"], row["movement_count"]) == (0, 0, 0)
+
+    updated = client.put(
+        f"/api/v1/table/reagent_productions/{row['id']}",
+        headers=auth_header(token),
+        json={"balance": 999999, "movement_count": 7, "unit": "mL"},
+    )
+    assert updated.status_code == 200
+    row = updated.get_json()["data"]
+    assert row["unit"] == "mL"
+    assert (row["initial_quantity"], row["balance"], row["movement_count"]) == (0, 0, 0)
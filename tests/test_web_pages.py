@@ -3,6 +3,11 @@
 from __future__ import annotations
 
 from flask.testing import FlaskClient
+from flask_jwt_extended import decode_token
+
+from app.extensions import db
+from app.utils import security
+from app.utils.revocation import revoke_token
 
 
 def _login(client: FlaskClient) -> dict:
@@ -37,3 +42,25 @@ def test_docs_list_and_edit_html(client, admin_user, sample_doc):
     page = edit_res.get_data(as_text=True)
     assert sample_doc.name in page
     assert "config" in page
+
+
+def test_page_tokens_are_verified_once_and_still_checked_for_revocation(
+    app, client, admin_user, sample_doc, monkeypatch
+):
+    token = _login(client)["access_token"]
+    calls: list[str] = []
+    real_decode = security.decode_token
+
+    def counting_decode(encoded, *args, **kwargs):
+        calls.append(encoded)
+        return real_decode(encoded, *args, **kwargs)
+
+    monkeypatch.setattr(security, "decode_token", counting_decode)
+    for _ in range(3):
+        assert client.get(f"/web/list?token={token}").status_code == 200
+    assert len(calls) == 1
+
+    revoke_token(decode_token(token))
+    db.session.commit()
+    assert client.get(f"/web/list?token={token}").status_code == 400
+    assert client.get(f"/admin?token={token}").status_code == 302